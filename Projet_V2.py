@@ -1,26 +1,112 @@
 import os
 from datetime import datetime, timedelta
-import pandas as pd
-import matplotlib.pyplot as plt
 from pathlib import Path
 import csv
 import json
+from array import array
+import re
+import time
+import heapq
+from itertools import compress
+import mmap
+import struct
+import sqlite3
+import shutil
+import threading
+import zlib
+from contextlib import contextmanager, nullcontext, ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from bisect import bisect_left, insort
+from collections import deque
+from operator import attrgetter
+# pandas, numpy et matplotlib ne sont importés que dans les fonctions du rapport (menu Graph) :
+# le reste de l'application démarre sans eux (voir benchmarks/bench_demarrage.py)
 
 ## variable globales
 DUREE_EMPRUNT_MAXI = 14                     # La duree maximal pour un prêt
 MAXI_PRET_ACTIF = 3                         #la limite d'emprunts en cours par lecteur
 FORMAT_DE_SAUVEGARDE_DEFAUT = "csv"         #le format de sauvgarde choisi par defaut
+FICHIER_SQLITE_DEFAUT = "bibliotheque.db"   #la base utilisée par le format de sauvegarde sqlite
+FICHIER_SNAPSHOT_DEFAUT = "bibliotheque.snap"   #le snapshot binaire utilisé par le format de sauvegarde binaire
+TAILLE_LOT_CHARGEMENT = 10000               #nombre de lignes construites puis indexées ensemble au chargement
+TAILLE_MORCEAU_CSV = 200000                 #nombre de lignes lues a la fois par pandas pour le rapport depuis les CSV
+JOURNAL_FSYNC_TOUS_LES = 32                 #nombre d'opérations journalisées entre deux fsync
+JOURNAL_COMPACTER_TOUS_LES = 10000          #nombre d'opérations avant de réécrire un snapshot complet
+POIDS_CHAMPS_RECHERCHE = {"titre": 3, "auteur": 2, "categorie": 1}    #poids de chaque champ dans le classement des recherches
+NB_VERROUS_CONCURRENTS = 64                 #nombre de verrous de livres (et de lecteurs) en mode concurrent
+DOSSIER_COLONNES_DEFAUT = "data_parquet"    #le dossier de l'export en colonnes (Parquet ou Arrow IPC) pour les rapports
+DOSSIER_ARCHIVE_DEFAUT = "data_archive"     #le dossier des segments d'emprunts archivés
+JOURS_AVANT_ARCHIVAGE = 365                 #age (depuis le retour) a partir duquel un emprunt rendu peut etre archivé
+JOURS_MISE_DE_COTE = 3                      #nombre de jours pendant lesquels un exemplaire rendu reste réservé au lecteur suivant
 
 
 # Nettoyer un text en enlevant les espaces avec strip et mettant le tout en manisicule              
 def Nettoyer(S: str):
    return (S or "").strip().casefold()
 
+# Clé normalisée (titre, auteur) qui sert a detecter les doublons de livres
+def cle_titre_auteur(titre, auteur):
+    return (Nettoyer(titre), Nettoyer(auteur))
+
+# Clé du compteur de statistiques correspondant au type d'un utilisateur
+def cle_compteur_utilisateur(utilisateur):
+    if isinstance(utilisateur, Lecteur):
+        return "lecteurs"
+    if isinstance(utilisateur, Bibliothecaire):
+        return "bibliothecaires"
+    return None
+
+# Nom du type d'un utilisateur tel qu'il est écrit dans les fichiers de sauvegarde
+def type_utilisateur(utilisateur):
+    if isinstance(utilisateur, Lecteur):
+        return "Lecteur"
+    if isinstance(utilisateur, Bibliothecaire):
+        return "Bibliothecaire"
+    return utilisateur.__class__.__name__
+
+# Champs d'un livre tels qu'ils sont écrits dans les fichiers de sauvegarde et le journal
+def donnees_livre(livre):
+    return {
+        "id": livre.id,
+        "titre": livre.titre,
+        "auteur": livre.auteur,
+        "categorie": livre.categorie,
+        "exemplaires": int(livre.exemplaires),
+        "statut": livre.statut
+    }
+
+# Allocation atomique d'un identifiant (Livre.Compteur, Emprunt.Compteur) : deux threads n'obtiennent jamais le meme id
+VERROU_IDS = threading.Lock()
+
+def allouer_id(classe):
+    with VERROU_IDS:
+        identifiant = classe.Compteur
+        classe.Compteur += 1
+    return identifiant
+
+# Résultat d'un lot (emprunter_lot / rendre_lot) refusé en entier : les demandes valides sont marquées annulées
+def annuler_lot(resultats):
+    for resultat in resultats:
+        if resultat["ok"]:
+            resultat["ok"] = False
+            resultat["motif"] = "Lot annulé."
+    return {"applique": False, "acceptes": 0, "refuses": len(resultats), "resultats": resultats}
+
+# Créer un utilisateur a partir du type lu dans un fichier de sauvegarde
+def creer_utilisateur(identifiant, nom, email, typ):
+    if (typ or "").strip().lower() == "lecteur":
+        return Lecteur(identifiant, nom, email)
+    return Bibliothecaire(identifiant, nom, email)
+
+# Découper un texte nettoyé en mots (lettres et chiffres) pour l'index de recherche
+def tokeniser(S: str):
+    return re.findall(r"[^\W_]+", Nettoyer(S))
+
 
 # Choisir le format de sauvegarde qu'on veut travailler dessusentre CSV et JSON                   
 def choisir_format_sauvegarde(): 
-    format = input("Quelle est la version de sauvegarde que tu souhaite ? csv ou json, (défaut=csv) : ").strip().lower()
-    if format not in ("json", "csv"):
+    format = input("Quelle est la version de sauvegarde que tu souhaite ? csv, json, journal, sqlite ou binaire, (défaut=csv) : ").strip().lower()
+    if format not in ("json", "csv", "journal", "sqlite", "binaire"):
         format = FORMAT_DE_SAUVEGARDE_DEFAUT
     #FORMAT_DE_SAUVEGARDE_DEFAUT = format
     print("Le format choisi est ",format)
@@ -30,13 +116,18 @@ def choisir_format_sauvegarde():
 # Classe Livre                                                                                  
 # -------------------------------
 class Livre:
+    # attributs fixes : pas de __dict__ par livre
+    __slots__ = ("id", "titre", "auteur", "categorie", "exemplaires", "statut")
+
     #Compteur des id pour chaque livre  
     Compteur = 1 
 
-    # constructeur par parametres
-    def __init__(self, titre, auteur, categorie, exemplaires):
-        self.id = Livre.Compteur                                #recoit l'ID actuel du compteur de calsse ;
-        Livre.Compteur += 1                                     #incrementation de l'ID
+    # constructeur par parametres (identifiant est donné quand le livre est relu depuis une sauvegarde)
+    def __init__(self, titre, auteur, categorie, exemplaires, identifiant=None):
+        if identifiant is None:
+            self.id = allouer_id(Livre)                         #recoit l'ID actuel du compteur de classe et l'incremente
+        else:
+            self.id = identifiant
         # Définition des attributs
         self.titre = titre
         self.auteur = auteur
@@ -61,6 +152,8 @@ class Livre:
 # Classe Utilisateur + sous-classes                                                              
 # -------------------------------
 class Utilisateur:
+    __slots__ = ("id", "nom", "email")
+
     # constructeur par parametres de la classe Utilisateur
     def __init__(self, identifiant, nom, email):
         #définition des attributs de la classe utilisateur
@@ -71,43 +164,63 @@ class Utilisateur:
     # definition de la methode d'affichage
     def afficher(self):
         return f"{self.id} ; {self.nom}"
-    
-    # destructeur de la classe
-    def __del__(self):
-        print(f"Utilisateur detruit: {self.id} ; {self.nom}")
 
 #definition de la classe lecteur herité par la classe Utilisateur                               
 class Lecteur(Utilisateur):
+    __slots__ = ("_livres_empruntes",)
+
     #constructeur par parametre de la classe
     def __init__(self, identifiant, nom, email):
         
         #appel au contructeur parent (utilisateur)
         super().__init__(identifiant, nom, email)
         
-        #definition des attributs propre au lecteur
-        self.livres_empruntes = set()
+        #definition des attributs propre au lecteur (l'ensemble n'est créé qu'au premier emprunt)
+        self._livres_empruntes = None
+
+    # ids des livres empruntés en ce moment (lecture seule, passer par marquer_emprunte / marquer_rendu)
+    @property
+    def livres_empruntes(self):
+        return self._livres_empruntes or frozenset()
+
+    def marquer_emprunte(self, livre_id):
+        if self._livres_empruntes is None:
+            self._livres_empruntes = set()
+        self._livres_empruntes.add(livre_id)
+
+    def marquer_rendu(self, livre_id):
+        if self._livres_empruntes:
+            self._livres_empruntes.discard(livre_id)
+            if not self._livres_empruntes:
+                self._livres_empruntes = None
 
 
 #definition de la classe bibliothecaire herité de utilisateur sans rien rajouté de plus         
 class Bibliothecaire(Utilisateur):
-    pass
+    __slots__ = ()
 
 
 # -------------------------------
 # Classe Emprunt                                                                                    
 # -------------------------------
 class Emprunt:
+    __slots__ = ("id", "livre_id", "lecteur_id", "date_emprunt", "date_retour_prevue",
+                 "date_retour_effective", "retourne")
+
     Compteur = 1
     
     #definition du constructeur par parametre de la classe Emprunt
-    def __init__(self, livre_id, lecteur_id):
-        self.id = Emprunt.Compteur
-        Emprunt.Compteur += 1
+    # (l'identifiant et les dates sont donnés quand l'emprunt est relu depuis une sauvegarde)
+    def __init__(self, livre_id, lecteur_id, date_emprunt=None, date_retour_prevue=None, identifiant=None):
+        if identifiant is None:
+            self.id = allouer_id(Emprunt)
+        else:
+            self.id = identifiant
         #Définition des attributs de la classe
         self.livre_id = livre_id
         self.lecteur_id = lecteur_id
-        self.date_emprunt = datetime.now()
-        self.date_retour_prevue = self.date_emprunt + timedelta(days=DUREE_EMPRUNT_MAXI)
+        self.date_emprunt = date_emprunt or datetime.now()
+        self.date_retour_prevue = date_retour_prevue or self.date_emprunt + timedelta(days=DUREE_EMPRUNT_MAXI)
         self.date_retour_effective = None
         self.retourne = False
 
@@ -119,15 +232,16 @@ class Emprunt:
         self.retourne = True
 
     #methode de verification si le livre est en retard 
-    def en_retard(self):
+    # (maintenant permet de comparer plusieurs emprunts a la meme date de référence)
+    def en_retard(self, maintenant=None):
         if not self.retourne:
-            return datetime.now() > self.date_retour_prevue
+            return (maintenant or datetime.now()) > self.date_retour_prevue
         return self.date_retour_effective > self.date_retour_prevue
 
     #methode pour calculer les jours de retard
-    def jours_de_retard(self):
+    def jours_de_retard(self, maintenant=None):
         if not self.retourne:
-            return max(0, (datetime.now() - self.date_retour_prevue).days)
+            return max(0, ((maintenant or datetime.now()) - self.date_retour_prevue).days)
         else:
             return max(0, (self.date_retour_effective - self.date_retour_prevue).days)
 
@@ -137,6 +251,697 @@ class Emprunt:
         return (f"Emprunt {self.id} - Livre {self.livre_id} | {statut}")
 
 
+# -------------------------------
+# Registre des emprunts en colonnes (tableaux typés au lieu d'un objet Emprunt par emprunt)
+# -------------------------------
+ORIGINE_DATES = datetime(1970, 1, 1)
+SANS_DATE = -(2 ** 63)
+
+
+# date <-> nombre de secondes / microsecondes depuis ORIGINE_DATES (sans fuseau, comme les dates de l'application)
+# (jours et secondes d'un timedelta sont déja normalisés : pas de division de timedelta, qui est lente)
+def _date_vers_s(date):
+    if date is None:
+        return SANS_DATE
+    ecart = date - ORIGINE_DATES
+    return ecart.days * 86400 + ecart.seconds
+
+def _s_vers_date(valeur):
+    return None if valeur == SANS_DATE else ORIGINE_DATES + timedelta(seconds=valeur)
+
+def _date_vers_us(date):
+    if date is None:
+        return SANS_DATE
+    ecart = date - ORIGINE_DATES
+    return (ecart.days * 86400 + ecart.seconds) * 1000000 + ecart.microseconds
+
+def _us_vers_date(valeur):
+    return None if valeur == SANS_DATE else ORIGINE_DATES + timedelta(microseconds=valeur)
+
+
+# pour chaque octet du bitmap des retours : les 8 octets du masque "en cours" correspondants
+MASQUES_EN_COURS = [bytes(1 - ((octet >> bit) & 1) for bit in range(8)) for octet in range(256)]
+# et l'inverse : 8 octets du masque "en cours" -> octet du bitmap des retours
+OCTETS_RETOURNES = {masque: octet for octet, masque in enumerate(MASQUES_EN_COURS)}
+
+
+# bitmap des retours a partir d'un masque "en cours" (un octet 0 ou 1 par emprunt)
+def _bitmap_depuis_masque(masque_en_cours):
+    masque = bytes(masque_en_cours)
+    masque += b"\x01" * (-len(masque) % 8)
+    return bytearray(map(OCTETS_RETOURNES.__getitem__, (masque[i:i + 8] for i in range(0, len(masque), 8))))
+
+
+# colonnes entieres du registre (le bitmap des retours est a part)
+COLONNES_REGISTRE = ("ids", "livre_ids", "lecteur_ids", "dates_emprunt", "dates_retour_prevue", "dates_retour_effective")
+
+
+class RegistreEmprunts:
+    # une colonne par champ : ids et dates en entiers 64 bits, "retourné" dans un bitmap (1 bit par emprunt)
+    # les lignes sont rangées par id croissant, ce qui permet de retrouver un emprunt par dichotomie
+    # les lectures ne réordonnent jamais les lignes : seuls les écrivains (fin de chargement, archivage)
+    # appellent _trier, sous verrou_index en mode concurrent
+    def __init__(self):
+        self.ids = array("q")
+        self.livre_ids = array("q")
+        self.lecteur_ids = array("q")
+        self.dates_emprunt = array("q")
+        self.dates_retour_prevue = array("q")
+        self.dates_retour_effective = array("q")
+        self.retournes = bytearray()
+        self._trie = True                           # faux si un id plus petit que le dernier a été ajouté
+        self.doublons = []                          # (position d'ajout, id) des lignes écartées au tri : id deja présent
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- acces par id (meme interface qu'un dictionnaire id -> emprunt) ---
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def keys(self):
+        return iter(self)
+
+    def __contains__(self, emprunt_id):
+        return self.position(emprunt_id) is not None
+
+    def get(self, emprunt_id, defaut=None):
+        i = self.position(emprunt_id)
+        return defaut if i is None else EmpruntVue(self, i)
+
+    def __getitem__(self, emprunt_id):
+        i = self.position(emprunt_id)
+        if i is None:
+            raise KeyError(emprunt_id)
+        return EmpruntVue(self, i)
+
+    def values(self):
+        return (EmpruntVue(self, i) for i in range(len(self.ids)))
+
+    def items(self):
+        return ((vue.id, vue) for vue in self.values())
+
+    # position (numéro de ligne) d'un emprunt, ou None
+    # (registre pas encore trié, pendant un chargement : recherche linéaire)
+    def position(self, emprunt_id):
+        if not self._trie:
+            try:
+                return self.ids.index(emprunt_id)
+            except ValueError:
+                return None
+        i = bisect_left(self.ids, emprunt_id)
+        if i < len(self.ids) and self.ids[i] == emprunt_id:
+            return i
+        return None
+
+    def dernier_id(self):
+        return max(self.ids, default=0) if not self._trie else (self.ids[-1] if self.ids else 0)
+
+    # --- écriture ---
+
+    # ajoute un emprunt (objet Emprunt ou vue) en fin de colonnes
+    # (une valeur refusée ne laisse pas de ligne incomplete dans les colonnes)
+    # un id plus petit que le dernier marque seulement le registre "a trier" : le tri est fait une seule fois,
+    # a la fin du chargement (un chargement dans le désordre reste linéaire). Les id en double sont écartés
+    # a ce moment-la et notés dans doublons
+    def ajouter(self, emprunt):
+        valeurs = (emprunt.id, emprunt.livre_id, emprunt.lecteur_id, _date_vers_s(emprunt.date_emprunt),
+                   _date_vers_s(emprunt.date_retour_prevue), _date_vers_s(emprunt.date_retour_effective))
+        if self.ids and emprunt.id <= self.ids[-1]:
+            self._trie = False
+        i = len(self.ids)
+        try:
+            self.ids.append(valeurs[0])
+            self.livre_ids.append(valeurs[1])
+            self.lecteur_ids.append(valeurs[2])
+            self.dates_emprunt.append(valeurs[3])
+            self.dates_retour_prevue.append(valeurs[4])
+            self.dates_retour_effective.append(valeurs[5])
+        except (OverflowError, TypeError):
+            for nom in COLONNES_REGISTRE:
+                del getattr(self, nom)[i:]
+            raise
+        if i >> 3 >= len(self.retournes):
+            self.retournes.append(0)
+        self.marquer_retourne(i, emprunt.retourne)
+
+    # copie dans un nouveau registre les lignes dont l'octet du masque vaut 1
+    def extraire(self, masque):
+        masque = bytes(masque)
+        extrait = RegistreEmprunts()
+        extrait._trie = self._trie
+        for nom in COLONNES_REGISTRE:
+            setattr(extrait, nom, array("q", compress(getattr(self, nom), masque)))
+        extrait.retournes = _bitmap_depuis_masque(compress(self.masque_en_cours(), masque))
+        return extrait
+
+    # copie de toutes les lignes (colonnes copiées d'un bloc)
+    def copie(self):
+        copie = RegistreEmprunts()
+        copie._trie = self._trie
+        for nom in COLONNES_REGISTRE:
+            setattr(copie, nom, getattr(self, nom)[:])
+        copie.retournes = bytearray(self.retournes)
+        return copie
+
+    # retire les lignes dont l'octet du masque vaut 1 (compaction des colonnes, l'ordre des id est conservé)
+    # et retourne un nouveau registre qui contient les lignes retirées
+    def retirer(self, masque):
+        retires = self.extraire(masque)
+        garder = bytes(1 - octet for octet in bytes(masque))
+        en_cours = self.masque_en_cours()
+        for nom in COLONNES_REGISTRE:
+            setattr(self, nom, array("q", compress(getattr(self, nom), garder)))
+        self.retournes = _bitmap_depuis_masque(compress(en_cours, garder))
+        return retires
+
+    def est_retourne(self, i):
+        return (self.retournes[i >> 3] >> (i & 7)) & 1 == 1
+
+    def marquer_retourne(self, i, retourne):
+        if retourne:
+            self.retournes[i >> 3] |= 1 << (i & 7)
+        else:
+            self.retournes[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+    # remet les lignes dans l'ordre des id (apres un ajout dans le désordre)
+    # pour un id en double, la premiere ligne ajoutée est gardée (le tri est stable) et les autres sont écartées
+    def _trier(self):
+        if self._trie:
+            return
+        ids = self.ids
+        ordre = []
+        precedent = None
+        for i in sorted(range(len(ids)), key=ids.__getitem__):
+            if ids[i] == precedent:
+                self.doublons.append((i, ids[i]))
+            else:
+                ordre.append(i)
+                precedent = ids[i]
+        retournes = [self.est_retourne(i) for i in ordre]
+        for nom in COLONNES_REGISTRE:
+            colonne = getattr(self, nom)
+            setattr(self, nom, array("q", (colonne[i] for i in ordre)))
+        self.retournes = bytearray((len(ordre) + 7) // 8)
+        for i, retourne in enumerate(retournes):
+            if retourne:
+                self.marquer_retourne(i, True)
+        self._trie = True
+
+    # --- parcours rapides sur les colonnes ---
+
+    # nombre d'emprunts retournés : on compte les bits a 1 du bitmap d'un coup
+    def nb_retournes(self):
+        return int.from_bytes(self.retournes, "little").bit_count()
+
+    def nb_en_cours(self):
+        return len(self.ids) - self.nb_retournes()
+
+    # masque des emprunts non retournés : un octet (0 ou 1) par emprunt, obtenu octet par octet du bitmap
+    def masque_en_cours(self):
+        return b"".join(map(MASQUES_EN_COURS.__getitem__, self.retournes))[:len(self.ids)]
+
+    # positions des emprunts non retournés (filtrage fait par itertools.compress, sans boucle Python)
+    def positions_en_cours(self):
+        return compress(range(len(self.ids)), self.masque_en_cours())
+
+    def en_cours(self):
+        return (EmpruntVue(self, i) for i in self.positions_en_cours())
+
+    # nombre d'emprunts non retournés en retard a la date de référence
+    def nb_en_retard(self, reference):
+        limite = _date_vers_s(reference)
+        return sum(map(limite.__gt__, compress(self.dates_retour_prevue, self.masque_en_cours())))
+
+
+class EmpruntVue(Emprunt):
+    # vue sur une ligne du registre : meme interface qu'Emprunt (en_retard, jours_de_retard, afficher, rendre)
+    # les valeurs sont lues et écrites directement dans les colonnes du registre
+    # la vue garde l'id de son emprunt : si un tri ou un archivage a déplacé les lignes, la position est
+    # retrouvée par id (KeyError si l'emprunt n'est plus dans le registre)
+    __slots__ = ("_registre", "_position", "_id")
+
+    def __init__(self, registre, position):
+        self._registre = registre
+        self._position = position
+        self._id = registre.ids[position]
+
+    # position actuelle de la ligne de l'emprunt dans le registre
+    def _ligne(self):
+        ids = self._registre.ids
+        if self._position < len(ids) and ids[self._position] == self._id:
+            return self._position
+        position = self._registre.position(self._id)
+        if position is None:
+            raise KeyError(self._id)
+        self._position = position
+        return position
+
+    @property
+    def id(self):
+        return self._id
+
+    @property
+    def livre_id(self):
+        return self._registre.livre_ids[self._ligne()]
+
+    @property
+    def lecteur_id(self):
+        return self._registre.lecteur_ids[self._ligne()]
+
+    @property
+    def date_emprunt(self):
+        return _s_vers_date(self._registre.dates_emprunt[self._ligne()])
+
+    @property
+    def date_retour_prevue(self):
+        return _s_vers_date(self._registre.dates_retour_prevue[self._ligne()])
+
+    @property
+    def date_retour_effective(self):
+        return _s_vers_date(self._registre.dates_retour_effective[self._ligne()])
+
+    @date_retour_effective.setter
+    def date_retour_effective(self, date):
+        self._registre.dates_retour_effective[self._ligne()] = _date_vers_s(date)
+
+    @property
+    def retourne(self):
+        return self._registre.est_retourne(self._ligne())
+
+    @retourne.setter
+    def retourne(self, valeur):
+        self._registre.marquer_retourne(self._ligne(), valeur)
+
+
+# -------------------------------
+# Classe Journal (journal des modifications, ajouté a la fin du fichier)
+# -------------------------------
+class Journal:
+    # ouvre (ou crée) le fichier journal du dossier de sauvegarde
+    def __init__(self, dossier="data_json", fsync_tous_les=JOURNAL_FSYNC_TOUS_LES,
+                 compacter_tous_les=JOURNAL_COMPACTER_TOUS_LES):
+        self.dossier = Path(dossier)
+        self.dossier.mkdir(parents=True, exist_ok=True)
+        self.chemin = self.dossier / "journal.jsonl"
+        self.fsync_tous_les = max(1, fsync_tous_les)
+        self.compacter_tous_les = max(1, compacter_tous_les)
+        self.sequence = max(lire_sequence_snapshot(self.dossier), derniere_sequence_journal(self.chemin))
+        self.depuis_snapshot = 0                    # opérations écrites depuis le dernier snapshot
+        self.non_synchronisees = 0                  # opérations écrites depuis le dernier fsync
+        self.fichier = open(self.chemin, "a", encoding="utf-8")
+
+    # ajoute une opération (une ligne JSON compacte) a la fin du journal
+    def ecrire(self, op, **donnees):
+        self.sequence += 1
+        enregistrement = {"seq": self.sequence, "op": op}
+        enregistrement.update(donnees)
+        self.fichier.write(json.dumps(enregistrement, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.depuis_snapshot += 1
+        self.non_synchronisees += 1
+        if self.non_synchronisees >= self.fsync_tous_les:
+            self.synchroniser()
+
+    # force l'écriture physique des opérations en attente (fsync groupé)
+    def synchroniser(self):
+        if self.non_synchronisees == 0 or self.fichier.closed:
+            return
+        self.fichier.flush()
+        os.fsync(self.fichier.fileno())
+        self.non_synchronisees = 0
+
+    # vide le journal une fois qu'un snapshot contenant toutes ses opérations est écrit
+    def vider(self):
+        self.fichier.close()
+        self.fichier = open(self.chemin, "w", encoding="utf-8")
+        self.depuis_snapshot = 0
+        self.non_synchronisees = 0
+
+    # retire les opérations contenues dans un snapshot (numéro <= sequence) ; celles écrites pendant
+    # l'écriture du snapshot sont gardées (le journal est réécrit par un fichier temporaire)
+    def retirer_jusqua(self, sequence):
+        if self.sequence <= sequence:
+            self.vider()
+            return
+        self.fichier.close()
+        suivantes = [operation for operation in lire_journal(self.chemin) if operation["seq"] > sequence]
+        ecrire_fichier_atomique(self.chemin, "".join(
+            json.dumps(operation, ensure_ascii=False, separators=(",", ":")) + "\n" for operation in suivantes))
+        self.fichier = open(self.chemin, "a", encoding="utf-8")
+        self.depuis_snapshot = len(suivantes)
+        self.non_synchronisees = 0
+
+    def fermer(self):
+        self.synchroniser()
+        self.fichier.close()
+
+
+# lit etat.json : {"sequence": derniere opération du journal contenue dans le snapshot,
+#                  "snapshot": dossier de la génération courante} ({} si le dossier n'a pas encore de snapshot)
+def lire_etat_snapshot(dossier):
+    etat = Path(dossier) / "etat.json"
+    if not etat.exists():
+        return {}
+    return json.loads(etat.read_text(encoding="utf-8"))
+
+# lit le numéro de la derniere opération contenue dans le snapshot d'un dossier
+def lire_sequence_snapshot(dossier):
+    return int(lire_etat_snapshot(dossier).get("sequence", 0))
+
+# lit le numéro de la derniere opération écrite dans un fichier journal
+def derniere_sequence_journal(chemin):
+    derniere = 0
+    if Path(chemin).exists():
+        for operation in lire_journal(chemin):
+            derniere = operation["seq"]
+    return derniere
+
+# parcourt les opérations d'un fichier journal (une derniere ligne incomplete, écrite pendant un arret brutal, est ignorée)
+def lire_journal(chemin):
+    with open(chemin, encoding="utf-8") as fichier:
+        for ligne in fichier:
+            if not ligne.endswith("\n"):
+                print("Derniere opération du journal incomplete, ignorée.")
+                break
+            if ligne.strip():
+                yield json.loads(ligne)
+
+
+# -------------------------------
+# Archive des anciens emprunts (segments compressés, jamais modifiés apres écriture)
+# -------------------------------
+# un segment : en-tete (signature, version, nombre de lignes) puis chaque colonne du registre compressée
+# par zlib et précédée de sa taille. Les lignes sont rangées par id. index.json décrit les segments
+# (bornes des id et des dates, lecteurs et livres présents) : une requete ne décompresse que les
+# segments qui contiennent le lecteur, le livre ou l'id cherché.
+SIGNATURE_SEGMENT = b"BIBLARCH"
+VERSION_SEGMENT = 1
+EN_TETE_SEGMENT = struct.Struct("<8sIQ")
+TAILLE_BLOC_SEGMENT = struct.Struct("<Q")
+NB_SEGMENTS_EN_CACHE = 8                        # segments décompressés gardés en mémoire
+
+
+class ArchiveEmprunts:
+    # ouvre (ou crée) le dossier d'archive ; l'index est reconstruit depuis les segments s'il manque
+    def __init__(self, dossier=DOSSIER_ARCHIVE_DEFAUT):
+        self.dossier = Path(dossier)
+        self.dossier.mkdir(parents=True, exist_ok=True)
+        self.chemin_index = self.dossier / "index.json"
+        self.segments = []                          # description de chaque segment (voir _decrire_segment)
+        self.par_lecteur = {}                       # id lecteur -> numéros des segments qui le contiennent
+        self.par_livre = {}                         # id livre -> numéros des segments qui le contiennent
+        self._cache = {}                            # numéro de segment -> RegistreEmprunts décompressé
+        if self.chemin_index.exists():
+            segments = json.loads(self.chemin_index.read_text(encoding="utf-8"))["segments"]
+        else:
+            segments = [self._decrire_segment(chemin.name, self._lire_segment(chemin))
+                        for chemin in sorted(self.dossier.glob("segment-*.seg"))]
+        for description in segments:
+            self._indexer_segment(description)
+
+    def __len__(self):
+        return sum(description["lignes"] for description in self.segments)
+
+    def dernier_id(self):
+        return max((description["id_max"] for description in self.segments), default=0)
+
+    # --- écriture ---
+
+    # écrit les emprunts d'un registre dans un nouveau segment, puis met l'index a jour
+    def ajouter_segment(self, registre):
+        registre._trier()
+        # un segment n'est jamais réécrit : on prend le premier numéro libre
+        numero = len(self.segments) + 1
+        while (self.dossier / f"segment-{numero:06d}.seg").exists():
+            numero += 1
+        nom = f"segment-{numero:06d}.seg"
+        blocs = [zlib.compress(getattr(registre, colonne).tobytes(), 6) for colonne in COLONNES_REGISTRE]
+        chemin = self.dossier / nom
+        temporaire = Path(str(chemin) + ".tmp")
+        with open(temporaire, "wb") as fichier:
+            fichier.write(EN_TETE_SEGMENT.pack(SIGNATURE_SEGMENT, VERSION_SEGMENT, len(registre)))
+            for bloc in blocs:
+                fichier.write(TAILLE_BLOC_SEGMENT.pack(len(bloc)))
+                fichier.write(bloc)
+            fichier.flush()
+            os.fsync(fichier.fileno())
+        os.replace(temporaire, chemin)
+
+        description = self._decrire_segment(nom, registre)
+        self._indexer_segment(description)
+        ecrire_fichier_atomique(self.chemin_index, json.dumps({"segments": self.segments}, ensure_ascii=False))
+        return description
+
+    def _decrire_segment(self, nom, registre):
+        return {
+            "fichier": nom,
+            "lignes": len(registre),
+            "octets": (self.dossier / nom).stat().st_size,
+            "id_min": registre.ids[0] if len(registre) else 0,
+            "id_max": registre.ids[-1] if len(registre) else 0,
+            "retour_min": _iso(_s_vers_date(min(registre.dates_retour_effective, default=SANS_DATE))),
+            "retour_max": _iso(_s_vers_date(max(registre.dates_retour_effective, default=SANS_DATE))),
+            "lecteurs": sorted(set(registre.lecteur_ids)),
+            "livres": sorted(set(registre.livre_ids)),
+        }
+
+    def _indexer_segment(self, description):
+        numero = len(self.segments)
+        self.segments.append(description)
+        for lecteur_id in description["lecteurs"]:
+            self.par_lecteur.setdefault(lecteur_id, []).append(numero)
+        for livre_id in description["livres"]:
+            self.par_livre.setdefault(livre_id, []).append(numero)
+
+    # --- lecture ---
+
+    def _lire_segment(self, chemin):
+        with open(chemin, "rb") as fichier:
+            donnees = fichier.read()
+        signature, version, lignes = EN_TETE_SEGMENT.unpack_from(donnees)
+        if signature != SIGNATURE_SEGMENT or version != VERSION_SEGMENT:
+            raise ValueError(f"{chemin} n'est pas un segment d'archive valide.")
+        registre = RegistreEmprunts()
+        position = EN_TETE_SEGMENT.size
+        for colonne in COLONNES_REGISTRE:
+            (taille,) = TAILLE_BLOC_SEGMENT.unpack_from(donnees, position)
+            position += TAILLE_BLOC_SEGMENT.size
+            valeurs = array("q")
+            valeurs.frombytes(zlib.decompress(donnees[position:position + taille]))
+            setattr(registre, colonne, valeurs)
+            position += taille
+        if len(registre.ids) != lignes:
+            raise ValueError(f"{chemin} : {len(registre.ids)} ligne(s) lue(s) au lieu de {lignes}.")
+        # seuls des emprunts rendus sont archivés
+        registre.retournes = _bitmap_depuis_masque(bytes(lignes))
+        return registre
+
+    # registre d'un segment (décompressé a la premiere demande, puis gardé dans un petit cache)
+    def segment(self, numero):
+        registre = self._cache.pop(numero, None)
+        if registre is None:
+            registre = self._lire_segment(self.dossier / self.segments[numero]["fichier"])
+        self._cache[numero] = registre
+        if len(self._cache) > NB_SEGMENTS_EN_CACHE:
+            del self._cache[next(iter(self._cache))]
+        return registre
+
+    # emprunts archivés d'un lecteur, par id croissant
+    def emprunts_du_lecteur(self, lecteur_id):
+        return self._chercher(self.par_lecteur.get(lecteur_id, ()), "lecteur_ids", lecteur_id)
+
+    # emprunts archivés d'un livre, par id croissant
+    def emprunts_du_livre(self, livre_id):
+        return self._chercher(self.par_livre.get(livre_id, ()), "livre_ids", livre_id)
+
+    def _chercher(self, numeros, colonne, valeur):
+        resultats = []
+        for numero in numeros:
+            registre = self.segment(numero)
+            resultats.extend(EmpruntVue(registre, i) for i, v in enumerate(getattr(registre, colonne)) if v == valeur)
+        return resultats
+
+    def get(self, emprunt_id, defaut=None):
+        for numero, description in enumerate(self.segments):
+            if description["id_min"] <= emprunt_id <= description["id_max"]:
+                emprunt = self.segment(numero).get(emprunt_id)
+                if emprunt is not None:
+                    return emprunt
+        return defaut
+
+    # tous les emprunts archivés, segment par segment
+    def values(self):
+        for numero in range(len(self.segments)):
+            yield from self.segment(numero).values()
+
+
+# -------------------------------
+# Instrumentation (nombre d'appels et histogramme des latences par opération)
+# -------------------------------
+# bornes supérieures des tranches de l'histogramme des latences, en secondes
+BORNES_LATENCE = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                  1.0, 2.5, 5.0, float("inf"))
+
+# méthodes de Bibliotheque mesurées quand l'instrumentation est active
+OPERATIONS_INSTRUMENTEES = (
+    "ajouter_livre", "importer_livres", "modifier_livre", "supprimer_livre", "rechercher_livre", "chercher_livres",
+    "ajouter_utilisateur", "emprunter_livre", "rendre_livre", "emprunter_lot", "rendre_lot",
+    "reserver_livre", "annuler_reservation",
+    "lister_emprunts_en_cours", "lister_emprunts_en_retard", "statistiques", "donnees_statistiques",
+)
+
+
+class Instrumentation:
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.debut = time.perf_counter()
+        self.operations = {}                        # nom -> {"appels", "erreurs", "total_s", "max_s", "tranches"}
+
+    # enveloppe une fonction pour mesurer chacun de ses appels sous le nom donné
+    def envelopper(self, nom, fonction):
+        enregistrer = self.enregistrer
+        horloge = time.perf_counter
+
+        def mesuree(*args, **kwargs):
+            debut = horloge()
+            erreur = True
+            try:
+                resultat = fonction(*args, **kwargs)
+                erreur = False
+                return resultat
+            finally:
+                enregistrer(nom, horloge() - debut, erreur)
+        mesuree.__name__ = getattr(fonction, "__name__", nom)
+        mesuree.__wrapped__ = fonction
+        return mesuree
+
+    @contextmanager
+    def mesurer(self, nom):
+        debut = time.perf_counter()
+        erreur = True
+        try:
+            yield
+            erreur = False
+        finally:
+            self.enregistrer(nom, time.perf_counter() - debut, erreur)
+
+    def enregistrer(self, nom, duree, erreur=False):
+        with self.verrou:
+            stats = self.operations.get(nom)
+            if stats is None:
+                stats = self.operations[nom] = {"appels": 0, "erreurs": 0, "total_s": 0.0, "max_s": 0.0,
+                                                "tranches": [0] * len(BORNES_LATENCE)}
+            stats["appels"] += 1
+            stats["erreurs"] += erreur
+            stats["total_s"] += duree
+            if duree > stats["max_s"]:
+                stats["max_s"] = duree
+            stats["tranches"][bisect_left(BORNES_LATENCE, duree)] += 1
+
+    def remettre_a_zero(self):
+        with self.verrou:
+            self.operations = {}
+            self.debut = time.perf_counter()
+
+    # copie des mesures : {nom: {appels, erreurs, total_s, moyenne_ms, max_ms, p50_ms, p99_ms, debit_par_s,
+    # histogramme: {borne: nombre d'appels dans la tranche}}}
+    def instantane(self):
+        with self.verrou:
+            operations = {nom: dict(stats, tranches=list(stats["tranches"])) for nom, stats in self.operations.items()}
+            ecoule = max(time.perf_counter() - self.debut, 1e-9)
+        resultat = {}
+        for nom, stats in sorted(operations.items()):
+            appels = stats["appels"]
+            resultat[nom] = {
+                "appels": appels,
+                "erreurs": stats["erreurs"],
+                "total_s": stats["total_s"],
+                "moyenne_ms": stats["total_s"] / appels * 1000,
+                "max_ms": stats["max_s"] * 1000,
+                "p50_ms": _quantile_tranches(stats["tranches"], appels, 0.50) * 1000,
+                "p99_ms": _quantile_tranches(stats["tranches"], appels, 0.99) * 1000,
+                "debit_par_s": appels / ecoule,
+                "histogramme": {borne: n for borne, n in zip(BORNES_LATENCE, stats["tranches"]) if n},
+            }
+        return resultat
+
+    # tableau lisible pour la console
+    def texte(self):
+        mesures = self.instantane()
+        if not mesures:
+            return "Aucune opération mesurée."
+        lignes = [f"{'opération':<26}{'appels':>8}{'erreurs':>8}{'moy. ms':>10}{'p50 ms':>10}{'p99 ms':>10}"
+                  f"{'max ms':>10}{'op/s':>10}"]
+        for nom, m in mesures.items():
+            lignes.append(f"{nom:<26}{m['appels']:>8}{m['erreurs']:>8}{m['moyenne_ms']:>10.3f}{m['p50_ms']:>10.3f}"
+                          f"{m['p99_ms']:>10.3f}{m['max_ms']:>10.3f}{m['debit_par_s']:>10.1f}")
+        return "\n".join(lignes)
+
+    # format texte de Prometheus : un histogramme par opération et un compteur d'erreurs
+    def prometheus(self, prefixe="bibliotheque"):
+        with self.verrou:
+            operations = {nom: dict(stats, tranches=list(stats["tranches"])) for nom, stats in self.operations.items()}
+        nom_histo = f"{prefixe}_operation_duree_secondes"
+        lignes = [f"# HELP {nom_histo} Durée des opérations de la bibliothèque.",
+                  f"# TYPE {nom_histo} histogram"]
+        for nom, stats in sorted(operations.items()):
+            cumul = 0
+            for borne, n in zip(BORNES_LATENCE, stats["tranches"]):
+                cumul += n
+                le = "+Inf" if borne == float("inf") else repr(borne)
+                lignes.append(f'{nom_histo}_bucket{{operation="{nom}",le="{le}"}} {cumul}')
+            lignes.append(f'{nom_histo}_sum{{operation="{nom}"}} {stats["total_s"]!r}')
+            lignes.append(f'{nom_histo}_count{{operation="{nom}"}} {stats["appels"]}')
+        nom_erreurs = f"{prefixe}_operation_erreurs_total"
+        lignes += [f"# HELP {nom_erreurs} Appels terminés par une exception.", f"# TYPE {nom_erreurs} counter"]
+        for nom, stats in sorted(operations.items()):
+            lignes.append(f'{nom_erreurs}{{operation="{nom}"}} {stats["erreurs"]}')
+        return "\n".join(lignes) + "\n"
+
+
+# quantile estimé a partir de l'histogramme : borne supérieure de la tranche qui le contient
+# (pour la derniere tranche, sans borne, on ne peut rien dire de mieux que la borne précédente)
+def _quantile_tranches(tranches, total, q):
+    rang = q * total
+    cumul = 0
+    for i, n in enumerate(tranches):
+        cumul += n
+        if cumul >= rang:
+            return BORNES_LATENCE[i] if i < len(BORNES_LATENCE) - 1 else BORNES_LATENCE[-2]
+    return BORNES_LATENCE[-2]
+
+
+# mesure un bloc sous le nom donné si la bibliothèque est instrumentée (sauvegarde, chargement...)
+def mesurer_operation(biblio, nom):
+    instrumentation = getattr(biblio, "instrumentation", None)
+    return nullcontext() if instrumentation is None else instrumentation.mesurer(nom)
+
+
+# copie des données sauvegardées d'une Bibliotheque (livres, utilisateurs, emprunts, réservations), prise
+# sous verrou_index par Bibliotheque.instantane : les fonctions de sauvegarde la lisent comme une Bibliotheque
+# pendant que les emprunts et retours continuent sur l'originale
+class InstantaneBibliotheque:
+    def __init__(self, biblio):
+        self.livres = {}
+        for livre_id, livre in biblio.livres.items():
+            copie = Livre(livre.titre, livre.auteur, livre.categorie, livre.exemplaires, livre.id)
+            copie.statut = livre.statut
+            self.livres[livre_id] = copie
+        # les champs sauvegardés d'un utilisateur ne changent pas : les objets sont partagés
+        self.utilisateurs = dict(biblio.utilisateurs)
+        self.emprunts = biblio.emprunts.copie()
+        self.reservations = biblio.donnees_reservations()
+        self.journal = None
+        self.verrou_index = nullcontext()
+
+    def donnees_reservations(self):
+        return self.reservations
+
+    def instantane(self):
+        return self
+
+
 # -------------------------------
 # Classe Bibliotheque                                                                           
 # -------------------------------
@@ -146,10 +951,90 @@ class Bibliotheque:
         #defintion des attributs
         self.nom = nom
         self.adresse = adresse
-        self.livres = []
+        self.journal = None                         # journal des modifications (mode de sauvegarde "journal")
+        self.stockage = None                        # stockage qui recoit chaque modification (ex: StockageSQLite)
+        self.verrous_livres = None                  # verrous par livre et par lecteur (mode concurrent seulement)
+        self.verrous_lecteurs = None
+        self.verrou_index = nullcontext()           # protege les index partagés (un vrai verrou en mode concurrent)
+        self.instrumentation = None                 # mesures des opérations (voir activer_instrumentation)
+        self.archive = None                         # anciens emprunts rendus, sur disque (voir archiver_emprunts)
+        self.reinitialiser()
+
+    # instrumentation : les méthodes de OPERATIONS_INSTRUMENTEES sont remplacées, pour cette bibliothèque
+    # seulement, par des versions mesurées. Désactivée, il n'y a plus aucune enveloppe (cout nul).
+    def activer_instrumentation(self):
+        if self.instrumentation is not None:
+            return self.instrumentation
+        self.instrumentation = Instrumentation()
+        for nom in OPERATIONS_INSTRUMENTEES:
+            setattr(self, nom, self.instrumentation.envelopper(nom, getattr(self, nom)))
+        return self.instrumentation
+
+    def desactiver_instrumentation(self):
+        for nom in OPERATIONS_INSTRUMENTEES:
+            self.__dict__.pop(nom, None)
+        self.instrumentation = None
+
+    # mode concurrent : plusieurs guichets (threads) travaillent sur la meme bibliothèque
+    # un emprunt ou un retour prend le verrou du livre et celui du lecteur (répartis sur nb_verrous verrous)
+    # puis verrou_index, sous lequel se font les vérifications (stock, mises de côté, livres du lecteur)
+    # et les modifications : les réservations et les expirations changent ces structures sous verrou_index seul
+    def activer_mode_concurrent(self, nb_verrous=NB_VERROUS_CONCURRENTS):
+        self.verrous_livres = [threading.Lock() for _ in range(nb_verrous)]
+        self.verrous_lecteurs = [threading.Lock() for _ in range(nb_verrous)]
+        self.verrou_index = threading.RLock()
+
+    def desactiver_mode_concurrent(self):
+        self.verrous_livres = None
+        self.verrous_lecteurs = None
+        self.verrou_index = nullcontext()
+
+    # vue cohérente des données pour une sauvegarde ou un rapport. En mode concurrent, une copie prise
+    # sous verrou_index (le temps de copier les colonnes, pas celui d'écrire les fichiers) ;
+    # sinon la bibliothèque elle-meme
+    def instantane(self):
+        if self.verrous_livres is None:
+            return self
+        with self.verrou_index:
+            return InstantaneBibliotheque(self)
+
+    # prend les verrous des livres et lecteurs donnés, toujours dans le meme ordre (livres puis lecteurs,
+    # par numéro croissant) pour que deux guichets ne puissent pas s'attendre l'un l'autre
+    def _verrouiller(self, livre_ids=(), lecteur_ids=()):
+        if self.verrous_livres is None:
+            return nullcontext()
+        n = len(self.verrous_livres)
+        pile = ExitStack()
+        for i in sorted({hash(livre_id) % n for livre_id in livre_ids}):
+            pile.enter_context(self.verrous_livres[i])
+        for i in sorted({hash(lecteur_id) % n for lecteur_id in lecteur_ids}):
+            pile.enter_context(self.verrous_lecteurs[i])
+        return pile
+
+    # remise a zero de toutes les structures (utilisée aussi avant un rechargement)
+    def reinitialiser(self):
+        self.livres = {}                            # index des livres par id (l'ordre d'insertion est conservé)
+        self.index_titre_auteur = {}                # (titre, auteur) normalisés -> id du livre
+        self.index_recherche = {}                   # champ -> mot -> ids des livres (index inversé)
+        self.vocabulaire = {}                       # champ -> liste triée des mots (recherche par préfixe)
+        self.mots_en_attente = {}                   # champ -> mots pas encore insérés dans le vocabulaire trié
+        self.index_statut = {}                      # statut normalisé -> ids des livres
         self.utilisateurs = {}
-        self.emprunts = {}
-        self.emprunts_par_lecteur = {}
+        self.index_emails = {}                      # email normalisé -> utilisateur
+        self.emprunts = RegistreEmprunts()          # tous les emprunts, rangés en colonnes (id -> EmpruntVue)
+        self.emprunts_par_lecteur = {}              # id lecteur -> tableau des ids de ses emprunts
+        self.emprunts_actifs_par_livre = {}         # id livre -> ids des emprunts non retournés
+        self.emprunts_actifs_par_lecteur = {}       # id lecteur -> ids des emprunts non retournés
+        self.echeances = []                         # (date de retour prévue en secondes, id) des emprunts non retournés, triés
+        # compteurs tenus a jour par chaque modification (statistiques sans parcourir les données)
+        self.compteurs = {"lecteurs": 0, "bibliothecaires": 0, "emprunts_actifs": 0, "exemplaires_disponibles": 0}
+        self.livres_par_categorie = {}              # categorie -> nombre de livres
+        # réservations : une file par livre, les entrées annulées y restent et sont sautées au passage
+        self.files_reservation = {}                 # id livre -> deque de (numéro de réservation, id lecteur)
+        self.reservations = {}                      # (id livre, id lecteur) -> numéro de la réservation en attente
+        self.numero_reservation = 0
+        self.mises_de_cote = {}                     # id livre -> {id lecteur: expiration en secondes}
+        self.expirations = []                       # tas des (expiration, id livre, id lecteur), entrées périmées comprises
 
     #Définition des methodes 
     
@@ -159,12 +1044,76 @@ class Bibliotheque:
 
     # --- Gestion des livres --- 
 
-    # methode qui permet de chercher un livre dans la bibliotheque
+    # methode qui permet de chercher un livre dans la bibliotheque (acces direct par l'index des id)
     def _trouver_livre_par_id(self, livre_id):
-        for l in self.livres:
-            if l.id == livre_id:
-                return l
-        return None
+        return self.livres.get(livre_id)
+
+    # enregistre un livre dans les index de la bibliotheque
+    def _indexer_livre(self, livre):
+        # un livre deja présent avec le meme id est remplacé
+        ancien = self.livres.get(livre.id)
+        if ancien is not None:
+            self._desindexer_champs_livre(ancien)
+        self.livres[livre.id] = livre
+        self._indexer_champs_livre(livre)
+
+    # retire un livre des index de la bibliotheque
+    def _desindexer_livre(self, livre):
+        self.livres.pop(livre.id, None)
+        self._desindexer_champs_livre(livre)
+        # les réservations du livre disparaissent avec lui
+        for numero, lecteur_id in self.files_reservation.pop(livre.id, ()):
+            if self.reservations.get((livre.id, lecteur_id)) == numero:
+                del self.reservations[(livre.id, lecteur_id)]
+        self.mises_de_cote.pop(livre.id, None)
+
+    # index construits a partir des champs du livre (a refaire quand ces champs changent)
+    def _indexer_champs_livre(self, livre):
+        self.index_titre_auteur[cle_titre_auteur(livre.titre, livre.auteur)] = livre.id
+        for champ in POIDS_CHAMPS_RECHERCHE:
+            index_champ = self.index_recherche.setdefault(champ, {})
+            for mot in set(tokeniser(getattr(livre, champ))):
+                ids = index_champ.get(mot)
+                if ids is None:
+                    ids = index_champ[mot] = set()
+                    self.mots_en_attente.setdefault(champ, []).append(mot)
+                ids.add(livre.id)
+        self.index_statut.setdefault(Nettoyer(livre.statut), set()).add(livre.id)
+        self.compteurs["exemplaires_disponibles"] += livre.exemplaires
+        self.livres_par_categorie[livre.categorie] = self.livres_par_categorie.get(livre.categorie, 0) + 1
+
+    def _desindexer_champs_livre(self, livre):
+        cle = cle_titre_auteur(livre.titre, livre.auteur)
+        if self.index_titre_auteur.get(cle) == livre.id:
+            del self.index_titre_auteur[cle]
+        for champ in POIDS_CHAMPS_RECHERCHE:
+            index_champ = self.index_recherche.get(champ, {})
+            for mot in set(tokeniser(getattr(livre, champ))):
+                ids = index_champ.get(mot)
+                if ids is not None:
+                    ids.discard(livre.id)
+                    # le mot reste dans le vocabulaire trié, il est ignoré tant qu'il n'a plus de livre
+                    if not ids:
+                        del index_champ[mot]
+        self.index_statut.get(Nettoyer(livre.statut), set()).discard(livre.id)
+        self.compteurs["exemplaires_disponibles"] -= livre.exemplaires
+        reste = self.livres_par_categorie.get(livre.categorie, 0) - 1
+        if reste > 0:
+            self.livres_par_categorie[livre.categorie] = reste
+        else:
+            self.livres_par_categorie.pop(livre.categorie, None)
+
+    # change le stock d'un livre en gardant l'index des statuts a jour
+    def _changer_stock(self, livre, delta):
+        self.index_statut.get(Nettoyer(livre.statut), set()).discard(livre.id)
+        livre.exemplaires += delta
+        self.compteurs["exemplaires_disponibles"] += delta
+        livre.mettre_a_jour_statut()
+        self.index_statut.setdefault(Nettoyer(livre.statut), set()).add(livre.id)
+
+    # methode qui verifie si un livre avec ce titre et cet auteur existe deja
+    def livre_existe(self, titre, auteur):
+        return cle_titre_auteur(titre, auteur) in self.index_titre_auteur
 
     # methode qui sert a rajouter des livres a la bibliotheque
     def ajouter_livre(self, livre, utilisateur):
@@ -174,16 +1123,43 @@ class Bibliotheque:
             print("Accès refusé car seul le bibliothécaire peut ajouter ou modifier les livres.")
             return False
         
-        # voir si le livre existe deja en comparant les titres et l'auteur
-        for l in self.livres:
-            if (Nettoyer(l.titre), Nettoyer(l.auteur)) == (Nettoyer(livre.titre), Nettoyer(livre.auteur)):
+        with self.verrou_index:
+            # voir si le livre existe deja en comparant les titres et l'auteur (index normalisé)
+            if self.livre_existe(livre.titre, livre.auteur):
                 print("Ce livre existe déjà (même titre + auteur).")
                 return False
-        # Rajouter le livre à la bibliotheque
-        self.livres.append(livre)
+            # Rajouter le livre à la bibliotheque
+            with self._journaliser("ajout_livre", **donnees_livre(livre)):
+                self._indexer_livre(livre)
+        self._compacter_si_necessaire()
         print(f"Livre ajouté : {livre.titre}")
         return True
 
+    # methode d'import en masse d'un catalogue (sans affichage livre par livre)
+    # retourne le nombre de livres ajoutés et la liste des doublons ignorés
+    def importer_livres(self, livres, utilisateur):
+        if not self.est_bibliothecaire(utilisateur):
+            print("Accès refusé car seul le bibliothécaire peut ajouter ou modifier les livres.")
+            return 0, []
+
+        doublons = []
+        nouveaux = {}                               # (titre, auteur) normalisés -> livre a ajouter
+        with self.verrou_index:
+            for livre in livres:
+                cle = cle_titre_auteur(livre.titre, livre.auteur)
+                if cle in self.index_titre_auteur or cle in nouveaux:
+                    doublons.append(livre)
+                    continue
+                nouveaux[cle] = livre
+            with self._journaliser_lot([dict(op="ajout_livre", **donnees_livre(l)) for l in nouveaux.values()]):
+                for livre in nouveaux.values():
+                    self._indexer_livre(livre)
+        self._compacter_si_necessaire()
+        ajoutes = len(nouveaux)
+
+        print(f"Import terminé : {ajoutes} livre(s) ajouté(s), {len(doublons)} doublon(s) ignoré(s).")
+        return ajoutes, doublons
+
     # methode pour modifier les livres
     def modifier_livre(self, livre_id, utilisateur, **champs):
 
@@ -192,26 +1168,49 @@ class Bibliotheque:
             print("Accès refusé car seul le bibliothécaire peut ajouter ou modifier les livres.")
             return False
         
-        # chercher le livre dans labibliotheque
-        livre = self._trouver_livre_par_id(livre_id)
-        if not livre:
-            print("Livre introuvable.")
-            return False
+        with self._verrouiller((livre_id,)), self.verrou_index:
+            # chercher le livre dans labibliotheque
+            livre = self._trouver_livre_par_id(livre_id)
+            if not livre:
+                print("Livre introuvable.")
+                return False
         
+            # un autre livre ne doit pas deja avoir le nouveau couple titre + auteur
+            nouvelle_cle = cle_titre_auteur(champs.get('titre', livre.titre), champs.get('auteur', livre.auteur))
+            id_existant = self.index_titre_auteur.get(nouvelle_cle)
+            if id_existant is not None and id_existant != livre.id:
+                print("Un autre livre existe déjà avec ce titre et cet auteur.")
+                return False
+
+            # on ne garde que les champs modifiables
+            modifications = {c: champs[c] for c in ('titre', 'auteur', 'categorie') if c in champs}
+            if 'exemplaires' in champs:
+                modifications['exemplaires'] = max(0, int(champs['exemplaires']))
+
+            with self._journaliser("modif_livre", id=livre.id, champs=modifications):
+                self._appliquer_modification(livre, modifications)
+        self._compacter_si_necessaire()
+        print("Livre modifié avec succès.")
+        return True
+
+    # applique des champs deja vérifiés a un livre en gardant les index a jour
+    def _appliquer_modification(self, livre, modifications):
+        # on retire le livre des index avant de changer les champs indexés
+        self._desindexer_champs_livre(livre)
+
         # la modification du livre selon le champs 
-        if 'titre' in champs:
-            livre.titre = champs['titre']
-        if 'auteur' in champs:
-            livre.auteur = champs['auteur']
-        if 'categorie' in champs:
-            livre.categorie = champs['categorie']
-        if 'exemplaires' in champs:
-            livre.exemplaires = max(0, int(champs['exemplaires']))
+        if 'titre' in modifications:
+            livre.titre = modifications['titre']
+        if 'auteur' in modifications:
+            livre.auteur = modifications['auteur']
+        if 'categorie' in modifications:
+            livre.categorie = modifications['categorie']
+        if 'exemplaires' in modifications:
+            livre.exemplaires = modifications['exemplaires']
         
         #mise a jour du statut de livre
         livre.mettre_a_jour_statut()
-        print("Livre modifié avec succès.")
-        return True
+        self._indexer_champs_livre(livre)
 
     # methode de supprission d'un livre
     def supprimer_livre(self, livre_id, utilisateur):
@@ -227,10 +1226,9 @@ class Bibliotheque:
             return False
         
         # verifier si il y a un emprunt en cour
-        for emprunt in self.emprunts.values():
-            if emprunt.livre_id == livre_id and not emprunt.retourne:
-                print("Impossible de supprimer un livre emprunté.")
-                return False
+        if self.livre_est_emprunte(livre_id):
+            print("Impossible de supprimer un livre emprunté.")
+            return False
 
         # demander la confirmation de la demande de suppression    
         confirmation = Nettoyer(input(f"Confirmer la suppression du livre '{livre.titre}' ? (y/n) : "))
@@ -238,8 +1236,14 @@ class Bibliotheque:
             print("Suppression annulée.")
             return False
 
-        #supprimer le livre de la liste de la bibliotheque   
-        self.livres.remove(livre)
+        #supprimer le livre de la liste de la bibliotheque (un emprunt a pu etre fait pendant la confirmation)
+        with self._verrouiller((livre_id,)), self.verrou_index:
+            if self.livre_est_emprunte(livre_id):
+                print("Impossible de supprimer un livre emprunté.")
+                return False
+            with self._journaliser("suppr_livre", id=livre.id):
+                self._desindexer_livre(livre)
+        self._compacter_si_necessaire()
         print("Le livre '{livre.titre}' est supprimé avec succés.")
         return True
     
@@ -251,35 +1255,109 @@ class Bibliotheque:
             print("Pas de livre est disponible.")
             return
         #tri des livres par ordre alphabetique des titres
-        for l in sorted(self.livres, key=lambda livre: livre.titre.lower()):
+        for l in sorted(self.livres.values(), key=lambda livre: livre.titre.lower()):
             print(l.afficher())
 
-    #methode de recheche avancée des livres
-    def rechercher_livre(self, critere, valeur):
+    # retourne la liste triée des mots d'un champ (les nouveaux mots sont insérés a la demande)
+    def _vocabulaire_trie(self, champ):
+        vocabulaire = self.vocabulaire.setdefault(champ, [])
+        nouveaux = self.mots_en_attente.pop(champ, [])
+        if len(nouveaux) > 64:
+            # beaucoup de nouveaux mots (import en masse) : on retrie tout en une fois
+            vocabulaire.extend(nouveaux)
+            vocabulaire = sorted(set(vocabulaire) & self.index_recherche.get(champ, {}).keys())
+            self.vocabulaire[champ] = vocabulaire
+        else:
+            for mot in nouveaux:
+                i = bisect_left(vocabulaire, mot)
+                if i == len(vocabulaire) or vocabulaire[i] != mot:
+                    vocabulaire.insert(i, mot)
+        return vocabulaire
+
+    # score de chaque livre qui contient un mot commençant par le mot recherché
+    # (mot identique = 2 points, simple préfixe = 1 point, multiplié par le poids du champ)
+    def _scores_mot(self, mot, champs):
+        groupes = {}                                # points -> ensembles d'ids qui les obtiennent
+        for champ in champs:
+            poids = POIDS_CHAMPS_RECHERCHE[champ]
+            index_champ = self.index_recherche.get(champ, {})
+            vocabulaire = self._vocabulaire_trie(champ)
+            i = bisect_left(vocabulaire, mot)
+            while i < len(vocabulaire) and vocabulaire[i].startswith(mot):
+                candidat = vocabulaire[i]
+                i += 1
+                ids = index_champ.get(candidat)
+                if not ids:
+                    continue
+                points = poids * (2 if candidat == mot else 1)
+                groupes.setdefault(points, []).append(ids)
+
+        # chaque livre garde son meilleur score : les points les plus forts sont appliqués en dernier
+        scores = {}
+        for points in sorted(groupes):
+            for ids in groupes[points]:
+                scores.update(dict.fromkeys(ids, points))
+        return scores
+
+    # recherche par l'index inversé : retourne les livres classés par pertinence
+    # critere = titre / auteur / categorie / disponibilite, ou None pour chercher dans tous les champs
+    # limite = nombre maximum de résultats (None pour tout), decalage = nombre de résultats a sauter
+    def chercher_livres(self, valeur, critere=None, limite=20, decalage=0):
+        return self._chercher_livres(valeur, critere, limite, decalage)
+
+    # rechercher_livre appelle directement cette version : avec l'instrumentation, une recherche du menu
+    # n'est comptée qu'une fois (sous rechercher_livre), pas aussi sous chercher_livres
+    def _chercher_livres(self, valeur, critere, limite, decalage):
+        critere = Nettoyer(critere) or None
+        decalage = max(0, decalage)
+
+        # la disponibilité est une égalité exacte sur le statut
+        if critere == "disponibilite":
+            ids = self.index_statut.get(Nettoyer(valeur), set())
+            if limite is None:
+                ids_tries = sorted(ids)[decalage:]
+            else:
+                ids_tries = heapq.nsmallest(decalage + limite, ids)[decalage:]
+            return [self.livres[i] for i in ids_tries]
 
-        #nettoyage des textes de criteres
-        critere = Nettoyer(critere)
-        valeur = Nettoyer(valeur)
+        if critere is None:
+            champs = tuple(POIDS_CHAMPS_RECHERCHE)
+        elif critere in POIDS_CHAMPS_RECHERCHE:
+            champs = (critere,)
+        else:
+            return []
 
-        #liste de stockage des resultat trouvé
-        resultats = []
+        mots = list(dict.fromkeys(tokeniser(valeur)))
+        if not mots:
+            return []
+
+        # chaque mot recherché doit etre trouvé : on part du mot le plus sélectif
+        scores_par_mot = sorted((self._scores_mot(mot, champs) for mot in mots), key=len)
+        premier, autres_mots = scores_par_mot[0], scores_par_mot[1:]
+        if not autres_mots:
+            totaux = premier
+        else:
+            totaux = {}
+            for livre_id, points in premier.items():
+                for autres in autres_mots:
+                    p = autres.get(livre_id)
+                    if p is None:
+                        break
+                    points += p
+                else:
+                    totaux[livre_id] = points
+
+        # classement : meilleur score d'abord, puis l'id le plus ancien
+        if limite is None:
+            meilleurs = sorted(totaux.items(), key=lambda t: (-t[1], t[0]))[decalage:]
+        else:
+            meilleurs = heapq.nsmallest(decalage + limite, totaux.items(), key=lambda t: (-t[1], t[0]))[decalage:]
+        return [self.livres[livre_id] for livre_id, _ in meilleurs]
+
+    #methode de recheche avancée des livres (affichage des résultats de chercher_livres)
+    def rechercher_livre(self, critere, valeur):
+        resultats = self._chercher_livres(valeur, critere, None, 0)
 
-        #parcourir les livres existants de la bibliotheque en le nettoyant
-        for l in self.livres:
-            titre = Nettoyer(l.titre)
-            auteur = Nettoyer(l.auteur)
-            categorie = Nettoyer(l.categorie)
-            dispo = Nettoyer(l.statut)
-
-        # comparaison selon le critere écrit
-            if critere == "titre" and valeur in titre:
-                resultats.append(l)
-            elif critere == "auteur" and valeur in auteur:
-                resultats.append(l)
-            elif critere == "categorie" and valeur in categorie:
-                resultats.append(l)
-            elif critere == "disponibilite" and valeur == dispo:
-                resultats.append(l)
         # cas de resultat vide        
         if not resultats:
             print("Aucun résultat est troouvé")
@@ -291,27 +1369,45 @@ class Bibliotheque:
 
     # --- Utilisateurs --- 
 
-    # methode pour trouver un utilisateur par son email
+    # methode pour trouver un utilisateur par son email (index normalisé, sans parcourir les utilisateurs)
     def trouver_utilisateur_par_email(self, email):
-        for utilisateur in self.utilisateurs.values():
-            if utilisateur.email.lower() == email.lower():
-                return utilisateur
-        return None
+        return self.index_emails.get(Nettoyer(email))
+
+    # methode qui verifie si un email est deja utilisé
+    def email_existe(self, email):
+        return Nettoyer(email) in self.index_emails
+
+    # enregistre un utilisateur dans le dictionnaire et dans l'index des emails
+    def _indexer_utilisateur(self, utilisateur):
+        # un utilisateur deja présent avec le meme id est remplacé
+        ancien = self.utilisateurs.get(utilisateur.id)
+        if ancien is not None:
+            self.index_emails.pop(Nettoyer(ancien.email), None)
+            if cle_compteur_utilisateur(ancien):
+                self.compteurs[cle_compteur_utilisateur(ancien)] -= 1
+        self.utilisateurs[utilisateur.id] = utilisateur
+        self.index_emails[Nettoyer(utilisateur.email)] = utilisateur
+        if cle_compteur_utilisateur(utilisateur):
+            self.compteurs[cle_compteur_utilisateur(utilisateur)] += 1
     
     #methode pour ajouter un utilisateur
     def ajouter_utilisateur(self, utilisateur):
-        #verification de l'existance de l'ID
-        if utilisateur.id in self.utilisateurs:
-            print("ID déjà utilisé pour un autre utilisateur.")
-            return False
+        with self.verrou_index:
+            #verification de l'existance de l'ID
+            if utilisateur.id in self.utilisateurs:
+                print("ID déjà utilisé pour un autre utilisateur.")
+                return False
         
-        #verification de l'existance de l'email
-        if self.trouver_utilisateur_par_email(utilisateur.email):
-            print("Email déjà utilisé pour un autre utilisateur.")
-            return False
+            #verification de l'existance de l'email
+            if self.email_existe(utilisateur.email):
+                print("Email déjà utilisé pour un autre utilisateur.")
+                return False
         
-        #methode pour ajouter l'utilisateur au dictionnaire des utilisateurs 
-        self.utilisateurs[utilisateur.id] = utilisateur
+            #methode pour ajouter l'utilisateur au dictionnaire des utilisateurs 
+            with self._journaliser("ajout_utilisateur", id=utilisateur.id, nom=utilisateur.nom,
+                                   email=utilisateur.email, type=type_utilisateur(utilisateur)):
+                self._indexer_utilisateur(utilisateur)
+        self._compacter_si_necessaire()
         print(f"Utilisateur {utilisateur.nom} ajouté.")
         return True
 
@@ -330,168 +1426,768 @@ class Bibliotheque:
 
     # --- Emprunts --- 
 
+    # nombre d'emprunts non retournés d'un lecteur
+    def nb_emprunts_actifs(self, lecteur_id):
+        return len(self.emprunts_actifs_par_lecteur.get(lecteur_id, ()))
+
+    # vrai si au moins un exemplaire du livre est en cours d'emprunt
+    def livre_est_emprunte(self, livre_id):
+        return bool(self.emprunts_actifs_par_livre.get(livre_id))
+
+    # enregistre un emprunt dans le registre des emprunts et dans les index
+    def _indexer_emprunt(self, emprunt):
+        self.emprunts.ajouter(emprunt)
+        self.emprunts_par_lecteur.setdefault(emprunt.lecteur_id, array("q")).append(emprunt.id)
+        if not emprunt.retourne:
+            self.emprunts_actifs_par_livre.setdefault(emprunt.livre_id, set()).add(emprunt.id)
+            self.emprunts_actifs_par_lecteur.setdefault(emprunt.lecteur_id, set()).add(emprunt.id)
+            insort(self.echeances, (_date_vers_s(emprunt.date_retour_prevue), emprunt.id))
+            self.compteurs["emprunts_actifs"] += 1
+
+            # mémorise côté lecteur qu'il a ce livre
+            lecteur = self.utilisateurs.get(emprunt.lecteur_id)
+            if isinstance(lecteur, Lecteur):
+                lecteur.marquer_emprunte(emprunt.livre_id)
+
+    # fin d'un chargement d'emprunts : le registre est trié une seule fois ; si des id en double ont été
+    # écartés, les index des emprunts sont reconstruits sans eux. Retourne les doublons [(position d'ajout, id)]
+    def _terminer_chargement_emprunts(self):
+        registre = self.emprunts
+        registre._trier()
+        doublons, registre.doublons = registre.doublons, []
+        if doublons:
+            self._reindexer_emprunts()
+        return doublons
+
+    # reconstruit les index des emprunts (par lecteur, actifs, échéances) a partir du registre
+    def _reindexer_emprunts(self):
+        registre = self.emprunts
+        self.emprunts = RegistreEmprunts()
+        self.emprunts_par_lecteur = {}
+        self.emprunts_actifs_par_livre = {}
+        self.emprunts_actifs_par_lecteur = {}
+        self.echeances = []
+        self.compteurs["emprunts_actifs"] = 0
+        for utilisateur in self.utilisateurs.values():
+            if isinstance(utilisateur, Lecteur):
+                for livre_id in list(utilisateur.livres_empruntes):
+                    utilisateur.marquer_rendu(livre_id)
+        for emprunt in registre.values():
+            self._indexer_emprunt(emprunt)
+
+    # retire un emprunt retourné des index des emprunts actifs
+    def _cloturer_emprunt(self, emprunt):
+        if emprunt.id in self.emprunts_actifs_par_lecteur.get(emprunt.lecteur_id, ()):
+            self.compteurs["emprunts_actifs"] -= 1
+        for index, cle in ((self.emprunts_actifs_par_livre, emprunt.livre_id),
+                           (self.emprunts_actifs_par_lecteur, emprunt.lecteur_id)):
+            ids = index.get(cle)
+            if ids is not None:
+                ids.discard(emprunt.id)
+                if not ids:
+                    del index[cle]
+
+        # retirer l'échéance de la liste triée
+        echeance = (_date_vers_s(emprunt.date_retour_prevue), emprunt.id)
+        i = bisect_left(self.echeances, echeance)
+        if i < len(self.echeances) and self.echeances[i] == echeance:
+            del self.echeances[i]
+
+        #enlever le livre de la liste d'empriunt du lecteeur
+        lecteur = self.utilisateurs.get(emprunt.lecteur_id)
+        if isinstance(lecteur, Lecteur):
+            lecteur.marquer_rendu(emprunt.livre_id)
+
     #methode d'emprunt pour un livre
     def emprunter_livre(self, livre_id, lecteur_id):
+        self.expirer_mises_de_cote()
+        with self._verrouiller((livre_id,), (lecteur_id,)), self.verrou_index:
+            motif = self._refus_emprunt(livre_id, lecteur_id)
+            if motif:
+                print(motif)
+                return False
+
+            # crée un nouvel emprunt (l'id est pris sous verrou_index : les emprunts arrivent dans l'ordre des id)
+            emprunt = Emprunt(livre_id, lecteur_id)
+            with self._journaliser("emprunt", id=emprunt.id, livre_id=livre_id, lecteur_id=lecteur_id,
+                                   date_emprunt=emprunt.date_emprunt.isoformat(),
+                                   date_retour_prevue=emprunt.date_retour_prevue.isoformat()):
+                self._appliquer_emprunt(emprunt, self.livres[livre_id])
+        self._compacter_si_necessaire()
+
+        print(f"Un emprunt à été créé : {emprunt.id}")
+        return True
+
+    # vérifie qu'un emprunt est possible, retourne le motif du refus ou None (appelée sous verrou_index)
+    # lot : emprunts déja acceptés dans le meme lot (voir emprunter_lot), comptés comme s'ils étaient faits
+    def _refus_emprunt(self, livre_id, lecteur_id, lot=None):
         # recupere l'id de l'utilisateur
         lecteur = self.utilisateurs.get(lecteur_id)
 
         #verifier que c'est un lecteur pas le bibliothecaire
         if not isinstance(lecteur, Lecteur):
-            print("Utilisateur non valide; il faut que ça soit un lecteur.")
-            return False
-        
+            return "Utilisateur non valide; il faut que ça soit un lecteur."
+
         # cherche le livre par son id
         livre = self._trouver_livre_par_id(livre_id)
         if not livre:
-            print("Livre introuvable.")
-            return False
-        
+            return "Livre introuvable."
+
         # verifier le nombre d'exemplaire disponible
-        if livre.exemplaires <= 0:
-            print("Aucun exemplaire disponible.")
-            return False
-        
+        # (les exemplaires mis de côté pour d'autres lecteurs ne comptent pas, sauf s'ils l'ont déja pris dans le lot)
+        sortis = lot["livres"].get(livre_id, 0) if lot else 0
+        tenues = self.mises_de_cote.get(livre_id, {})
+        bloques = len(tenues) - (lecteur_id in tenues)
+        if lot and tenues:
+            bloques -= sum(1 for autre in tenues if autre != lecteur_id and (autre, livre_id) in lot["paires"])
+        if livre.exemplaires - sortis - bloques <= 0:
+            return "Aucun exemplaire disponible."
+
         # vérifie si le lecteur a déjà emprunté ce livre
-        if livre_id in lecteur.livres_empruntes:
-            print("Ce lecteur a déjà emprunté ce livre.")
-            return False
-        
+        if livre_id in lecteur.livres_empruntes or (lot and (lecteur_id, livre_id) in lot["paires"]):
+            return "Ce lecteur a déjà emprunté ce livre."
 
         # Limite d'emprunts actifs
-        nb_actifs = 0
-        for id_emprunt in self.emprunts_par_lecteur.get(lecteur_id, set()):
-            emprunt_enregistre = self.emprunts.get(id_emprunt)
-            if emprunt_enregistre and not emprunt_enregistre.est_retourne:
-                nb_actifs += 1    
-
-        if nb_actifs >= MAXI_PRET_ACTIF:
-            print(f"Limite atteinte : {MAXI_PRET_ACTIF} emprunt(s) actif(s).")
-            return False         
-        
-        
-        # crée un nouvel emprunt
-        emprunt = Emprunt(livre_id, lecteur_id)
-        # enregistre l'emprunt dans le dictionnaire des emprunts
-        self.emprunts[emprunt.id] = emprunt
-
-
-        #ajoute l'emprunt à la liste de ce lecteur (si elle n'existe pas, on la crée)
-        if lecteur_id not in self.emprunts_par_lecteur:
-            self.emprunts_par_lecteur[lecteur_id] = set()
-        self.emprunts_par_lecteur[lecteur_id].add(emprunt.id)
-
-        # mémorise côté lecteur qu'il a ce livre
-        lecteur.livres_empruntes.add(livre_id)
+        en_plus = lot["lecteurs"].get(lecteur_id, 0) if lot else 0
+        if self.nb_emprunts_actifs(lecteur_id) + en_plus >= MAXI_PRET_ACTIF:
+            return f"Limite atteinte : {MAXI_PRET_ACTIF} emprunt(s) actif(s)."
+        return None
 
+    # emprunts en série (visite d'une classe...) : demandes = [(livre_id, lecteur_id), ...]
+    # tout est validé en une passe (stock et MAXI_PRET_ACTIF comptent les emprunts précédents du lot)
+    # tout_ou_rien=True : un seul refus annule tout le lot ; sinon les demandes valides sont appliquées
+    # le lot est journalisé / enregistré en une seule écriture ; rien n'est affiché
+    # retourne {"applique", "acceptes", "refuses", "resultats": [{"livre_id", "lecteur_id", "ok", "emprunt_id", "motif"}]}
+    def emprunter_lot(self, demandes, tout_ou_rien=True):
+        demandes = list(demandes)
+        self.expirer_mises_de_cote()
+        with self._verrouiller([livre_id for livre_id, _ in demandes], [lecteur_id for _, lecteur_id in demandes]), \
+                self.verrou_index:
+            bilan = self._emprunter_lot(demandes, tout_ou_rien)
+        self._compacter_si_necessaire()
+        return bilan
+
+    def _emprunter_lot(self, demandes, tout_ou_rien):
+        lot = {"livres": {}, "lecteurs": {}, "paires": set()}
+        resultats = []
+        for livre_id, lecteur_id in demandes:
+            motif = self._refus_emprunt(livre_id, lecteur_id, lot)
+            resultats.append({"livre_id": livre_id, "lecteur_id": lecteur_id, "ok": motif is None,
+                              "emprunt_id": None, "motif": motif})
+            if motif is None:
+                lot["livres"][livre_id] = lot["livres"].get(livre_id, 0) + 1
+                lot["lecteurs"][lecteur_id] = lot["lecteurs"].get(lecteur_id, 0) + 1
+                lot["paires"].add((lecteur_id, livre_id))
+
+        refuses = sum(1 for r in resultats if not r["ok"])
+        if refuses and tout_ou_rien:
+            return annuler_lot(resultats)
+
+        # toutes les demandes acceptées partagent la meme date d'emprunt
+        maintenant = datetime.now()
+        emprunts = []
+        for resultat in resultats:
+            if resultat["ok"]:
+                emprunt = Emprunt(resultat["livre_id"], resultat["lecteur_id"], maintenant)
+                resultat["emprunt_id"] = emprunt.id
+                emprunts.append(emprunt)
+        operations = [{"op": "emprunt", "id": emprunt.id, "livre_id": emprunt.livre_id,
+                       "lecteur_id": emprunt.lecteur_id, "date_emprunt": maintenant.isoformat(),
+                       "date_retour_prevue": emprunt.date_retour_prevue.isoformat()} for emprunt in emprunts]
+        with self._journaliser_lot(operations):
+            for emprunt in emprunts:
+                self._appliquer_emprunt(emprunt, self.livres[emprunt.livre_id])
+        return {"applique": bool(operations), "acceptes": len(operations),
+                "refuses": refuses, "resultats": resultats}
+
+    # enregistre un nouvel emprunt et sort un exemplaire du stock
+    def _appliquer_emprunt(self, emprunt, livre):
+        # enregistre l'emprunt (dictionnaire des emprunts, emprunts du lecteur, emprunts actifs)
+        self._indexer_emprunt(emprunt)
+
+        # l'exemplaire mis de côté pour ce lecteur (ou sa place dans la file) n'a plus lieu d'etre
+        self._liberer_mise_de_cote(livre.id, emprunt.lecteur_id)
+        self.reservations.pop((livre.id, emprunt.lecteur_id), None)
 
         # décrémente le stock du livre et met à jour le statut
-        livre.exemplaires -= 1
-        livre.mettre_a_jour_statut()
-
-        print(f"Un emprunt à été créé : {emprunt.id}")
-        return True
+        self._changer_stock(livre, -1)
     
 
     #methode pour rendre un libre
     def rendre_livre(self, emprunt_id):
+        self.expirer_mises_de_cote()
         #recupere l'id de l'emprubt
         emprunt = self.emprunts.get(emprunt_id)
         if not emprunt:
             print("Emprunt introuvable.")
             return False
         
-        #verifie si le livre est rendu
-        if emprunt.retourne:
-            print("Le livre est déjà retourné.")
-            return False
-
-        # marquer que le luvre est rendu
-        emprunt.rendre()
-
-        #cherche le livre et le lecteur concerné par cet emprunt
-        livre = self._trouver_livre_par_id(emprunt.livre_id)
-        lecteur = self.utilisateurs.get(emprunt.lecteur_id)
-
-        #changer le statut et le nb d'exemplaire du livre car il est rendu 
-        if livre:
-            livre.exemplaires += 1
-            livre.mettre_a_jour_statut()
+        with self._verrouiller((emprunt.livre_id,), (emprunt.lecteur_id,)), self.verrou_index:
+            # l'archivage a pu déplacer les lignes du registre : on relit l'emprunt sous les verrous
+            emprunt = self.emprunts.get(emprunt_id)
 
-        #enlever le livre de la liste d'empriunt du lecteeur
-        if isinstance(lecteur, Lecteur):
-            lecteur.livres_empruntes.discard(emprunt.livre_id)
+            #verifie si le livre est rendu
+            if emprunt is None or emprunt.retourne:
+                print("Le livre est déjà retourné.")
+                return False
 
+            # marquer que le luvre est rendu
+            maintenant = datetime.now()
+            with self._journaliser("retour", id=emprunt.id, date_retour_effective=maintenant.isoformat()):
+                emprunt.date_retour_effective = maintenant
+                emprunt.retourne = True
+                attribues = self._appliquer_retour(emprunt)
+            en_retard, jours_de_retard = emprunt.en_retard(), emprunt.jours_de_retard()
+        self._compacter_si_necessaire()
 
         print("Livre rendu avec succès.")
+        for lecteur_id, expiration in attribues:
+            print(f"Exemplaire mis de côté pour le lecteur {lecteur_id} jusqu'au {expiration:%d/%m/%Y %H:%M}.")
 
         #verification s'il ya du retard
-        if emprunt.en_retard():
-            print(f"⚠ Retard de {emprunt.jours_de_retard()} jour(s).")
+        if en_retard:
+            print(f"⚠ Retard de {jours_de_retard} jour(s).")
         return True
     
 
+    # retours en série : emprunt_ids = [id, ...], memes regles de lot que emprunter_lot
+    # retourne {"applique", "acceptes", "refuses",
+    #           "resultats": [{"emprunt_id", "ok", "jours_de_retard", "mis_de_cote_pour", "motif"}]}
+    # mis_de_cote_pour : lecteurs de la file d'attente a qui l'exemplaire rendu est réservé
+    def rendre_lot(self, emprunt_ids, tout_ou_rien=True):
+        emprunt_ids = list(emprunt_ids)
+        self.expirer_mises_de_cote()
+        emprunts = [e for e in map(self.emprunts.get, emprunt_ids) if e]
+        with self._verrouiller([e.livre_id for e in emprunts], [e.lecteur_id for e in emprunts]), self.verrou_index:
+            bilan = self._rendre_lot(emprunt_ids, tout_ou_rien)
+        self._compacter_si_necessaire()
+        return bilan
+
+    def _rendre_lot(self, emprunt_ids, tout_ou_rien):
+        vus = set()
+        resultats = []
+        for emprunt_id in emprunt_ids:
+            emprunt = self.emprunts.get(emprunt_id)
+            if not emprunt:
+                motif = "Emprunt introuvable."
+            elif emprunt.retourne or emprunt_id in vus:
+                motif = "Le livre est déjà retourné."
+            else:
+                motif = None
+                vus.add(emprunt_id)
+            resultats.append({"emprunt_id": emprunt_id, "ok": motif is None, "jours_de_retard": 0,
+                              "mis_de_cote_pour": [], "motif": motif})
+
+        refuses = sum(1 for r in resultats if not r["ok"])
+        if refuses and tout_ou_rien:
+            return annuler_lot(resultats)
+
+        maintenant = datetime.now()
+        acceptes = [resultat for resultat in resultats if resultat["ok"]]
+        operations = [{"op": "retour", "id": resultat["emprunt_id"], "date_retour_effective": maintenant.isoformat()}
+                      for resultat in acceptes]
+        with self._journaliser_lot(operations):
+            for resultat in acceptes:
+                emprunt = self.emprunts[resultat["emprunt_id"]]
+                emprunt.date_retour_effective = maintenant
+                emprunt.retourne = True
+                attribues = self._appliquer_retour(emprunt)
+                resultat["jours_de_retard"] = emprunt.jours_de_retard()
+                resultat["mis_de_cote_pour"] = [lecteur_id for lecteur_id, _ in attribues]
+        return {"applique": bool(operations), "acceptes": len(operations),
+                "refuses": refuses, "resultats": resultats}
+
+    # nombre d'emprunts non retournés dont la date prévue est dépassée a la date de référence
+    def nb_emprunts_en_retard(self, reference=None):
+        return bisect_left(self.echeances, (_date_vers_s(reference or datetime.now()),))
+
+    # emprunts en retard a la date de référence, du plus ancien au plus récent,
+    # avec les jours de retard calculés sur cette meme date (seuls les emprunts en retard sont parcourus)
+    def emprunts_en_retard(self, reference=None):
+        reference = reference or datetime.now()
+        fin = bisect_left(self.echeances, (_date_vers_s(reference),))
+        resultats = []
+        for _, emprunt_id in self.echeances[:fin]:
+            emprunt = self.emprunts[emprunt_id]
+            resultats.append((emprunt, emprunt.jours_de_retard(reference)))
+        return resultats
+
+    #methode qui affiche les emprunts en retard
+    def lister_emprunts_en_retard(self):
+        en_retard = self.emprunts_en_retard()
+        if not en_retard:
+            print("Aucun emprunt en retard.")
+            return
+        for emprunt, jours in en_retard:
+            print(f"{emprunt.afficher()} | Lecteur {emprunt.lecteur_id} | {jours} jour(s) de retard")
+
+    # retire un emprunt rendu des emprunts actifs et remet l'exemplaire en stock
+    # si des lecteurs attendent ce livre, l'exemplaire est mis de côté pour le premier : retourne [(lecteur, expiration)]
+    def _appliquer_retour(self, emprunt):
+        self._cloturer_emprunt(emprunt)
+
+        #cherche le livre concerné par cet emprunt
+        livre = self._trouver_livre_par_id(emprunt.livre_id)
+
+        #changer le statut et le nb d'exemplaire du livre car il est rendu 
+        if not livre:
+            return []
+        self._changer_stock(livre, +1)
+        return self._servir_file(livre, emprunt.date_retour_effective or datetime.now())
+
     #methode qui liste les emprunts existants
     def lister_emprunts_en_cours(self):
-        en_cours = [e for e in self.emprunts.values() if not e.retourne]
+        en_cours = list(self.emprunts.en_cours())
         if not en_cours:
             print("Aucun emprunt en cours.")
             return
         for e in en_cours:
             print(e.afficher())
 
-    def lister_emprunts_par_lecteur(self, lecteur_id):
+    # avec_archive : ajoute les emprunts archivés du lecteur (lus dans les segments sur disque)
+    def lister_emprunts_par_lecteur(self, lecteur_id, avec_archive=False):
 
-        #recupere l'ensemble des ids de tous les emprunts fait par un seul lecteur
-        identifiants = self.emprunts_par_lecteur.get(lecteur_id, set())
-        if not identifiants:
+        #recupere tous les emprunts fait par un seul lecteur
+        emprunts = self._emprunts_du_lecteur(lecteur_id)
+        archives = self.archive.emprunts_du_lecteur(lecteur_id) if avec_archive and self.archive else []
+        if not emprunts and not archives:
             print("Aucun emprunt pour ce lecteur.")
 
             return
-        #parcourir  les identifiants pour afficher les emprunts pour un lecteur
-        for id_emprunt in identifiants:
-            emrprunt = self.emprunts.get(id_emprunt)
-            if emrprunt:
-                print(emrprunt.afficher())
+        for emprunt in archives:
+            print(emprunt.afficher() + " (archivé)")
+        #parcourir les emprunts pour les afficher
+        for emprunt in emprunts:
+            print(emprunt.afficher())
+
+    # emprunts non archivés d'un lecteur, par id croissant. Avec un stockage branché, seuls les emprunts
+    # en cours sont en mémoire (voir StockageSQLite.charger) : l'historique est lu dans la base
+    def _emprunts_du_lecteur(self, lecteur_id):
+        if self.stockage is not None:
+            return self.stockage.emprunts_du_lecteur(lecteur_id)
+        return [e for e in map(self.emprunts.get, self.emprunts_par_lecteur.get(lecteur_id, ())) if e]
+
+    # --- Réservations ---
+    # quand il n'y a plus d'exemplaire libre, un lecteur se met dans la file du livre. A chaque retour,
+    # l'exemplaire est mis de côté pour le premier lecteur de la file pendant JOURS_MISE_DE_COTE jours :
+    # lui seul peut l'emprunter. A l'expiration, l'exemplaire passe au suivant (ou redevient libre).
+    # Les expirations sont dans un tas ; une mise de côté consommée ou annulée y reste et est sautée.
+
+    # lecteurs qui attendent un livre, dans l'ordre d'arrivée
+    def file_reservation(self, livre_id):
+        return [lecteur_id for numero, lecteur_id in self.files_reservation.get(livre_id, ())
+                if self.reservations.get((livre_id, lecteur_id)) == numero]
+
+    # exemplaires en stock qui ne sont mis de côté pour personne
+    def _exemplaires_libres(self, livre):
+        return livre.exemplaires - len(self.mises_de_cote.get(livre.id, ()))
+
+    def _refus_reservation(self, livre_id, lecteur_id):
+        lecteur = self.utilisateurs.get(lecteur_id)
+        if not isinstance(lecteur, Lecteur):
+            return "Utilisateur non valide; il faut que ça soit un lecteur."
+        livre = self._trouver_livre_par_id(livre_id)
+        if not livre:
+            return "Livre introuvable."
+        if livre_id in lecteur.livres_empruntes:
+            return "Ce lecteur a déjà emprunté ce livre."
+        if self._a_reserve(livre_id, lecteur_id):
+            return "Ce lecteur a déjà réservé ce livre."
+        if self._exemplaires_libres(livre) > 0:
+            return "Un exemplaire est disponible : il peut etre emprunté directement."
+        return None
 
-    # --- Statistiques Console--- 
-        # méthode pour afficher les statistiques de ma bibliotheque
-    def statistiques(self):
-        # compte le nombre livres
-        total_livres = len(self.livres)
+    # met le lecteur a la fin de la file du livre
+    def reserver_livre(self, livre_id, lecteur_id):
+        self.expirer_mises_de_cote()
+        with self._verrouiller((livre_id,), (lecteur_id,)), self.verrou_index:
+            motif = self._refus_reservation(livre_id, lecteur_id)
+            if motif:
+                print(motif)
+                return False
+            with self._journaliser("reservation", livre_id=livre_id, lecteur_id=lecteur_id):
+                self._ajouter_reservation(livre_id, lecteur_id)
+            position = len(self.file_reservation(livre_id))
+        self._compacter_si_necessaire()
+        print(f"Réservation enregistrée : position {position} dans la file.")
+        return True
 
-        # compte le nombre de lecteurs (objets de type Lecteur)
-        total_lecteurs = 0
-        for utilisateur in self.utilisateurs.values():
-            if isinstance(utilisateur, Lecteur):
-                total_lecteurs += 1
+    # retire le lecteur de la file, ou lui reprend l'exemplaire mis de côté (qui passe au suivant)
+    def annuler_reservation(self, livre_id, lecteur_id):
+        self.expirer_mises_de_cote()
+        with self._verrouiller((livre_id,), (lecteur_id,)), self.verrou_index:
+            if not self._a_reserve(livre_id, lecteur_id):
+                print("Aucune réservation de ce lecteur pour ce livre.")
+                return False
+            maintenant = datetime.now()
+            with self._journaliser("annulation_reservation", livre_id=livre_id, lecteur_id=lecteur_id,
+                                   date=maintenant.isoformat()):
+                self._annuler_reservation(livre_id, lecteur_id, maintenant)
+        self._compacter_si_necessaire()
+        print("Réservation annulée.")
+        return True
 
-        # compte le nombre de bibliothécaires
-        total_biblios = 0
-        for utilisateur in self.utilisateurs.values():
-            if isinstance(utilisateur, Bibliothecaire):
-                total_biblios += 1
+    # vrai si le lecteur attend ce livre dans la file ou a un exemplaire mis de côté
+    def _a_reserve(self, livre_id, lecteur_id):
+        return (livre_id, lecteur_id) in self.reservations or lecteur_id in self.mises_de_cote.get(livre_id, ())
+
+    # traite les mises de côté expirées a la date de référence (seul le début du tas est lu)
+    # retourne [(livre, lecteur, expiration)] des exemplaires passés aux lecteurs suivants
+    def expirer_mises_de_cote(self, reference=None):
+        reference = reference or datetime.now()
+        # lecture sans verrou, simple indication : tout est revérifié sous les verrous
+        if not self.expirations or self.expirations[0][0] > _date_vers_s(reference):
+            return []
+        nb_verrous = len(self.verrous_livres) if self.verrous_livres is not None else 0
+        with self._verrouiller(range(nb_verrous), range(nb_verrous)), self.verrou_index:
+            if not self._mise_de_cote_expiree(reference):
+                return []
+            with self._journaliser("expiration_mises_de_cote", date=reference.isoformat()):
+                _, attribues = self._expirer_mises_de_cote(reference)
+        self._compacter_si_necessaire()
+        return attribues
+
+    # vrai si au moins une mise de côté a expiré a la date de référence
+    # (les entrées périmées du haut du tas, consommées ou annulées, sont jetées au passage)
+    def _mise_de_cote_expiree(self, reference):
+        while self.expirations:
+            expiration, livre_id, lecteur_id = self.expirations[0]
+            if self.mises_de_cote.get(livre_id, {}).get(lecteur_id) == expiration:
+                return expiration <= _date_vers_s(reference)
+            heapq.heappop(self.expirations)
+        return False
+
+    def _expirer_mises_de_cote(self, reference):
+        limite = _date_vers_s(reference)
+        expirees = 0
+        livres = {}
+        while self.expirations and self.expirations[0][0] <= limite:
+            expiration, livre_id, lecteur_id = heapq.heappop(self.expirations)
+            if self.mises_de_cote.get(livre_id, {}).get(lecteur_id) != expiration:
+                continue
+            self._liberer_mise_de_cote(livre_id, lecteur_id)
+            expirees += 1
+            livres[livre_id] = True
+        attribues = []
+        for livre_id in livres:
+            livre = self.livres.get(livre_id)
+            if livre:
+                attribues.extend((livre_id, lecteur_id, fin) for lecteur_id, fin in self._servir_file(livre, reference))
+        return expirees, attribues
+
+    def _ajouter_reservation(self, livre_id, lecteur_id):
+        self.numero_reservation += 1
+        self.reservations[(livre_id, lecteur_id)] = self.numero_reservation
+        self.files_reservation.setdefault(livre_id, deque()).append((self.numero_reservation, lecteur_id))
+
+    def _annuler_reservation(self, livre_id, lecteur_id, date):
+        # l'entrée reste dans la file et sera sautée
+        if self.reservations.pop((livre_id, lecteur_id), None) is not None:
+            return True
+        if self._liberer_mise_de_cote(livre_id, lecteur_id):
+            livre = self.livres.get(livre_id)
+            if livre:
+                self._servir_file(livre, date)
+            return True
+        return False
+
+    # met de côté les exemplaires libres du livre pour les premiers lecteurs de la file, jusqu'a
+    # date + JOURS_MISE_DE_COTE ; retourne [(lecteur, expiration)]
+    def _servir_file(self, livre, date):
+        file = self.files_reservation.get(livre.id)
+        attribues = []
+        while file and self._exemplaires_libres(livre) > 0:
+            numero, lecteur_id = file.popleft()
+            if self.reservations.get((livre.id, lecteur_id)) != numero:
+                continue
+            del self.reservations[(livre.id, lecteur_id)]
+            expiration = date + timedelta(days=JOURS_MISE_DE_COTE)
+            self._mettre_de_cote(livre.id, lecteur_id, _date_vers_s(expiration))
+            attribues.append((lecteur_id, expiration))
+        if file is not None and not file:
+            del self.files_reservation[livre.id]
+        return attribues
+
+    def _mettre_de_cote(self, livre_id, lecteur_id, expiration):
+        self.mises_de_cote.setdefault(livre_id, {})[lecteur_id] = expiration
+        heapq.heappush(self.expirations, (expiration, livre_id, lecteur_id))
+
+    # retire une mise de côté (son entrée dans le tas devient périmée), retourne vrai s'il y en avait une
+    def _liberer_mise_de_cote(self, livre_id, lecteur_id):
+        tenues = self.mises_de_cote.get(livre_id)
+        if tenues is None or lecteur_id not in tenues:
+            return False
+        del tenues[lecteur_id]
+        if not tenues:
+            del self.mises_de_cote[livre_id]
+        return True
+
+    # état des réservations pour la sauvegarde JSON
+    def donnees_reservations(self):
+        return {
+            "files": {str(livre_id): self.file_reservation(livre_id) for livre_id in self.files_reservation},
+            "mises_de_cote": [{"livre_id": livre_id, "lecteur_id": lecteur_id,
+                               "expiration": _iso(_s_vers_date(expiration))}
+                              for livre_id, tenues in self.mises_de_cote.items()
+                              for lecteur_id, expiration in tenues.items()],
+        }
+
+    def restaurer_reservations(self, donnees):
+        for livre_id, lecteurs in donnees.get("files", {}).items():
+            for lecteur_id in lecteurs:
+                self._ajouter_reservation(int(livre_id), lecteur_id)
+        for r in donnees.get("mises_de_cote", []):
+            self._mettre_de_cote(r["livre_id"], r["lecteur_id"], _date_vers_s(datetime.fromisoformat(r["expiration"])))
+
+    # --- Archivage des anciens emprunts ---
+
+    # ouvre (ou crée) l'archive des emprunts
+    # les id des emprunts archivés ne doivent pas etre réutilisés : Emprunt.Compteur passe au-dela
+    def activer_archive(self, dossier=DOSSIER_ARCHIVE_DEFAUT):
+        self.archive = ArchiveEmprunts(dossier)
+        with VERROU_IDS:
+            Emprunt.Compteur = max(Emprunt.Compteur, self.archive.dernier_id() + 1)
+        return self.archive
+
+    # plus grand id d'emprunt, en mémoire ou dans l'archive (les chargements en déduisent Emprunt.Compteur)
+    def dernier_id_emprunt(self):
+        return max(self.emprunts.dernier_id(), self.archive.dernier_id() if self.archive else 0)
+
+    # déplace dans un nouveau segment de l'archive les emprunts rendus depuis plus de age_jours jours,
+    # puis les retire du registre en mémoire ; retourne le nombre d'emprunts archivés
+    # (un emprunt marqué rendu sans date de retour n'est jamais archivé : son age est inconnu)
+    def archiver_emprunts(self, age_jours=JOURS_AVANT_ARCHIVAGE, reference=None):
+        if self.archive is None:
+            self.activer_archive()
+        limite = _date_vers_s((reference or datetime.now()) - timedelta(days=age_jours))
+        # en mode concurrent, aucun emprunt ni retour ne doit voir les lignes bouger : on prend tous les verrous
+        nb_verrous = len(self.verrous_livres) if self.verrous_livres is not None else 0
+        with self._verrouiller(range(nb_verrous), range(nb_verrous)), self.verrou_index:
+            registre = self.emprunts
+            registre._trier()
+            masque = bytearray(SANS_DATE < date < limite and en_cours == 0
+                               for date, en_cours in zip(registre.dates_retour_effective, registre.masque_en_cours()))
+            if not any(masque):
+                print("Aucun emprunt a archiver.")
+                return 0
+
+            # le segment est sur le disque avant que les emprunts quittent la base et la mémoire
+            retires = registre.extraire(masque)
+            description = self.archive.ajouter_segment(retires)
+            with self._journaliser("archivage", ids=retires.ids.tolist()):
+                self._retirer_emprunts(masque)
+        # le snapshot du journal ne doit plus contenir les emprunts archivés ; la compaction copie
+        # l'état sous verrou_index seulement, les emprunts et retours reprennent pendant l'écriture
+        self.compacter_journal()
+        print(f"{len(retires)} emprunt(s) archivé(s) dans {description['fichier']} "
+              f"({description['octets']} octets).")
+        return len(retires)
+
+    # retire du registre et de emprunts_par_lecteur les lignes du masque, retourne le registre des lignes retirées
+    def _retirer_emprunts(self, masque):
+        retires = self.emprunts.retirer(masque)
+        ids_retires = set(retires.ids)
+        for lecteur_id in set(retires.lecteur_ids):
+            restants = array("q", (i for i in self.emprunts_par_lecteur.get(lecteur_id, ()) if i not in ids_retires))
+            if restants:
+                self.emprunts_par_lecteur[lecteur_id] = restants
+            else:
+                self.emprunts_par_lecteur.pop(lecteur_id, None)
+        return retires
+
+    # historique complet d'un lecteur ou d'un livre : emprunts archivés puis emprunts en mémoire
+    def historique_lecteur(self, lecteur_id):
+        archives = self.archive.emprunts_du_lecteur(lecteur_id) if self.archive else []
+        return archives + self._emprunts_du_lecteur(lecteur_id)
+
+    def historique_livre(self, livre_id):
+        archives = self.archive.emprunts_du_livre(livre_id) if self.archive else []
+        if self.stockage is not None:
+            return archives + self.stockage.emprunts_du_livre(livre_id)
+        registre = self.emprunts
+        return archives + [EmpruntVue(registre, i) for i, l in enumerate(registre.livre_ids) if l == livre_id]
+
+    # --- Journal des modifications --- 
+
+    # active le journal : chaque modification est ajoutée au fichier journal au lieu de tout réécrire
+    def activer_journal(self, dossier="data_json", fsync_tous_les=JOURNAL_FSYNC_TOUS_LES,
+                        compacter_tous_les=JOURNAL_COMPACTER_TOUS_LES):
+        self.journal = Journal(dossier, fsync_tous_les, compacter_tous_les)
+        # sans snapshot, le journal ne peut pas etre rejoué : on part d'un snapshot de l'état actuel
+        if not (Path(dossier) / "etat.json").exists():
+            self.compacter_journal(attendre=True)
+
+    # écrit les opérations en attente sur le disque et ferme le journal
+    def desactiver_journal(self):
+        if self.journal:
+            self.journal.fermer()
+            self.journal = None
+
+    # réécrit un snapshot complet puis retire du journal les opérations qu'il contient
+    # attendre=False : si une sauvegarde est deja en cours, la compaction est remise a l'opération suivante
+    # (le journal garde tout ce que le snapshot en cours ne contient pas)
+    def compacter_journal(self, attendre=False):
+        if self.journal:
+            sauvegarder_json(self, self.journal.dossier, attendre)
+
+    # branche un stockage (ex: StockageSQLite) qui enregistre chaque modification au moment ou elle est faite
+    def brancher_stockage(self, stockage):
+        self.stockage = stockage
+
+    # enregistre une opération AVANT de l'appliquer en mémoire (s'utilise avec with, le bloc l'applique) :
+    # le stockage branché la valide dans sa transaction, puis elle est ajoutée au journal.
+    # Si le stockage refuse l'opération, l'exception remonte avant le bloc : la mémoire n'a pas bougé.
+    # La compaction éventuelle du journal n'est pas faite ici : chaque méthode publique appelle
+    # _compacter_si_necessaire une fois ses verrous relachés (la sauvegarde ne bloque pas les autres écritures).
+    @contextmanager
+    def _journaliser(self, op, **donnees):
+        if self.stockage is not None:
+            self.stockage.enregistrer_operation(dict(op=op, **donnees))
+        if self.journal is not None:
+            self.journal.ecrire(op, **donnees)
+        yield
+
+    # meme chose pour un lot d'opérations ({"op": ..., ...}) enregistré comme une seule sauvegarde :
+    # une transaction dans le stockage branché et un seul fsync
+    @contextmanager
+    def _journaliser_lot(self, operations):
+        if operations and self.stockage is not None:
+            self.stockage.enregistrer_operations(operations)
+        if operations and self.journal is not None:
+            for operation in operations:
+                self.journal.ecrire(**operation)
+            self.journal.synchroniser()
+        yield
+
+    # compaction du journal quand assez d'opérations ont été ajoutées depuis le dernier snapshot
+    # (appelée hors de tout verrou de la bibliothèque)
+    def _compacter_si_necessaire(self):
+        if self.journal is not None and self.journal.depuis_snapshot >= self.journal.compacter_tous_les:
+            self.compacter_journal()
+
+    # rejoue une opération lue dans le journal (sans vérification ni affichage : elle a deja été validée)
+    # un emprunt ou une réservation deja présents dans le snapshot ne sont pas ajoutés une seconde fois
+    def appliquer_operation(self, operation):
+        op = operation["op"]
+        if op in ("emprunt", "reservation") and self._operation_deja_appliquee(operation):
+            return
+        if op == "ajout_livre":
+            self._indexer_livre(Livre(operation["titre"], operation["auteur"], operation["categorie"],
+                                      operation["exemplaires"], identifiant=operation["id"]))
+        elif op == "modif_livre":
+            livre = self.livres.get(operation["id"])
+            if livre:
+                self._appliquer_modification(livre, operation["champs"])
+        elif op == "suppr_livre":
+            livre = self.livres.get(operation["id"])
+            if livre:
+                self._desindexer_livre(livre)
+        elif op == "ajout_utilisateur":
+            self._indexer_utilisateur(creer_utilisateur(operation["id"], operation["nom"],
+                                                        operation["email"], operation["type"]))
+        elif op == "emprunt":
+            livre = self.livres.get(operation["livre_id"])
+            emprunt = Emprunt(operation["livre_id"], operation["lecteur_id"],
+                              datetime.fromisoformat(operation["date_emprunt"]),
+                              datetime.fromisoformat(operation["date_retour_prevue"]), identifiant=operation["id"])
+            if livre:
+                self._appliquer_emprunt(emprunt, livre)
+            else:
+                self._indexer_emprunt(emprunt)
+        elif op == "retour":
+            emprunt = self.emprunts.get(operation["id"])
+            if emprunt and not emprunt.retourne:
+                emprunt.retourne = True
+                emprunt.date_retour_effective = datetime.fromisoformat(operation["date_retour_effective"])
+                self._appliquer_retour(emprunt)
+        elif op == "reservation":
+            self._ajouter_reservation(operation["livre_id"], operation["lecteur_id"])
+        elif op == "annulation_reservation":
+            self._annuler_reservation(operation["livre_id"], operation["lecteur_id"],
+                                      datetime.fromisoformat(operation["date"]))
+        elif op == "expiration_mises_de_cote":
+            self._expirer_mises_de_cote(datetime.fromisoformat(operation["date"]))
+        elif op == "archivage":
+            # les emprunts sont deja dans les segments de l'archive
+            ids = set(operation["ids"])
+            self._retirer_emprunts(bytes(emprunt_id in ids for emprunt_id in self.emprunts))
+        else:
+            raise ValueError(f"Opération de journal inconnue : {op}")
 
-        # compte le nombre d'emprunts encore actifs (non retournés)
-        emprunts_actifs = 0
-        for emprunt in self.emprunts.values():
-            if not emprunt.est_retourne:
-                emprunts_actifs += 1
+    def _operation_deja_appliquee(self, operation):
+        if operation["op"] == "emprunt":
+            return operation["id"] in self.emprunts
+        return self._a_reserve(operation["livre_id"], operation["lecteur_id"])
+
+    # --- Statistiques Console--- 
 
-        # compte le nombre d'emprunts en retard
-        emprunts_retard = 0
-        for emprunt in self.emprunts.values():
-            if not emprunt.est_retourne and emprunt.en_retard():
-                emprunts_retard += 1
+    # statistiques lues directement dans les compteurs (aucun parcours des livres, utilisateurs ou emprunts)
+    def donnees_statistiques(self, reference=None):
+        return {
+            "livres": len(self.livres),
+            "lecteurs": self.compteurs["lecteurs"],
+            "bibliothecaires": self.compteurs["bibliothecaires"],
+            "emprunts_actifs": self.compteurs["emprunts_actifs"],
+            "emprunts_en_retard": self.nb_emprunts_en_retard(reference),
+            "exemplaires_disponibles": self.compteurs["exemplaires_disponibles"],
+            "exemplaires_sortis": self.compteurs["emprunts_actifs"],
+            "livres_par_categorie": dict(self.livres_par_categorie),
+            "reservations_en_attente": len(self.reservations),
+            "exemplaires_mis_de_cote": sum(map(len, self.mises_de_cote.values())),
+        }
+
+    # recalcule les memes statistiques en parcourant toutes les données (sert a vérifier les compteurs)
+    def recompter_statistiques(self, reference=None):
+        reference = reference or datetime.now()
+        par_type = {"lecteurs": 0, "bibliothecaires": 0}
+        for utilisateur in self.utilisateurs.values():
+            cle = cle_compteur_utilisateur(utilisateur)
+            if cle:
+                par_type[cle] += 1
+
+        par_categorie = {}
+        exemplaires_disponibles = 0
+        for livre in self.livres.values():
+            par_categorie[livre.categorie] = par_categorie.get(livre.categorie, 0) + 1
+            exemplaires_disponibles += livre.exemplaires
+
+        # parcours des colonnes du registre (bitmap des retours et tableau des échéances)
+        emprunts_actifs = self.emprunts.nb_en_cours()
+        return {
+            "livres": len(self.livres),
+            "lecteurs": par_type["lecteurs"],
+            "bibliothecaires": par_type["bibliothecaires"],
+            "emprunts_actifs": emprunts_actifs,
+            "emprunts_en_retard": self.emprunts.nb_en_retard(reference),
+            "exemplaires_disponibles": exemplaires_disponibles,
+            "exemplaires_sortis": emprunts_actifs,
+            "livres_par_categorie": par_categorie,
+        }
+
+    # compare les compteurs avec un recomptage complet, retourne les écarts {statistique: (compteur, recompte)}
+    def verifier_compteurs(self):
+        reference = datetime.now()
+        compteurs = self.donnees_statistiques(reference)
+        recompte = self.recompter_statistiques(reference)
+        return {cle: (compteurs[cle], recompte[cle]) for cle in recompte if compteurs[cle] != recompte[cle]}
+
+    # méthode pour afficher les statistiques de ma bibliotheque
+    def statistiques(self):
+        stats = self.donnees_statistiques()
 
         # affiche les statistiques globales
         print(f"=== Statistiques de la bibliothèque : {self.nom} ===")
-        print(f"Livres : {total_livres}")
-        print(f"Lecteurs : {total_lecteurs}")
-        print(f"Bibliothécaires : {total_biblios}")
-        print(f"Emprunts actifs : {emprunts_actifs}")
-        print(f"Emprunts en retard : {emprunts_retard}")
-
-
+        print(f"Livres : {stats['livres']}")
+        print(f"Lecteurs : {stats['lecteurs']}")
+        print(f"Bibliothécaires : {stats['bibliothecaires']}")
+        print(f"Emprunts actifs : {stats['emprunts_actifs']}")
+        print(f"Emprunts en retard : {stats['emprunts_en_retard']}")
+        print(f"Exemplaires disponibles : {stats['exemplaires_disponibles']}")
+        print(f"Exemplaires sortis : {stats['exemplaires_sortis']}")
+        print(f"Réservations en attente : {stats['reservations_en_attente']}")
+        print(f"Exemplaires mis de côté : {stats['exemplaires_mis_de_cote']}")
+        for categorie, nb in sorted(stats["livres_par_categorie"].items()):
+            print(f"  {categorie} : {nb} livre(s)")
 
 
 # -------------------------------
@@ -541,121 +2237,333 @@ def initialiser_bibliotheque():
     return b
 
 
-# fonction qui charge les fichiers csv avec pandas                                                          
-def charger_csv_pandas(f_livres="livres.csv", f_utilisateurs="utilisateurs.csv", f_emprunts="emprunts.csv"):
-    
-    #charge les fichiers csv en DataFrame
-    df_livres = pd.read_csv(f_livres)
-    df_users = pd.read_csv(f_utilisateurs)
-    df_emprunts = pd.read_csv(f_emprunts)
-
-    # verifier les colonnes
-    for col in ["id","titre","auteur","categorie","exemplaires","statut"]:
-        if col not in df_livres.columns:
-            print(f"Colonne manquante dans livres.csv: {col}")
-
-    for col in ["id","nom","email","type"]:
-        if col not in df_users.columns:
-            print(f"Colonne manquante dans utilisateurs.csv: {col}")
-
-    for col in ["id","livre_id","lecteur_id","retourne"]:
-        if col not in df_emprunts.columns:
-            print(f"Colonne manquante dans emprunts.csv: {col}")
-
-    # conversion en bool du resultat retourné
-        if "est_retourne" in df_emprunts.columns:
-            df_emprunts["est_retourne"] = df_emprunts["est_retourne"].astype(str).str.lower().isin(
-            ["true", "1", "vrai", "yes", "y", "oui"]
-        )
-
+# schéma des CSV écrits par exporter_csv_depuis_biblio : {table: {colonne: type pandas}}
+# "datetime" = date ISO (vide = NaT), "boolean" = True/False écrits par le module csv
+SCHEMAS_CSV = {
+    "livres": {"id": "Int64", "titre": "string", "auteur": "string", "categorie": "category",
+               "exemplaires": "Int32", "statut": "category"},
+    "utilisateurs": {"id": "Int64", "nom": "string", "email": "string", "type": "category"},
+    "emprunts": {"id": "Int64", "livre_id": "Int64", "lecteur_id": "Int64", "retourne": "boolean",
+                 "date_emprunt": "datetime", "date_retour_prevue": "datetime", "date_retour_effective": "datetime"},
+}
+VALEURS_VRAIES = ["True", "true", "1", "vrai", "oui", "yes", "y"]
+VALEURS_FAUSSES = ["False", "false", "0", "faux", "non", "no", "n"]
+
+
+# vérifie l'en-tete du fichier avant toute lecture : ValueError si une colonne demandée manque
+def verifier_entete_csv(fichier, table, colonnes=None):
+    with open(fichier, newline="", encoding="utf-8") as f:
+        entete = next(csv.reader(f), [])
+    attendues = list(SCHEMAS_CSV[table]) if colonnes is None else colonnes
+    manquantes = [col for col in attendues if col not in entete]
+    if manquantes:
+        raise ValueError(f"{fichier} : colonne(s) manquante(s) pour la table {table} : {', '.join(manquantes)}")
+
+
+# lit un CSV avec les types de SCHEMAS_CSV et seulement les colonnes demandées (None = toutes) ;
+# avec taille_morceau, retourne un itérateur de DataFrames de taille_morceau lignes
+def lire_csv_type(fichier, table, colonnes=None, taille_morceau=None):
+    import pandas as pd
+
+    verifier_entete_csv(fichier, table, colonnes)
+    schema = SCHEMAS_CSV[table]
+    colonnes = list(schema) if colonnes is None else list(colonnes)
+    dates = [col for col in colonnes if schema[col] == "datetime"]
+    try:
+        return pd.read_csv(fichier, usecols=colonnes, chunksize=taille_morceau, encoding="utf-8",
+                           dtype={col: schema[col] for col in colonnes if col not in dates},
+                           parse_dates=dates, date_format="ISO8601",
+                           true_values=VALEURS_VRAIES, false_values=VALEURS_FAUSSES)
+    except (ValueError, TypeError) as erreur:
+        raise ValueError(f"{fichier} : {erreur}") from erreur
+
+
+# fonction qui charge les fichiers csv avec pandas
+# colonnes = {table: [colonnes]} pour ne lire qu'une partie des colonnes (None = tout)
+def charger_csv_pandas(f_livres="livres.csv", f_utilisateurs="utilisateurs.csv", f_emprunts="emprunts.csv",
+                       colonnes=None):
+    fichiers = {"livres": f_livres, "utilisateurs": f_utilisateurs, "emprunts": f_emprunts}
+    colonnes = colonnes or {}
+
+    # les trois en-tetes sont vérifiés avant de lire les données
+    for table, fichier in fichiers.items():
+        verifier_entete_csv(fichier, table, colonnes.get(table))
+
+    #charge les fichiers csv en DataFrame typés
+    df_livres, df_users, df_emprunts = (lire_csv_type(fichier, table, colonnes.get(table))
+                                        for table, fichier in fichiers.items())
     return df_livres, df_users, df_emprunts
 
 
-#la fonction qui genere les les graphiques  et calcul les stats version pandas                               
-def stats_et_graphs(df_livres, df_users, df_emprunts, dossier_sortie="MesGraphiques"):
-
-    # --- 1) Nombre total de livres par catégorie (barres) ---
-    #nombre de livres dans chaque catégorie
-    livres_par_cat = df_livres["categorie"].value_counts().sort_values(ascending=False)
-
-
-    print("\n=== Livres par catégorie ===")
-    print(livres_par_cat)
-
-    # je trace un graphique en barres
-    plt.figure()
-    livres_par_cat.plot(kind="bar")  # simple et clair
-    plt.title("Nombre de livres par catégorie")
-    plt.xlabel("Catégorie")
-    plt.ylabel("Nombre de livres")
-    plt.tight_layout()
-    plt.savefig(Path(dossier_sortie) / "livres_par_categorie.png")
-    plt.close()
+# agrégats du rapport calculés morceau par morceau, sans garder les CSV en mémoire
+# meme résultat que agreger_rapport(*charger_csv_pandas(...)) pour les graphiques demandés
+def agreger_csv_par_morceaux(f_livres="livres.csv", f_utilisateurs="utilisateurs.csv", f_emprunts="emprunts.csv",
+                             graphiques=None, taille_morceau=TAILLE_MORCEAU_CSV):
+    fichiers = {"livres": f_livres, "utilisateurs": f_utilisateurs, "emprunts": f_emprunts}
+    colonnes = colonnes_rapport(graphiques)
+    for table, cols in colonnes.items():
+        verifier_entete_csv(fichiers[table], table, cols)
+
+    lignes = {}
+    comptages = {}
+    for table, cols in colonnes.items():
+        # au moins une colonne est lue pour compter les lignes
+        a_lire = cols or ["id"]
+        lignes[table] = 0
+        for morceau in lire_csv_type(fichiers[table], table, a_lire, taille_morceau):
+            lignes[table] += len(morceau)
+            for col in cols:
+                compte = morceau[col].value_counts()
+                cle = (table, col)
+                comptages[cle] = compte if cle not in comptages else comptages[cle].add(compte, fill_value=0)
+
+    def compte(table, col):
+        serie = comptages.get((table, col))
+        return None if serie is None else serie.astype("int64")
+
+    retournes = compte("emprunts", "retourne")
+    return construire_agregats(
+        livres_par_cat=compte("livres", "categorie"),
+        nb_livres=lignes.get("livres"),
+        emprunts_en_cours=None if retournes is None else int(retournes.get(False, 0)),
+        users_par_type=compte("utilisateurs", "type"),
+    )
 
 
-    # Nombre de livres empruntés (barres simple: empruntés vs non-empruntés)
-    # nb d'emprunts qui sont EN COURS
-    emprunts_en_cours = (~df_emprunts["retourne"]).sum()
+# construit les DataFrames du rapport directement depuis la bibliothèque en mémoire (sans passer par les CSV)
+# memes colonnes que les fichiers écrits par exporter_csv_depuis_biblio
+def dataframes_depuis_biblio(biblio):
+    import numpy as np
+    import pandas as pd
+
+    colonnes_livres = ["id", "titre", "auteur", "categorie", "exemplaires", "statut"]
+    livres = list(zip(*map(attrgetter(*colonnes_livres), biblio.livres.values())))
+    df_livres = pd.DataFrame(dict(zip(colonnes_livres, livres)) if livres else {c: [] for c in colonnes_livres})
+
+    utilisateurs = biblio.utilisateurs.values()
+    df_users = pd.DataFrame({
+        "id": [u.id for u in utilisateurs],
+        "nom": [u.nom for u in utilisateurs],
+        "email": [u.email for u in utilisateurs],
+        "type": [type_utilisateur(u) for u in utilisateurs],
+    })
+
+    # les colonnes du registre sont reprises telles quelles : les dates sont des secondes depuis 1970
+    # et SANS_DATE correspond a NaT dans numpy, aucune conversion ligne par ligne n'est nécessaire
+    # (pd.DataFrame copie les tableaux d'un dictionnaire : les vues np.frombuffer ne survivent pas a l'appel)
+    registre = biblio.emprunts
+    en_cours = np.frombuffer(registre.masque_en_cours(), dtype=np.uint8)
+    df_emprunts = pd.DataFrame({
+        "id": np.frombuffer(registre.ids, dtype=np.int64),
+        "livre_id": np.frombuffer(registre.livre_ids, dtype=np.int64),
+        "lecteur_id": np.frombuffer(registre.lecteur_ids, dtype=np.int64),
+        "retourne": en_cours == 0,
+        "date_emprunt": np.frombuffer(registre.dates_emprunt, dtype="datetime64[s]"),
+        "date_retour_prevue": np.frombuffer(registre.dates_retour_prevue, dtype="datetime64[s]"),
+        "date_retour_effective": np.frombuffer(registre.dates_retour_effective, dtype="datetime64[s]"),
+    })
+    return df_livres, df_users, df_emprunts
 
-    # total de livres 
-    total_livres = len(df_livres)
 
-    # livres "non empruntés" 
-    non_empruntes = max(0, total_livres - int(emprunts_en_cours))
+# calcule les agrégats du rapport (une Series par graphique) et affiche les stats dans la console
+# une table a None (ou sans la colonne utile) saute les agrégats qui en dépendent : c'est le cas quand
+# seules les colonnes de certains graphiques ont été lues (voir colonnes_rapport)
+def agreger_rapport(df_livres, df_users, df_emprunts):
+    livres = df_livres is not None
+    return construire_agregats(
+        # --- 1) Nombre total de livres par catégorie ---
+        livres_par_cat=df_livres["categorie"].value_counts() if livres and "categorie" in df_livres.columns else None,
+        nb_livres=len(df_livres) if livres else None,
+        # nb d'emprunts qui sont EN COURS
+        emprunts_en_cours=int(df_emprunts["retourne"].eq(False).sum())
+        if df_emprunts is not None and "retourne" in df_emprunts.columns else None,
+        # Nombre d’utilisateurs par type (lecteurs et bibliothecaires)
+        users_par_type=df_users["type"].value_counts() if df_users is not None and "type" in df_users.columns else None,
+    )
 
-    print("\n=== Emprunts ===")
-    print(f"Livres empruntés (en cours) : {emprunts_en_cours}")
-    print(f"Livres non empruntés       : {non_empruntes}")
 
-    #mini bar chart
-    plt.figure()
-    pd.Series(
-        {"Empruntés": emprunts_en_cours, "Non empruntés": non_empruntes}
-    ).plot(kind="bar")
-    plt.title("Livres empruntés (en cours) vs non empruntés")
-    plt.ylabel("Nombre")
-    plt.tight_layout()
-    plt.savefig(Path(dossier_sortie) / "empruntes_vs_non_empruntes.png")
-    plt.close()
+# met en forme et affiche les agrégats a partir des comptages (None = agrégat non demandé)
+def construire_agregats(livres_par_cat=None, nb_livres=None, emprunts_en_cours=None, users_par_type=None):
+    import pandas as pd
+
+    agregats = {}
+    if livres_par_cat is not None:
+        livres_par_cat = livres_par_cat[livres_par_cat > 0].sort_values(ascending=False)
+        livres_par_cat.index = livres_par_cat.index.astype(str)
+        livres_par_cat.index.name = "categorie"
+
+        print("\n=== Livres par catégorie ===")
+        print(livres_par_cat)
+        agregats["livres_par_categorie"] = livres_par_cat
+
+    # Nombre de livres empruntés (empruntés vs non-empruntés)
+    if nb_livres is not None and emprunts_en_cours is not None:
+        # livres "non empruntés"
+        non_empruntes = max(0, nb_livres - emprunts_en_cours)
+
+        print("\n=== Emprunts ===")
+        print(f"Livres empruntés (en cours) : {emprunts_en_cours}")
+        print(f"Livres non empruntés       : {non_empruntes}")
+        agregats["empruntes_vs_non_empruntes"] = pd.Series({"Empruntés": emprunts_en_cours,
+                                                            "Non empruntés": non_empruntes})
+
+    if users_par_type is not None:
+        users_par_type = users_par_type[users_par_type > 0].sort_values(ascending=False)
+        users_par_type.index = users_par_type.index.astype(str)
+        users_par_type.index.name = "type"
+
+        print("\n=== Utilisateurs par type ===")
+        print(users_par_type)
+        agregats["utilisateurs_par_type"] = users_par_type
+
+    return agregats
+
+
+# fonctions de dessin : chacune reçoit les axes d'une Figure (API objet de matplotlib, pas l'état global de pyplot)
+def dessiner_livres_par_categorie(ax, agregats):
+    serie = agregats["livres_par_categorie"]
+    ax.bar([str(c) for c in serie.index], serie.values)
+    ax.set_title("Nombre de livres par catégorie")
+    ax.set_xlabel("Catégorie")
+    ax.set_ylabel("Nombre de livres")
+    ax.tick_params(axis="x", labelrotation=90)
+
+def dessiner_empruntes_vs_non_empruntes(ax, agregats):
+    serie = agregats["empruntes_vs_non_empruntes"]
+    ax.bar(list(serie.index), serie.values)
+    ax.set_title("Livres empruntés (en cours) vs non empruntés")
+    ax.set_ylabel("Nombre")
+
+def dessiner_utilisateurs_par_type(ax, agregats):
+    serie = agregats["utilisateurs_par_type"]
+    ax.pie(serie.values, labels=list(serie.index), autopct="%1.0f%%")  #  afficher en %
+    ax.set_title("Répartition des utilisateurs")
+
+
+# registre des graphiques du rapport : nom -> (fichier png, fonction de dessin)
+# un nouveau graphique s'ajoute avec enregistrer_graphique, sans toucher a stats_et_graphs
+# colonnes : {table: [colonnes]} lues pour ce graphique depuis l'export en colonnes (une liste vide = seul
+# le nombre de lignes de la table compte)
+GRAPHIQUES = {}
+COLONNES_GRAPHIQUES = {}
+
+def enregistrer_graphique(nom, fichier, dessiner, colonnes=None):
+    GRAPHIQUES[nom] = (fichier, dessiner)
+    COLONNES_GRAPHIQUES[nom] = colonnes or {}
+
+enregistrer_graphique("livres_par_categorie", "livres_par_categorie.png", dessiner_livres_par_categorie,
+                      {"livres": ["categorie"]})
+enregistrer_graphique("empruntes_vs_non_empruntes", "empruntes_vs_non_empruntes.png", dessiner_empruntes_vs_non_empruntes,
+                      {"livres": [], "emprunts": ["retourne"]})
+enregistrer_graphique("utilisateurs_par_type", "utilisateurs_par_type.png", dessiner_utilisateurs_par_type,
+                      {"utilisateurs": ["type"]})
+
+
+# colonnes a lire pour les graphiques demandés : {table: [colonnes]}, les tables inutiles sont absentes
+def colonnes_rapport(graphiques=None):
+    noms = list(GRAPHIQUES) if graphiques is None else list(graphiques)
+    inconnus = [nom for nom in noms if nom not in GRAPHIQUES]
+    if inconnus:
+        raise ValueError(f"Graphique(s) inconnu(s) : {', '.join(inconnus)}")
+    colonnes = {}
+    for nom in noms:
+        for table, cols in COLONNES_GRAPHIQUES[nom].items():
+            deja = colonnes.setdefault(table, [])
+            deja.extend(c for c in cols if c not in deja)
+    return colonnes
+
+NB_TRAVAILLEURS_GRAPHIQUES = 4
+
+
+# dessine un graphique dans sa propre Figure rendue par Agg (sans écran), retourne la durée en secondes
+def rendre_graphique(nom, agregats, dossier_sortie):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    debut = time.perf_counter()
+    fichier, dessiner = GRAPHIQUES[nom]
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    dessiner(figure.add_subplot(), agregats)
+    figure.tight_layout()
+    figure.savefig(Path(dossier_sortie) / fichier)
+    return time.perf_counter() - debut
+
+
+# rend les graphiques demandés en parallele ; graphiques=None veut dire tous les graphiques du registre
+# retourne {nom: durée du rendu en secondes}
+def rendre_rapport(agregats, dossier_sortie="MesGraphiques", graphiques=None, executeur=None):
+    noms = list(GRAPHIQUES) if graphiques is None else list(graphiques)
+    inconnus = [nom for nom in noms if nom not in GRAPHIQUES]
+    if inconnus:
+        raise ValueError(f"Graphique(s) inconnu(s) : {', '.join(inconnus)}")
+
+    # premier import de matplotlib fait ici, avant que plusieurs threads ne le demandent en meme temps
+    import matplotlib.backends.backend_agg
+
+    os.makedirs(dossier_sortie, exist_ok=True)
+    pool = executeur or ThreadPoolExecutor(max_workers=NB_TRAVAILLEURS_GRAPHIQUES)
+    try:
+        taches = {nom: pool.submit(rendre_graphique, nom, agregats, dossier_sortie) for nom in noms}
+        return {nom: tache.result() for nom, tache in taches.items()}
+    finally:
+        if executeur is None:
+            pool.shutdown()
 
-    # Nombre d’utilisateurs par type (camembert)
-    # nombre des lecteur et Bibliothecaire
-    users_par_type = df_users["type"].value_counts()
 
-    print("\n=== Utilisateurs par type ===")
-    print(users_par_type)
+#la fonction qui genere les les graphiques  et calcul les stats version pandas
+def stats_et_graphs(df_livres, df_users, df_emprunts, dossier_sortie="MesGraphiques", graphiques=None):
+    return graphs_depuis_agregats(agreger_rapport(df_livres, df_users, df_emprunts), dossier_sortie, graphiques)
 
-    # camembert
-    plt.figure()
-    users_par_type.plot(kind="pie", autopct="%1.0f%%", ylabel="")  #  afficher en %
-    plt.title("Répartition des utilisateurs")
-    plt.tight_layout()
-    plt.savefig(Path(dossier_sortie) / "utilisateurs_par_type.png")
-    plt.close()
+# rend les graphiques a partir d'agrégats déja calculés et affiche les fichiers produits
+def graphs_depuis_agregats(agregats, dossier_sortie="MesGraphiques", graphiques=None):
+    durees = rendre_rapport(agregats, dossier_sortie, graphiques)
 
-    print(f"\nGraphiques enregistrés dans: {Path(dossier_sortie).resolivree()}")
-    print(" - livres_par_categorie.png")
-    print(" - empruntes_vs_non_empruntes.png")
-    print(" - utilisateurs_par_type.png")
+    print(f"\nGraphiques enregistrés dans: {Path(dossier_sortie).resolve()}")
+    for nom, duree in durees.items():
+        print(f" - {GRAPHIQUES[nom][0]} ({duree * 1000:.0f} ms)")
+    return durees
 
 #fonction pour lancer le chargement des csv et calculer les stats et et les graphiques                        
+# avec dossier_colonnes, les données viennent de l'export en colonnes (exporter_colonnes_depuis_biblio)
+# et seules les colonnes utiles aux graphiques demandés sont lues
 def run_rapport_pandas(
     f_livres="livres.csv",
     f_utilisateurs="utilisateurs.csv",
     f_emprunts="emprunts.csv",
-    dossier_sortie="MesGraphiques"):
+    dossier_sortie="MesGraphiques",
+    graphiques=None,
+    dossier_colonnes=None,
+    format_colonnes="parquet"):
 
     # crée le dossier de sortie s'il n'existe pas
     if not os.path.exists(dossier_sortie):
         os.makedirs(dossier_sortie)
 
-    # charge les données depuis les fichiers CSV
-    df_livres, df_utilisateurs, df_emprunts = charger_csv_pandas(
-        f_livres, f_utilisateurs, f_emprunts
-    )
+    if dossier_colonnes is not None:
+        # charge seulement les colonnes des graphiques demandés
+        tables = charger_colonnes_pandas(dossier_colonnes, colonnes_rapport(graphiques), format_colonnes)
+        agregats = agreger_rapport(*(tables.get(t) for t in ("livres", "utilisateurs", "emprunts")))
+    else:
+        # lit les CSV par morceaux, seulement les colonnes utiles, et cumule les comptages
+        agregats = agreger_csv_par_morceaux(f_livres, f_utilisateurs, f_emprunts, graphiques)
+
+    # lance la création des graphes
+    graphs_depuis_agregats(agregats, dossier_sortie, graphiques)
+
+    print("Rapport généré dans le dossier :", dossier_sortie)
+
+# rapport pandas a partir de la bibliothèque en mémoire ; l'export CSV n'est fait que si on le demande
+# (les données sont lues dans biblio.instantane() : des emprunts peuvent arriver pendant le rapport)
+def run_rapport_memoire(biblio, dossier_sortie="MesGraphiques", exporter_csv=False, graphiques=None):
+    os.makedirs(dossier_sortie, exist_ok=True)
+    donnees = biblio.instantane()
+
+    if exporter_csv:
+        exporter_csv_depuis_biblio(donnees)
 
-    # lance le calcul des stats et la création des graphes
-    stats_et_graphs(df_livres, df_utilisateurs, df_emprunts, dossier_sortie)
+    df_livres, df_utilisateurs, df_emprunts = dataframes_depuis_biblio(donnees)
+    stats_et_graphs(df_livres, df_utilisateurs, df_emprunts, dossier_sortie, graphiques)
 
     print("Rapport généré dans le dossier :", dossier_sortie)
 
@@ -671,7 +2579,7 @@ def exporter_csv_depuis_biblio(biblio,
         ecrivain.writerow(["id", "titre", "auteur", "categorie", "exemplaires", "statut"])
         
         # parcour la liste des livres
-        for livre in getattr(biblio, "livres", []):
+        for livre in getattr(biblio, "livres", {}).values():
             ecrivain.writerow([getattr(livre, "id", ""),
                         getattr(livre, "titre", ""),
                         getattr(livre, "auteur", ""),
@@ -709,10 +2617,13 @@ def exporter_csv_depuis_biblio(biblio,
         # parcourt le dictionnaire des emprunts
         for emprunt in getattr(biblio, "emprunts", {}).values():
             ecrivain.writerow([
-                getattr(emprunt, "id", ""),
-                getattr(emprunt, "id_livre", ""),
-                getattr(emprunt, "id_lecteur", ""),
-                getattr(emprunt, "est_retourne", False)
+                emprunt.id,
+                emprunt.livre_id,
+                emprunt.lecteur_id,
+                emprunt.retourne,
+                _iso(emprunt.date_emprunt),
+                _iso(emprunt.date_retour_prevue),
+                _iso(emprunt.date_retour_effective)
             ])
 
     print(" Export CSV terminé avec succès.")
@@ -721,34 +2632,194 @@ def exporter_csv_depuis_biblio(biblio,
     print(f" - {f_emprunts}")
 
 
-##  Sauvegarde chargement JSON                                                                                  
-def sauvegarder_json(biblio, dossier="data_json"):
+# schémas Arrow de l'export en colonnes : {table: (schéma, colonnes de partitionnement)}
+# livres partitionnés par catégorie, emprunts par mois d'emprunt ("AAAA-MM"), utilisateurs en un seul fichier
+def schemas_colonnes():
+    import pyarrow as pa
+
+    texte_code = pa.dictionary(pa.int32(), pa.string())
+    return {
+        "livres": (pa.schema([("id", pa.int64()), ("titre", pa.string()), ("auteur", pa.string()),
+                              ("exemplaires", pa.int32()), ("statut", texte_code), ("categorie", pa.string())]),
+                   ["categorie"]),
+        "utilisateurs": (pa.schema([("id", pa.int64()), ("nom", pa.string()), ("email", pa.string()),
+                                    ("type", texte_code)]),
+                         []),
+        "emprunts": (pa.schema([("id", pa.int64()), ("livre_id", pa.int64()), ("lecteur_id", pa.int64()),
+                                ("retourne", pa.bool_()), ("date_emprunt", pa.timestamp("s")),
+                                ("date_retour_prevue", pa.timestamp("s")),
+                                ("date_retour_effective", pa.timestamp("s")), ("mois", pa.string())]),
+                     ["mois"]),
+    }
+
+
+# copie d'une colonne du registre en tableau numpy, d'un bloc. Une vue (np.frombuffer seul) reprise par Arrow
+# sans copie bloquerait les ajouts dans le registre (BufferError) tant que la table existe
+def _copie_colonne(colonne, dtype):
+    import numpy as np
+    return np.frombuffer(colonne, dtype=dtype).copy()
+
+
+# tables Arrow de la bibliothèque ; les colonnes du registre des emprunts sont copiées d'un bloc, sans
+# conversion ligne a ligne
+def tables_arrow_depuis_biblio(biblio):
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    schemas = schemas_colonnes()
+    colonnes_livres = ["id", "titre", "auteur", "exemplaires", "statut", "categorie"]
+    livres = list(zip(*map(attrgetter(*colonnes_livres), biblio.livres.values()))) or [[]] * len(colonnes_livres)
+    utilisateurs = biblio.utilisateurs.values()
+
+    registre = biblio.emprunts
+    dates = {nom: pa.array(_copie_colonne(getattr(registre, nom), "datetime64[s]"),
+                           type=pa.timestamp("s"), from_pandas=True)
+             for nom in ("dates_emprunt", "dates_retour_prevue", "dates_retour_effective")}
+    en_cours = np.frombuffer(registre.masque_en_cours(), dtype=np.uint8)
+
+    return {
+        "livres": pa.Table.from_pydict({
+            **dict(zip(colonnes_livres, livres)),
+            "statut": pa.array(livres[4], pa.string()).dictionary_encode(),
+        }, schema=schemas["livres"][0]),
+        "utilisateurs": pa.Table.from_pydict({
+            "id": [u.id for u in utilisateurs],
+            "nom": [u.nom for u in utilisateurs],
+            "email": [u.email for u in utilisateurs],
+            "type": pa.array([type_utilisateur(u) for u in utilisateurs]).dictionary_encode(),
+        }, schema=schemas["utilisateurs"][0]),
+        "emprunts": pa.Table.from_arrays([
+            pa.array(_copie_colonne(registre.ids, np.int64)),
+            pa.array(_copie_colonne(registre.livre_ids, np.int64)),
+            pa.array(_copie_colonne(registre.lecteur_ids, np.int64)),
+            pa.array(en_cours == 0),
+            dates["dates_emprunt"],
+            dates["dates_retour_prevue"],
+            dates["dates_retour_effective"],
+            pc.strftime(dates["dates_emprunt"], format="%Y-%m"),
+        ], schema=schemas["emprunts"][0]),
+    }
+
+
+# export en colonnes (format "parquet" ou "ipc" pour Arrow IPC) : un sous-dossier par table, partitionné
+# a la Hive (categorie=Roman/, mois=2024-05/). L'export est écrit a coté puis remplace l'ancien d'un coup.
+# Une table vide est écrite quand meme (un fichier avec le schéma seul) : chaque table peut etre relue.
+def exporter_colonnes_depuis_biblio(biblio, dossier=DOSSIER_COLONNES_DEFAUT, format="parquet"):
+    import pyarrow.dataset as ds
+
+    schemas = schemas_colonnes()
+    tables = tables_arrow_depuis_biblio(biblio)
+    dossier = Path(dossier)
+    temporaire = dossier.with_name(dossier.name + ".tmp")
+    shutil.rmtree(temporaire, ignore_errors=True)
+    temporaire.mkdir(parents=True)
+    for nom, table in tables.items():
+        schema, partitions = schemas[nom]
+        if table.num_rows == 0:
+            _ecrire_table_vide(table, temporaire / nom, format)
+            continue
+        ds.write_dataset(
+            table, temporaire / nom, format=format,
+            partitioning=ds.partitioning(schema.empty_table().select(partitions).schema, flavor="hive")
+            if partitions else None,
+            basename_template="partie-{i}." + ("parquet" if format == "parquet" else "arrow"),
+            max_rows_per_group=1 << 20,
+        )
+    shutil.rmtree(dossier, ignore_errors=True)
+    temporaire.rename(dossier)
+
+    print(f" Export {format} terminé : {dossier.resolve()}")
+    for nom, table in tables.items():
+        print(f" - {nom} : {table.num_rows} lignes")
+
+
+# write_dataset n'écrit aucun fichier pour une table vide : on écrit un seul fichier qui porte le schéma
+def _ecrire_table_vide(table, dossier, format):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    dossier.mkdir(parents=True)
+    if format == "parquet":
+        pq.write_table(table, dossier / "partie-0.parquet")
+    else:
+        with pa.ipc.new_file(dossier / "partie-0.arrow", table.schema) as fichier:
+            fichier.write_table(table)
+
+
+# lit l'export en colonnes ; colonnes = {table: [colonnes]} (None = toutes les colonnes de toutes les tables)
+# retourne {table: DataFrame}. Les colonnes de partitionnement sont reconstituées depuis les noms de dossiers.
+def charger_colonnes_pandas(dossier=DOSSIER_COLONNES_DEFAUT, colonnes=None, format="parquet"):
+    import pyarrow.dataset as ds
+
+    schemas = schemas_colonnes()
+    colonnes = colonnes if colonnes is not None else {nom: None for nom in schemas}
+    dossier = Path(dossier)
+    resultat = {}
+    for nom, cols in colonnes.items():
+        schema, partitions = schemas[nom]
+        jeu = ds.dataset(dossier / nom, schema=schema, format=format,
+                         partitioning=ds.partitioning(schema.empty_table().select(partitions).schema, flavor="hive")
+                         if partitions else None)
+        resultat[nom] = jeu.to_table(columns=cols).to_pandas()
+    return resultat
+
+
+##  Sauvegarde chargement JSON
+# fichiers d'un snapshot JSON, écrits dans un dossier de génération (snapshot-000001/, snapshot-000002/...)
+FICHIERS_SNAPSHOT_JSON = ("livres.json", "utilisateurs.json", "emprunts.json", "reservations.json")
+MOTIF_GENERATION = re.compile(r"snapshot-(\d+)")
+
+# une seule sauvegarde JSON a la fois (deux générations écrites en meme temps se supprimeraient l'une l'autre)
+VERROU_SAUVEGARDE_JSON = threading.Lock()
+
+# chaque sauvegarde écrit une nouvelle génération complete, puis etat.json (remplacé d'un coup) désigne
+# cette génération avec le numéro de la derniere opération du journal qu'elle contient. Un arret pendant
+# la sauvegarde laisse l'ancienne génération et son numéro : le journal est rejoué sur un snapshot cohérent.
+# attendre=False : si une autre sauvegarde est en cours, on n'attend pas et on retourne False
+# (compaction du journal depuis une opération qui tient verrou_index)
+def sauvegarder_json(biblio, dossier="data_json", attendre=True):
+    if not VERROU_SAUVEGARDE_JSON.acquire(blocking=attendre):
+        return False
+    try:
+        _sauvegarder_json(biblio, dossier)
+    finally:
+        VERROU_SAUVEGARDE_JSON.release()
+    return True
+
+def _sauvegarder_json(biblio, dossier):
     p = Path(dossier); p.mkdir(parents=True, exist_ok=True)
+    numero = 1 + max((int(m.group(1)) for m in map(MOTIF_GENERATION.match, os.listdir(p)) if m), default=0)
+    generation = f"snapshot-{numero:06d}"
+    g = p / (generation + ".tmp")
+    shutil.rmtree(g, ignore_errors=True)
+    g.mkdir()
+
+    # les données et le numéro de la derniere opération du journal sont pris ensemble sous verrou_index ;
+    # les fichiers s'écrivent ensuite hors verrou (les opérations suivantes restent dans le journal)
+    journal = getattr(biblio, "journal", None)
+    if journal is not None and Path(journal.dossier).resolve() != p.resolve():
+        journal = None
+    verrou = getattr(biblio, "verrou_index", nullcontext())
+    with verrou:
+        if hasattr(biblio, "instantane"):
+            biblio = biblio.instantane()
+        sequence = journal.sequence if journal is not None else None
 
     # livres.json
-    livres = []
-    for livre in getattr(biblio, "livres", []):
-        livres.append({
-            "id": livre.id,
-            "titre": livre.titre,
-            "auteur": livre.auteur,
-            "categorie": livre.categorie,
-            "exemplaires": int(livre.exemplaires),
-            "statut": livre.statut
-        })
-    (p / "livres.json").write_text(json.dumps(livres, ensure_ascii=False, indent=2), encoding="utf-8")
+    livres = [donnees_livre(livre) for livre in getattr(biblio, "livres", {}).values()]
+    ecrire_fichier_atomique(g / "livres.json", json.dumps(livres, ensure_ascii=False, indent=2))
 
     # utilisateurs.json
     users = []
     for u in getattr(biblio, "utilisateurs", {}).values():
-        t = "Lecteur" if isinstance(u, Lecteur) else ("Bibliothecaire" if isinstance(u, Bibliothecaire) else u.__class__.__name__)
         users.append({
             "id": u.id,
             "nom": u.nom,
             "email": u.email,
-            "type": t
+            "type": type_utilisateur(u)
         })
-    (p / "utilisateurs.json").write_text(json.dumps(users, ensure_ascii=False, indent=2), encoding="utf-8")
+    ecrire_fichier_atomique(g / "utilisateurs.json", json.dumps(users, ensure_ascii=False, indent=2))
 
     # emprunts.json
     emps = []
@@ -762,125 +2833,953 @@ def sauvegarder_json(biblio, dossier="data_json"):
             "date_retour_prevue": e.date_retour_prevue.isoformat() if e.date_retour_prevue else None,
             "date_retour_effective": e.date_retour_effective.isoformat() if e.date_retour_effective else None
         })
-    (p / "emprunts.json").write_text(json.dumps(emps, ensure_ascii=False, indent=2), encoding="utf-8")
+    ecrire_fichier_atomique(g / "emprunts.json", json.dumps(emps, ensure_ascii=False, indent=2))
+
+    # reservations.json : files d'attente et exemplaires mis de côté
+    ecrire_fichier_atomique(g / "reservations.json",
+                            json.dumps(biblio.donnees_reservations(), ensure_ascii=False, indent=2))
+    g.rename(p / generation)
+
+    # etat.json : bascule sur la nouvelle génération, avec le numéro de la derniere opération du journal
+    # contenue dans ce snapshot
+    if sequence is None:
+        sequence = derniere_sequence_journal(p / "journal.jsonl")
+    ecrire_fichier_atomique(p / "etat.json", json.dumps({"sequence": sequence, "snapshot": generation}))
+
+    # les opérations du journal jusqu'a cette séquence sont maintenant dans le snapshot
+    if journal is not None:
+        with verrou:
+            journal.retirer_jusqua(sequence)
+
+    # anciennes générations (et fichiers d'avant les générations) devenues inutiles
+    for nom in os.listdir(p):
+        if MOTIF_GENERATION.match(nom) and nom != generation:
+            shutil.rmtree(p / nom, ignore_errors=True)
+    for nom in FICHIERS_SNAPSHOT_JSON:
+        (p / nom).unlink(missing_ok=True)
+
+    print(f"JSON sauvegardés dans {(p / generation).resolve()}")
+
+# écrit un fichier d'un coup : le contenu passe par un fichier temporaire (écrit sur le disque) renommé a la fin
+def ecrire_fichier_atomique(chemin, texte):
+    temporaire = Path(str(chemin) + ".tmp")
+    with open(temporaire, "w", encoding="utf-8") as fichier:
+        fichier.write(texte)
+        fichier.flush()
+        os.fsync(fichier.fileno())
+    os.replace(temporaire, chemin)
+
+# fin d'un élément de premier niveau suivie du début du suivant (les éléments sont des objets "plats")
+MOTIF_ELEMENT_SUIVANT = re.compile(r"\}\s*,\s*(?=\{)")
+
+# lecture progressive d'un fichier JSON : un tableau d'objets (.json) ou un objet par ligne (.jsonl)
+# retourne des couples (numéro de l'élément, objet) sans charger tout le fichier en mémoire ;
+# les erreurs de syntaxe sont ajoutées a la liste erreurs (numéro, message) et la lecture reprend
+# a l'élément suivant. Un élément plus long que taille_maxi_element est traité comme invalide.
+def iterer_json(chemin, erreurs, taille_bloc=1 << 20, taille_maxi_element=16 << 20):
+    chemin = Path(chemin)
+    with open(chemin, encoding="utf-8") as fichier:
+        # JSON Lines : chaque ligne est indépendante, une ligne invalide n'empeche pas de lire les suivantes
+        if chemin.suffix == ".jsonl":
+            for numero, ligne in enumerate(fichier, 1):
+                if not ligne.strip():
+                    continue
+                try:
+                    yield numero, json.loads(ligne)
+                except json.JSONDecodeError as exc:
+                    erreurs.append((numero, f"JSON invalide : {exc}"))
+            return
 
-    print(f"JSON sauvegardés dans {p.resolve()}")
+        # tableau JSON : on décode les éléments un par un dans un tampon de taille bornée
+        decodeur = json.JSONDecoder()
+        tampon = fichier.read(taille_bloc).lstrip()
+        if not tampon.startswith("["):
+            erreurs.append((0, "Un tableau JSON est attendu."))
+            return
+        pos = 1
+        numero = 0
+        while True:
+            while pos < len(tampon) and tampon[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(tampon) and tampon[pos] == "]":
+                return
+            try:
+                if pos >= len(tampon):
+                    raise json.JSONDecodeError("Fin du tampon", tampon, pos)
+                objet, pos = decodeur.raw_decode(tampon, pos)
+            except json.JSONDecodeError as exc:
+                # l'élément est peut-etre coupé par la fin du tampon : on lit la suite du fichier
+                if _element_coupe(exc, tampon) and len(tampon) - pos <= taille_maxi_element:
+                    suite = fichier.read(taille_bloc)
+                    if suite:
+                        tampon = tampon[pos:] + suite
+                        pos = 0
+                        continue
+                # sinon l'élément est invalide : on le saute et on reprend au début de l'élément suivant
+                numero += 1
+                erreurs.append((numero, f"JSON invalide : {exc.msg}"))
+                tampon, pos = _element_suivant(fichier, tampon, pos + 1, taille_bloc)
+                if pos is None:
+                    return
+                continue
+            numero += 1
+            yield numero, objet
+
+# vrai si l'erreur de décodage peut venir de la fin du tampon (chaine, nombre ou mot-clé coupé)
+# plutot que d'un élément mal formé
+def _element_coupe(exc, tampon):
+    return exc.pos >= len(tampon) - 32 or exc.msg.startswith("Unterminated string")
+
+# cherche le début de l'élément de premier niveau qui suit la position debut, en lisant la suite
+# du fichier si besoin (seule la fin du tampon a partir du dernier "}" est gardée entre deux lectures)
+# retourne (tampon, position) ou (tampon, None) si le fichier ne contient plus d'élément
+def _element_suivant(fichier, tampon, debut, taille_bloc):
+    while True:
+        trouve = MOTIF_ELEMENT_SUIVANT.search(tampon, debut)
+        if trouve:
+            return tampon, trouve.end()
+        suite = fichier.read(taille_bloc)
+        if not suite:
+            return tampon, None
+        coupure = tampon.rfind("}", debut)
+        tampon = (tampon[coupure:] if coupure >= 0 else "") + suite
+        debut = 0
+
+
+# construit un Livre a partir d'un élément de livres.json
+def _livre_depuis_donnees(r):
+    identifiant = r.get("id")
+    return Livre(r.get("titre", ""), r.get("auteur", ""), r.get("categorie", ""), int(r.get("exemplaires", 0)),
+                 identifiant=None if identifiant is None else int(identifiant))
+
+# construit un Lecteur ou un Bibliothecaire a partir d'un élément de utilisateurs.json
+def _utilisateur_depuis_donnees(r):
+    return creer_utilisateur(int(r["id"]), r.get("nom", ""), r.get("email", ""), r.get("type", ""))
+
+# date ISO sans fuseau horaire (toutes les dates de la bibliotheque sont en heure locale)
+def _date_locale(texte):
+    date = datetime.fromisoformat(texte)
+    if date.tzinfo is not None:
+        raise ValueError(f"Date avec fuseau horaire non prise en charge : {texte}")
+    return date
+
+# construit un Emprunt a partir d'un élément de emprunts.json (une date invalide rend la ligne invalide)
+def _emprunt_depuis_donnees(r):
+    # dates
+    de = r.get("date_emprunt")
+    drp = r.get("date_retour_prevue")
+    identifiant = r.get("id")
+    e = Emprunt(int(r["livre_id"]), int(r["lecteur_id"]),
+                _date_locale(de) if de else None,
+                _date_locale(drp) if drp else None,
+                identifiant=None if identifiant is None else int(identifiant))
+    dre = r.get("date_retour_effective")
+    e.date_retour_effective = _date_locale(dre) if dre else None
+
+    e.retourne = bool(r.get("retourne", False))
+    return e
+
+# erreurs qui rendent une ligne invalide (construction ou indexation), sans arreter le chargement
+ERREURS_DONNEES = (KeyError, TypeError, ValueError, AttributeError, OverflowError)
+
+# indexe les objets d'un lot [(numéro, objet)] ; un objet refusé (valeur hors limites...) est compté
+# comme ligne invalide. Les numéros des objets indexés sont ajoutés a numeros (si donné)
+def _indexer_lot(lot, indexer, erreurs, numeros=None):
+    for numero, objet in lot:
+        try:
+            indexer(objet)
+        except ERREURS_DONNEES as exc:
+            erreurs.append((numero, f"{type(exc).__name__} : {exc}"))
+        else:
+            if numeros is not None:
+                numeros.append(numero)
+
+# charge un fichier par lots de taille bornée : les objets d'un lot sont construits puis indexés ensemble
+# retourne le rapport du fichier (lignes lues, lignes invalides, durée et débit)
+def _charger_par_lots(chemin, construire, indexer, taille_lot, progression, numeros=None):
+    debut = time.perf_counter()
+    erreurs = []
+    lot = []
+    lignes = 0
+    for numero, donnees in iterer_json(chemin, erreurs):
+        lignes += 1
+        try:
+            lot.append((numero, construire(donnees)))
+        except ERREURS_DONNEES as exc:
+            erreurs.append((numero, f"{type(exc).__name__} : {exc}"))
+        if len(lot) >= taille_lot:
+            _indexer_lot(lot, indexer, erreurs, numeros)
+            lot = []
+            if progression:
+                progression(chemin.name, lignes)
+    _indexer_lot(lot, indexer, erreurs, numeros)
+    if progression:
+        progression(chemin.name, lignes)
+    erreurs.sort(key=lambda erreur: erreur[0])
+
+    duree = time.perf_counter() - debut
+    return {
+        "fichier": str(chemin),
+        "lignes": lignes,
+        "invalides": erreurs,
+        "secondes": duree,
+        "lignes_par_seconde": lignes / duree if duree > 0 else 0.0,
+    }
 
 # chargement du json                                                                                                
-def charger_json(biblio, dossier="data_json"):
+# (lecture progressive par lots ; retourne un rapport par fichier avec les lignes invalides écartées)
+def charger_json(biblio, dossier="data_json", taille_lot=TAILLE_LOT_CHARGEMENT, progression=None):
     p = Path(dossier)
     if not p.exists():
         print("Dossier JSON introuvable.")
-        return
+        return None
 
     # reset
-    biblio.livres = []
-    biblio.utilisateurs = {}
-    biblio.emprunts = {}
-    biblio.emprunts_par_lecteur = {}
-
-    # --- LIVRES ---
-    pf = p / "livres.json"
-    max_id_livre = 0
-    if pf.exists():
-        data_livres = json.loads(pf.read_text(encoding="utf-8"))
-        for r in data_livres:
-            titre = r.get("titre", "")
-            auteur = r.get("auteur", "")
-            categorie = r.get("categorie", "")
-            nb = int(r.get("exemplaires", 0))
-            livre = Livre(titre, auteur, categorie, nb)
-            livre.id = int(r.get("id", livre.id))
-            max_id_livre = max(max_id_livre, livre.id)
-            livre.mettre_a_jour_statut()
-            biblio.livres.append(livre)
+    biblio.reinitialiser()
+
+    # génération désignée par etat.json (les anciennes sauvegardes ont leurs fichiers dans le dossier meme)
+    etat = lire_etat_snapshot(p)
+    source = p / etat["snapshot"] if "snapshot" in etat else p
+
+    rapport = {}
+    for nom, construire, indexer in (("livres", _livre_depuis_donnees, biblio._indexer_livre),
+                                     ("utilisateurs", _utilisateur_depuis_donnees, biblio._indexer_utilisateur),
+                                     ("emprunts", _emprunt_depuis_donnees, biblio._indexer_emprunt)):
+        # un fichier JSON Lines est préféré au tableau JSON s'il existe
+        chemin = source / f"{nom}.jsonl"
+        if not chemin.exists():
+            chemin = source / f"{nom}.json"
+        if not chemin.exists():
+            print(f"Fichier {nom}.json manquant.")
+            continue
+
+        numeros = array("q")                     # numéro de ligne de chaque objet indexé, dans l'ordre d'ajout
+        rapport[nom] = _charger_par_lots(chemin, construire, indexer, taille_lot, progression, numeros)
+        r = rapport[nom]
+        if nom == "emprunts":
+            # le registre est trié une fois le fichier lu : les id en double deviennent des lignes invalides
+            for position, id_ in biblio._terminer_chargement_emprunts():
+                r["invalides"].append((numeros[position], f"ValueError : Emprunt {id_} déjà enregistré."))
+            r["invalides"].sort(key=lambda erreur: erreur[0])
+        print(f"{chemin.name} : {r['lignes']} ligne(s) en {r['secondes']:.2f} s "
+              f"({r['lignes_par_seconde']:.0f} lignes/s), {len(r['invalides'])} ligne(s) invalide(s).")
+        for numero, message in r["invalides"][:5]:
+            print(f"  ligne {numero} : {message}")
+
+    # --- Réservations (fichier absent dans les anciennes sauvegardes) ---
+    chemin = source / "reservations.json"
+    if chemin.exists():
+        biblio.restaurer_reservations(json.loads(chemin.read_text(encoding="utf-8")))
+
+    # --- Remettre les compteurs pour éviter collisions d'ID ---
+    Livre.Compteur = max(biblio.livres, default=0) + 1
+    Emprunt.Compteur = biblio.dernier_id_emprunt() + 1
+
+    # --- JOURNAL : rejoue les opérations écrites apres le snapshot ---
+    pj = p / "journal.jsonl"
+    if pj.exists():
+        sequence_snapshot = int(etat.get("sequence", 0))
+        rejouees = 0
+        for operation in lire_journal(pj):
+            if operation["seq"] > sequence_snapshot:
+                biblio.appliquer_operation(operation)
+                rejouees += 1
+        biblio._terminer_chargement_emprunts()
+        if rejouees:
+            # les id des livres et emprunts ajoutés par le journal ne doivent pas etre réutilisés
+            Livre.Compteur = max(Livre.Compteur, max(biblio.livres, default=0) + 1)
+            Emprunt.Compteur = max(Emprunt.Compteur, biblio.dernier_id_emprunt() + 1)
+            print(f"{rejouees} opération(s) du journal rejouée(s).")
+
+    print(f"Données JSON chargées depuis {p.resolve()}")
+    return rapport
+
+
+
+# -------------------------------
+# Classe StockageSQLite (base SQLite indexée, utilisable sans tout charger en mémoire)
+# -------------------------------
+SCHEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS livres (
+    id INTEGER PRIMARY KEY,
+    titre TEXT NOT NULL,
+    auteur TEXT NOT NULL,
+    categorie TEXT NOT NULL,
+    exemplaires INTEGER NOT NULL,
+    statut TEXT NOT NULL,
+    titre_norm TEXT NOT NULL,
+    auteur_norm TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS livres_titre_auteur ON livres (titre_norm, auteur_norm);
+CREATE TABLE IF NOT EXISTS utilisateurs (
+    id INTEGER PRIMARY KEY,
+    nom TEXT NOT NULL,
+    email TEXT NOT NULL,
+    email_norm TEXT NOT NULL,
+    type TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS utilisateurs_email ON utilisateurs (email_norm);
+CREATE TABLE IF NOT EXISTS emprunts (
+    id INTEGER PRIMARY KEY,
+    livre_id INTEGER NOT NULL,
+    lecteur_id INTEGER NOT NULL,
+    retourne INTEGER NOT NULL DEFAULT 0,
+    date_emprunt TEXT,
+    date_retour_prevue TEXT,
+    date_retour_effective TEXT
+);
+CREATE INDEX IF NOT EXISTS emprunts_lecteur ON emprunts (lecteur_id);
+CREATE INDEX IF NOT EXISTS emprunts_livre ON emprunts (livre_id);
+CREATE INDEX IF NOT EXISTS emprunts_actifs_livre ON emprunts (livre_id) WHERE retourne = 0;
+CREATE INDEX IF NOT EXISTS emprunts_actifs_lecteur ON emprunts (lecteur_id) WHERE retourne = 0;
+CREATE INDEX IF NOT EXISTS emprunts_actifs_echeance ON emprunts (date_retour_prevue) WHERE retourne = 0;
+CREATE TABLE IF NOT EXISTS reservations (
+    numero INTEGER PRIMARY KEY,
+    livre_id INTEGER NOT NULL,
+    lecteur_id INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS reservations_livre_lecteur ON reservations (livre_id, lecteur_id);
+CREATE INDEX IF NOT EXISTS reservations_file ON reservations (livre_id, numero);
+CREATE TABLE IF NOT EXISTS mises_de_cote (
+    livre_id INTEGER NOT NULL,
+    lecteur_id INTEGER NOT NULL,
+    expiration INTEGER NOT NULL,
+    PRIMARY KEY (livre_id, lecteur_id)
+);
+CREATE INDEX IF NOT EXISTS mises_de_cote_expiration ON mises_de_cote (expiration);
+"""
+
+
+class StockageSQLite:
+    # ouvre (ou crée) la base ; chaque thread recoit sa propre connexion
+    def __init__(self, chemin=FICHIER_SQLITE_DEFAUT):
+        self.chemin = str(chemin)
+        self._locale = threading.local()
+        self._connexions = []
+        self._verrou = threading.Lock()
+        self._connexion().executescript(SCHEMA_SQLITE)
+        self.recaler_compteurs()
+
+    # connexion du thread courant (créée a la premiere utilisation puis réutilisée)
+    def _connexion(self):
+        connexion = getattr(self._locale, "connexion", None)
+        if connexion is None:
+            connexion = sqlite3.connect(self.chemin, isolation_level=None, check_same_thread=False)
+            connexion.execute("PRAGMA journal_mode=WAL")
+            connexion.execute("PRAGMA synchronous=NORMAL")
+            self._locale.connexion = connexion
+            with self._verrou:
+                self._connexions.append(connexion)
+        return connexion
+
+    # transaction : tout est validé a la fin du bloc, ou tout est annulé en cas d'erreur
+    @contextmanager
+    def transaction(self):
+        connexion = self._connexion()
+        connexion.execute("BEGIN IMMEDIATE")
+        try:
+            yield connexion
+        except BaseException:
+            connexion.execute("ROLLBACK")
+            raise
+        connexion.execute("COMMIT")
+
+    # ferme les connexions de tous les threads
+    def fermer(self):
+        with self._verrou:
+            for connexion in self._connexions:
+                connexion.close()
+            self._connexions = []
+        self._locale = threading.local()
+
+    # --- Sauvegarde et chargement complets d'une Bibliotheque ---
+
+    # remplace le contenu de la base par celui de la bibliotheque (une seule transaction)
+    def sauvegarder(self, biblio):
+        with self.transaction() as c:
+            c.execute("DELETE FROM mises_de_cote")
+            c.execute("DELETE FROM reservations")
+            c.execute("DELETE FROM emprunts")
+            c.execute("DELETE FROM utilisateurs")
+            c.execute("DELETE FROM livres")
+            c.executemany("INSERT INTO livres VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                          (_ligne_livre_sqlite(donnees_livre(l)) for l in biblio.livres.values()))
+            c.executemany("INSERT INTO utilisateurs VALUES (?, ?, ?, ?, ?)",
+                          ((u.id, u.nom, u.email, Nettoyer(u.email), type_utilisateur(u))
+                           for u in biblio.utilisateurs.values()))
+            c.executemany("INSERT INTO emprunts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                          ((e.id, e.livre_id, e.lecteur_id, int(bool(e.retourne)), _iso(e.date_emprunt),
+                            _iso(e.date_retour_prevue), _iso(e.date_retour_effective))
+                           for e in biblio.emprunts.values()))
+            # files de réservation (numero croissant = ordre d'arrivée) et exemplaires mis de côté
+            reservations = biblio.donnees_reservations()
+            c.executemany("INSERT INTO reservations (livre_id, lecteur_id) VALUES (?, ?)",
+                          ((int(livre_id), lecteur_id) for livre_id, lecteurs in reservations["files"].items()
+                           for lecteur_id in lecteurs))
+            c.executemany("INSERT INTO mises_de_cote VALUES (?, ?, ?)",
+                          ((r["livre_id"], r["lecteur_id"], _date_vers_s(datetime.fromisoformat(r["expiration"])))
+                           for r in reservations["mises_de_cote"]))
+        print(f"Base SQLite sauvegardée : {Path(self.chemin).resolve()}")
+
+    # charge la base dans la bibliotheque (les index en mémoire sont reconstruits)
+    # seuls les emprunts en cours sont chargés : l'historique des emprunts rendus reste dans la base et
+    # se lit a la demande (emprunts_du_lecteur, emprunts_du_livre). emprunts_rendus=True charge tout.
+    def charger(self, biblio, emprunts_rendus=False):
+        c = self._connexion()
+        biblio.reinitialiser()
+        for id_, titre, auteur, categorie, exemplaires in c.execute(
+                "SELECT id, titre, auteur, categorie, exemplaires FROM livres ORDER BY id"):
+            biblio._indexer_livre(Livre(titre, auteur, categorie, exemplaires, identifiant=id_))
+        for id_, nom, email, typ in c.execute("SELECT id, nom, email, type FROM utilisateurs ORDER BY id"):
+            biblio._indexer_utilisateur(creer_utilisateur(id_, nom, email, typ))
+        requete = "SELECT * FROM emprunts ORDER BY id" if emprunts_rendus else \
+            "SELECT * FROM emprunts WHERE retourne = 0 ORDER BY id"
+        for ligne in c.execute(requete):
+            biblio._indexer_emprunt(_emprunt_depuis_ligne(ligne))
+        files = {}
+        for livre_id, lecteur_id in c.execute("SELECT livre_id, lecteur_id FROM reservations ORDER BY numero"):
+            files.setdefault(str(livre_id), []).append(lecteur_id)
+        biblio.restaurer_reservations({
+            "files": files,
+            "mises_de_cote": [{"livre_id": livre_id, "lecteur_id": lecteur_id, "expiration": _iso(_s_vers_date(fin))}
+                              for livre_id, lecteur_id, fin in c.execute("SELECT * FROM mises_de_cote")],
+        })
+
+        # Remettre les compteurs pour éviter collisions d'ID
+        Livre.Compteur = (c.execute("SELECT MAX(id) FROM livres").fetchone()[0] or 0) + 1
+        Emprunt.Compteur = max(c.execute("SELECT MAX(id) FROM emprunts").fetchone()[0] or 0,
+                               biblio.dernier_id_emprunt()) + 1
+        print(f"Base SQLite chargée : {Path(self.chemin).resolve()}")
+
+    # un seul allocateur d'id pour la base et la Bibliotheque (allouer_id sur Livre.Compteur / Emprunt.Compteur) :
+    # les compteurs sont avancés au-dela des id deja présents dans la base
+    def recaler_compteurs(self):
+        c = self._connexion()
+        with VERROU_IDS:
+            Livre.Compteur = max(Livre.Compteur, (c.execute("SELECT MAX(id) FROM livres").fetchone()[0] or 0) + 1)
+            Emprunt.Compteur = max(Emprunt.Compteur,
+                                   (c.execute("SELECT MAX(id) FROM emprunts").fetchone()[0] or 0) + 1)
+
+    # --- Enregistrement des modifications d'une Bibliotheque branchée (voir Bibliotheque.brancher_stockage) ---
+
+    # enregistre une opération (meme format que le journal) dans sa propre transaction
+    def enregistrer_operation(self, operation):
+        self.enregistrer_operations((operation,))
+
+    # enregistre plusieurs opérations dans une seule transaction
+    def enregistrer_operations(self, operations):
+        with self.transaction() as c:
+            for operation in operations:
+                _appliquer_operation_sqlite(c, operation)
+
+    # --- Requetes directes sur la base (sans charger la bibliotheque en mémoire) ---
+
+    def est_vide(self):
+        return self._connexion().execute("SELECT 1 FROM livres LIMIT 1").fetchone() is None
+
+    def trouver_livre(self, livre_id):
+        ligne = self._connexion().execute(
+            "SELECT id, titre, auteur, categorie, exemplaires FROM livres WHERE id = ?", (livre_id,)).fetchone()
+        if ligne is None:
+            return None
+        return Livre(*ligne[1:], identifiant=ligne[0])
+
+    def livre_existe(self, titre, auteur):
+        return self._connexion().execute(
+            "SELECT 1 FROM livres WHERE titre_norm = ? AND auteur_norm = ?", cle_titre_auteur(titre, auteur)
+        ).fetchone() is not None
+
+    def trouver_utilisateur_par_email(self, email):
+        ligne = self._connexion().execute(
+            "SELECT id, nom, email, type FROM utilisateurs WHERE email_norm = ?", (Nettoyer(email),)).fetchone()
+        return creer_utilisateur(*ligne) if ligne else None
+
+    def nb_emprunts_actifs(self, lecteur_id):
+        return self._connexion().execute(
+            "SELECT COUNT(*) FROM emprunts WHERE lecteur_id = ? AND retourne = 0", (lecteur_id,)).fetchone()[0]
+
+    def livre_est_emprunte(self, livre_id):
+        return self._connexion().execute(
+            "SELECT 1 FROM emprunts WHERE livre_id = ? AND retourne = 0 LIMIT 1", (livre_id,)).fetchone() is not None
+
+    # emprunts d'un lecteur ou d'un livre, rendus compris, par id croissant
+    def emprunts_du_lecteur(self, lecteur_id):
+        return [_emprunt_depuis_ligne(ligne) for ligne in self._connexion().execute(
+            "SELECT * FROM emprunts WHERE lecteur_id = ? ORDER BY id", (lecteur_id,))]
+
+    def emprunts_du_livre(self, livre_id):
+        return [_emprunt_depuis_ligne(ligne) for ligne in self._connexion().execute(
+            "SELECT * FROM emprunts WHERE livre_id = ? ORDER BY id", (livre_id,))]
+
+    # ajoute un livre, refusé si le couple titre + auteur existe deja
+    def ajouter_livre(self, livre):
+        try:
+            with self.transaction() as c:
+                c.execute("INSERT INTO livres VALUES (?, ?, ?, ?, ?, ?, ?, ?)", _ligne_livre_sqlite(donnees_livre(livre)))
+        except sqlite3.IntegrityError:
+            print("Ce livre existe déjà (même titre + auteur).")
+            return False
+        return True
+
+    # ajoute un utilisateur, refusé si l'id ou l'email est deja utilisé
+    def ajouter_utilisateur(self, utilisateur):
+        try:
+            with self.transaction() as c:
+                c.execute("INSERT INTO utilisateurs VALUES (?, ?, ?, ?, ?)",
+                          (utilisateur.id, utilisateur.nom, utilisateur.email,
+                           Nettoyer(utilisateur.email), type_utilisateur(utilisateur)))
+        except sqlite3.IntegrityError:
+            print("ID ou email déjà utilisé pour un autre utilisateur.")
+            return False
+        return True
+
+    # emprunt transactionnel : vérifications et mise a jour du stock dans la meme transaction
+    # retourne l'id du nouvel emprunt, ou None si l'emprunt est refusé
+    def emprunter_livre(self, livre_id, lecteur_id):
+        with self.transaction() as c:
+            lecteur = c.execute("SELECT type FROM utilisateurs WHERE id = ?", (lecteur_id,)).fetchone()
+            if lecteur is None or lecteur[0].strip().lower() != "lecteur":
+                print("Utilisateur non valide; il faut que ça soit un lecteur.")
+                return None
+            livre = c.execute("SELECT exemplaires FROM livres WHERE id = ?", (livre_id,)).fetchone()
+            if livre is None:
+                print("Livre introuvable.")
+                return None
+            # les exemplaires mis de côté pour d'autres lecteurs ne comptent pas
+            bloques = c.execute("SELECT COUNT(*) FROM mises_de_cote WHERE livre_id = ? AND lecteur_id != ?",
+                                (livre_id, lecteur_id)).fetchone()[0]
+            if livre[0] - bloques <= 0:
+                print("Aucun exemplaire disponible.")
+                return None
+            if c.execute("SELECT 1 FROM emprunts WHERE lecteur_id = ? AND livre_id = ? AND retourne = 0",
+                         (lecteur_id, livre_id)).fetchone():
+                print("Ce lecteur a déjà emprunté ce livre.")
+                return None
+            if c.execute("SELECT COUNT(*) FROM emprunts WHERE lecteur_id = ? AND retourne = 0",
+                         (lecteur_id,)).fetchone()[0] >= MAXI_PRET_ACTIF:
+                print(f"Limite atteinte : {MAXI_PRET_ACTIF} emprunt(s) actif(s).")
+                return None
+
+            # l'id vient du meme compteur que les emprunts de la Bibliotheque (pas du rowid de SQLite)
+            emprunt = Emprunt(livre_id, lecteur_id)
+            _appliquer_operation_sqlite(c, {"op": "emprunt", "id": emprunt.id, "livre_id": livre_id,
+                                            "lecteur_id": lecteur_id, "date_emprunt": _iso(emprunt.date_emprunt),
+                                            "date_retour_prevue": _iso(emprunt.date_retour_prevue)})
+            return emprunt.id
+
+    # retour transactionnel : l'emprunt est clos et l'exemplaire remis en stock ensemble
+    def rendre_livre(self, emprunt_id):
+        with self.transaction() as c:
+            ligne = c.execute("SELECT livre_id, retourne FROM emprunts WHERE id = ?", (emprunt_id,)).fetchone()
+            if ligne is None:
+                print("Emprunt introuvable.")
+                return False
+            if ligne[1]:
+                print("Le livre est déjà retourné.")
+                return False
+            _appliquer_operation_sqlite(c, {"op": "retour", "id": emprunt_id,
+                                            "date_retour_effective": datetime.now().isoformat()})
+        return True
+
+    # emprunts en retard a la date de référence, avec les jours de retard (index partiel sur les échéances)
+    def emprunts_en_retard(self, reference=None):
+        reference = reference or datetime.now()
+        resultats = []
+        for ligne in self._connexion().execute(
+                "SELECT * FROM emprunts WHERE retourne = 0 AND date_retour_prevue < ? ORDER BY date_retour_prevue",
+                (_iso(reference),)):
+            emprunt = _emprunt_depuis_ligne(ligne)
+            resultats.append((emprunt, emprunt.jours_de_retard(reference)))
+        return resultats
+
+    # memes statistiques que Bibliotheque.donnees_statistiques, calculées par SQLite
+    def donnees_statistiques(self, reference=None):
+        c = self._connexion()
+        reference = reference or datetime.now()
+        par_type = dict(c.execute("SELECT LOWER(type), COUNT(*) FROM utilisateurs GROUP BY LOWER(type)").fetchall())
+        actifs = c.execute("SELECT COUNT(*) FROM emprunts WHERE retourne = 0").fetchone()[0]
+        return {
+            "livres": c.execute("SELECT COUNT(*) FROM livres").fetchone()[0],
+            "lecteurs": par_type.get("lecteur", 0),
+            "bibliothecaires": par_type.get("bibliothecaire", 0),
+            "emprunts_actifs": actifs,
+            "emprunts_en_retard": c.execute(
+                "SELECT COUNT(*) FROM emprunts WHERE retourne = 0 AND date_retour_prevue < ?",
+                (_iso(reference),)).fetchone()[0],
+            "exemplaires_disponibles": c.execute("SELECT COALESCE(SUM(exemplaires), 0) FROM livres").fetchone()[0],
+            "exemplaires_sortis": actifs,
+            "livres_par_categorie": dict(c.execute("SELECT categorie, COUNT(*) FROM livres GROUP BY categorie")),
+        }
+
+
+# date au format texte ISO (triable) pour SQLite
+def _iso(date):
+    return date.isoformat() if date else None
+
+# ligne de la table livres a partir des champs d'un livre (voir donnees_livre)
+def _ligne_livre_sqlite(donnees):
+    titre_norm, auteur_norm = cle_titre_auteur(donnees["titre"], donnees["auteur"])
+    exemplaires = max(0, int(donnees["exemplaires"]))
+    statut = "disponible" if exemplaires > 0 else "emprunté"
+    return (donnees["id"], donnees["titre"], donnees["auteur"], donnees["categorie"], exemplaires, statut,
+            titre_norm, auteur_norm)
+
+# objet Emprunt a partir d'une ligne de la table emprunts
+def _emprunt_depuis_ligne(ligne):
+    id_, livre_id, lecteur_id, retourne, date_emprunt, date_retour_prevue, date_retour_effective = ligne
+    emprunt = Emprunt(livre_id, lecteur_id, datetime.fromisoformat(date_emprunt) if date_emprunt else None,
+                      datetime.fromisoformat(date_retour_prevue) if date_retour_prevue else None, identifiant=id_)
+    emprunt.retourne = bool(retourne)
+    emprunt.date_retour_effective = datetime.fromisoformat(date_retour_effective) if date_retour_effective else None
+    return emprunt
+
+# applique une opération (format du journal) dans une transaction SQLite ouverte, avec les regles de la
+# Bibliotheque : les lignes qu'elle touche sont chargées dans une Bibliotheque de travail, l'opération y est
+# rejouée par Bibliotheque.appliquer_operation, puis ces lignes sont réécrites depuis la Bibliotheque de travail
+def _appliquer_operation_sqlite(c, operation):
+    if operation["op"] == "archivage":
+        c.executemany("DELETE FROM emprunts WHERE id = ?", ((i,) for i in operation["ids"]))
+        return
+    travail = Bibliotheque("", "")
+    livre_ids = _livres_touches_sqlite(c, operation)
+    for livre_id in livre_ids:
+        _charger_livre_sqlite(c, travail, livre_id)
+    if operation["op"] == "retour":
+        ligne = c.execute("SELECT * FROM emprunts WHERE id = ?", (operation["id"],)).fetchone()
+        if ligne is not None:
+            travail._indexer_emprunt(_emprunt_depuis_ligne(ligne))
+    travail.appliquer_operation(operation)
+    for livre_id in livre_ids:
+        _ecrire_livre_sqlite(c, travail, livre_id)
+    c.executemany("INSERT OR REPLACE INTO utilisateurs VALUES (?, ?, ?, ?, ?)",
+                  ((u.id, u.nom, u.email, Nettoyer(u.email), type_utilisateur(u)) for u in travail.utilisateurs.values()))
+    c.executemany("INSERT OR REPLACE INTO emprunts VALUES (?, ?, ?, ?, ?, ?, ?)",
+                  ((e.id, e.livre_id, e.lecteur_id, int(bool(e.retourne)), _iso(e.date_emprunt),
+                    _iso(e.date_retour_prevue), _iso(e.date_retour_effective)) for e in travail.emprunts.values()))
+
+# id des livres dont l'opération peut changer le stock, la file de réservation ou les mises de côté
+def _livres_touches_sqlite(c, operation):
+    op = operation["op"]
+    if op in ("ajout_livre", "modif_livre", "suppr_livre"):
+        return [operation["id"]]
+    if op in ("emprunt", "reservation", "annulation_reservation"):
+        return [operation["livre_id"]]
+    if op == "retour":
+        ligne = c.execute("SELECT livre_id FROM emprunts WHERE id = ?", (operation["id"],)).fetchone()
+        return [ligne[0]] if ligne else []
+    if op == "expiration_mises_de_cote":
+        limite = _date_vers_s(datetime.fromisoformat(operation["date"]))
+        return [livre_id for (livre_id,) in c.execute(
+            "SELECT DISTINCT livre_id FROM mises_de_cote WHERE expiration <= ?", (limite,))]
+    return []
+
+# charge un livre, sa file de réservation et ses mises de côté dans la Bibliotheque de travail
+def _charger_livre_sqlite(c, travail, livre_id):
+    ligne = c.execute("SELECT id, titre, auteur, categorie, exemplaires FROM livres WHERE id = ?",
+                      (livre_id,)).fetchone()
+    if ligne is not None:
+        travail._indexer_livre(Livre(*ligne[1:], identifiant=ligne[0]))
+    for (lecteur_id,) in c.execute("SELECT lecteur_id FROM reservations WHERE livre_id = ? ORDER BY numero",
+                                   (livre_id,)):
+        travail._ajouter_reservation(livre_id, lecteur_id)
+    for lecteur_id, expiration in c.execute("SELECT lecteur_id, expiration FROM mises_de_cote WHERE livre_id = ?",
+                                            (livre_id,)):
+        travail._mettre_de_cote(livre_id, lecteur_id, expiration)
+
+# réécrit un livre (ou le supprime), sa file de réservation et ses mises de côté depuis la Bibliotheque de travail
+def _ecrire_livre_sqlite(c, travail, livre_id):
+    livre = travail.livres.get(livre_id)
+    if livre is None:
+        c.execute("DELETE FROM livres WHERE id = ?", (livre_id,))
     else:
-        print("Fichier livres.json manquant.")
-
-    # --- UTILISATEURS ---
-    pu = p / "utilisateurs.json"
-    if pu.exists():
-        data_users = json.loads(pu.read_text(encoding="utf-8"))
-        for r in data_users:
-            uid = int(r.get("id"))
-            nom = r.get("nom", "")
-            email = r.get("email", "")
-            typ = (r.get("type", "") or "").strip().lower()
-            if typ == "lecteur":
-                user = Lecteur(uid, nom, email)
+        ligne = _ligne_livre_sqlite(donnees_livre(livre))
+        if c.execute("UPDATE livres SET titre = ?, auteur = ?, categorie = ?, exemplaires = ?, statut = ?, "
+                     "titre_norm = ?, auteur_norm = ? WHERE id = ?", (*ligne[1:], livre_id)).rowcount == 0:
+            c.execute("INSERT INTO livres VALUES (?, ?, ?, ?, ?, ?, ?, ?)", ligne)
+    c.execute("DELETE FROM reservations WHERE livre_id = ?", (livre_id,))
+    c.executemany("INSERT INTO reservations (livre_id, lecteur_id) VALUES (?, ?)",
+                  ((livre_id, lecteur_id) for lecteur_id in travail.file_reservation(livre_id)))
+    c.execute("DELETE FROM mises_de_cote WHERE livre_id = ?", (livre_id,))
+    c.executemany("INSERT INTO mises_de_cote VALUES (?, ?, ?)",
+                  ((livre_id, lecteur_id, expiration)
+                   for lecteur_id, expiration in travail.mises_de_cote.get(livre_id, {}).items()))
+
+
+
+# -------------------------------
+# Snapshot binaire (enregistrements de taille fixe + table des chaines, lu par mmap)
+# -------------------------------
+# en-tete : signature, version, nombre de livres, d'utilisateurs, d'emprunts, de réservations,
+# de mises de côté et de chaines
+# puis les enregistrements (triés par id, les réservations dans l'ordre des files), la table des positions
+# des chaines et les chaines en UTF-8
+# la version 1 (sans réservations ni mises de côté, en-tete a 4 nombres) se lit toujours
+SIGNATURE_SNAPSHOT = b"BIBLSNAP"
+VERSION_SNAPSHOT = 2
+EN_TETE_SNAPSHOT = struct.Struct("<8sI6Q")
+EN_TETE_SNAPSHOT_V1 = struct.Struct("<8sI4Q")
+LIVRE_SNAPSHOT = struct.Struct("<qIIIi")            # id, titre, auteur, categorie (n° de chaine), exemplaires
+UTILISATEUR_SNAPSHOT = struct.Struct("<qIIB")       # id, nom, email (n° de chaine), type (0 lecteur, 1 bibliothécaire)
+EMPRUNT_SNAPSHOT = struct.Struct("<qqqqqqB")        # id, livre, lecteur, 3 dates (µs depuis 1970), retourné
+RESERVATION_SNAPSHOT = struct.Struct("<qq")        # livre, lecteur
+MISE_DE_COTE_SNAPSHOT = struct.Struct("<qqq")      # livre, lecteur, expiration (s depuis 1970)
+POSITION_CHAINE = struct.Struct("<Q")
+
+# écrit toute la bibliotheque dans un snapshot binaire
+def ecrire_snapshot_binaire(biblio, chemin=FICHIER_SNAPSHOT_DEFAUT):
+    chaines = {}                                    # chaine -> numéro (chaque chaine n'est écrite qu'une fois)
+    def numero(texte):
+        return chaines.setdefault(texte or "", len(chaines))
+
+    livres = bytearray()
+    for livre in sorted(biblio.livres.values(), key=lambda l: l.id):
+        livres += LIVRE_SNAPSHOT.pack(livre.id, numero(livre.titre), numero(livre.auteur),
+                                      numero(livre.categorie), int(livre.exemplaires))
+    utilisateurs = bytearray()
+    for u in sorted(biblio.utilisateurs.values(), key=lambda u: u.id):
+        utilisateurs += UTILISATEUR_SNAPSHOT.pack(u.id, numero(u.nom), numero(u.email),
+                                                  0 if isinstance(u, Lecteur) else 1)
+    emprunts = bytearray()
+    for e in sorted(biblio.emprunts.values(), key=lambda e: e.id):
+        emprunts += EMPRUNT_SNAPSHOT.pack(e.id, e.livre_id, e.lecteur_id, _date_vers_us(e.date_emprunt),
+                                          _date_vers_us(e.date_retour_prevue),
+                                          _date_vers_us(e.date_retour_effective), int(bool(e.retourne)))
+    donnees_reservations = biblio.donnees_reservations()
+    reservations = bytearray()
+    for livre_id, lecteurs in donnees_reservations["files"].items():
+        for lecteur_id in lecteurs:
+            reservations += RESERVATION_SNAPSHOT.pack(int(livre_id), lecteur_id)
+    mises_de_cote = bytearray()
+    for r in donnees_reservations["mises_de_cote"]:
+        mises_de_cote += MISE_DE_COTE_SNAPSHOT.pack(r["livre_id"], r["lecteur_id"],
+                                                    _date_vers_s(datetime.fromisoformat(r["expiration"])))
+
+    textes = [texte.encode("utf-8") for texte in chaines]
+    positions = bytearray()
+    position = 0
+    for texte in textes:
+        positions += POSITION_CHAINE.pack(position)
+        position += len(texte)
+    positions += POSITION_CHAINE.pack(position)
+
+    temporaire = Path(str(chemin) + ".tmp")
+    with open(temporaire, "wb") as fichier:
+        fichier.write(EN_TETE_SNAPSHOT.pack(SIGNATURE_SNAPSHOT, VERSION_SNAPSHOT, len(biblio.livres),
+                                            len(biblio.utilisateurs), len(biblio.emprunts),
+                                            len(reservations) // RESERVATION_SNAPSHOT.size,
+                                            len(mises_de_cote) // MISE_DE_COTE_SNAPSHOT.size, len(textes)))
+        fichier.write(livres)
+        fichier.write(utilisateurs)
+        fichier.write(emprunts)
+        fichier.write(reservations)
+        fichier.write(mises_de_cote)
+        fichier.write(positions)
+        fichier.write(b"".join(textes))
+        # le fichier est sur le disque avant de remplacer l'ancien snapshot (sinon il peut etre vide apres une panne)
+        fichier.flush()
+        os.fsync(fichier.fileno())
+    os.replace(temporaire, chemin)
+    print(f"Snapshot binaire écrit : {Path(chemin).resolve()}")
+
+
+class SnapshotBinaire:
+    # ouvre un snapshot binaire : le fichier est projeté en mémoire (mmap), rien n'est décodé a l'ouverture
+    def __init__(self, chemin=FICHIER_SNAPSHOT_DEFAUT):
+        self.chemin = Path(chemin)
+        self._fichier = open(self.chemin, "rb")
+        self._donnees = mmap.mmap(self._fichier.fileno(), 0, access=mmap.ACCESS_READ)
+        signature, version = struct.unpack_from("<8sI", self._donnees, 0) if len(self._donnees) >= 12 else (b"", 0)
+        if signature != SIGNATURE_SNAPSHOT or version not in (1, VERSION_SNAPSHOT):
+            self.fermer()
+            raise ValueError(f"{chemin} n'est pas un snapshot binaire de la bibliotheque (version {VERSION_SNAPSHOT}).")
+        if version == 1:
+            _, _, self.nb_livres, self.nb_utilisateurs, self.nb_emprunts, self.nb_chaines = \
+                EN_TETE_SNAPSHOT_V1.unpack_from(self._donnees, 0)
+            self.nb_reservations = self.nb_mises_de_cote = 0
+            taille_en_tete = EN_TETE_SNAPSHOT_V1.size
+        else:
+            (_, _, self.nb_livres, self.nb_utilisateurs, self.nb_emprunts, self.nb_reservations,
+             self.nb_mises_de_cote, self.nb_chaines) = EN_TETE_SNAPSHOT.unpack_from(self._donnees, 0)
+            taille_en_tete = EN_TETE_SNAPSHOT.size
+
+        # position de chaque section dans le fichier
+        self._debut_livres = taille_en_tete
+        self._debut_utilisateurs = self._debut_livres + self.nb_livres * LIVRE_SNAPSHOT.size
+        self._debut_emprunts = self._debut_utilisateurs + self.nb_utilisateurs * UTILISATEUR_SNAPSHOT.size
+        self._debut_reservations = self._debut_emprunts + self.nb_emprunts * EMPRUNT_SNAPSHOT.size
+        self._debut_mises_de_cote = self._debut_reservations + self.nb_reservations * RESERVATION_SNAPSHOT.size
+        self._debut_positions = self._debut_mises_de_cote + self.nb_mises_de_cote * MISE_DE_COTE_SNAPSHOT.size
+        self._debut_textes = self._debut_positions + (self.nb_chaines + 1) * POSITION_CHAINE.size
+
+    def fermer(self):
+        self._donnees.close()
+        self._fichier.close()
+
+    # lit la chaine numéro i de la table des chaines
+    def chaine(self, i):
+        debut = self._debut_positions + i * POSITION_CHAINE.size
+        (de,) = POSITION_CHAINE.unpack_from(self._donnees, debut)
+        (a,) = POSITION_CHAINE.unpack_from(self._donnees, debut + POSITION_CHAINE.size)
+        return self._donnees[self._debut_textes + de:self._debut_textes + a].decode("utf-8")
+
+    # --- lecture d'un enregistrement par sa position (les objets sont créés a la demande) ---
+
+    def livre(self, i):
+        id_, titre, auteur, categorie, exemplaires = LIVRE_SNAPSHOT.unpack_from(
+            self._donnees, self._debut_livres + i * LIVRE_SNAPSHOT.size)
+        return Livre(self.chaine(titre), self.chaine(auteur), self.chaine(categorie), exemplaires, identifiant=id_)
+
+    def utilisateur(self, i):
+        id_, nom, email, typ = UTILISATEUR_SNAPSHOT.unpack_from(
+            self._donnees, self._debut_utilisateurs + i * UTILISATEUR_SNAPSHOT.size)
+        return creer_utilisateur(id_, self.chaine(nom), self.chaine(email), "Lecteur" if typ == 0 else "Bibliothecaire")
+
+    def emprunt(self, i):
+        id_, livre_id, lecteur_id, de, drp, dre, retourne = EMPRUNT_SNAPSHOT.unpack_from(
+            self._donnees, self._debut_emprunts + i * EMPRUNT_SNAPSHOT.size)
+        e = Emprunt(livre_id, lecteur_id, _us_vers_date(de), _us_vers_date(drp), identifiant=id_)
+        e.date_retour_effective = _us_vers_date(dre)
+        e.retourne = bool(retourne)
+        return e
+
+    # --- recherche par id : recherche dichotomique sur les enregistrements triés ---
+
+    def _position_par_id(self, debut, taille, nombre, identifiant):
+        bas, haut = 0, nombre
+        while bas < haut:
+            milieu = (bas + haut) // 2
+            (id_,) = struct.unpack_from("<q", self._donnees, debut + milieu * taille)
+            if id_ < identifiant:
+                bas = milieu + 1
             else:
-                user = Bibliothecaire(uid, nom, email)
-            biblio.utilisateurs[uid] = user
-    else:
-        print("Fichier utilisateurs.json manquant.")
-
-    # --- EMPRUNTS ---
-    pe = p / "emprunts.json"
-    max_id_emprunt = 0
-    if pe.exists():
-        data_emps = json.loads(pe.read_text(encoding="utf-8"))
-        for r in data_emps:
-            e = Emprunt(int(r.get("livre_id")), int(r.get("lecteur_id")))
-            e.id = int(r.get("id", e.id))
-            max_id_emprunt = max(max_id_emprunt, e.id)
-
-            # dates
-            try:
-                de = r.get("date_emprunt")
-                e.date_emprunt = datetime.fromisoformat(de) if de else datetime.now()
-            except:
-                pass
-            try:
-                drp = r.get("date_retour_prevue")
-                e.date_retour_prevue = datetime.fromisoformat(drp) if drp else e.date_emprunt + timedelta(days=DUREE_EMPRUNT_MAXI)
-            except:
-                pass
-            try:
-                dre = r.get("date_retour_effective")
-                e.date_retour_effective = datetime.fromisoformat(dre) if dre else None
-            except:
-                pass
+                haut = milieu
+        if bas < nombre and struct.unpack_from("<q", self._donnees, debut + bas * taille)[0] == identifiant:
+            return bas
+        return None
 
-            e.retourne = bool(r.get("retourne", False))
+    def trouver_livre(self, livre_id):
+        i = self._position_par_id(self._debut_livres, LIVRE_SNAPSHOT.size, self.nb_livres, livre_id)
+        return None if i is None else self.livre(i)
 
-            # Enregistre
-            biblio.emprunts[e.id] = e
-            biblio.emprunts_par_lecteur.setdefault(e.lecteur_id, set()).add(e.id)
+    def trouver_utilisateur(self, utilisateur_id):
+        i = self._position_par_id(self._debut_utilisateurs, UTILISATEUR_SNAPSHOT.size,
+                                  self.nb_utilisateurs, utilisateur_id)
+        return None if i is None else self.utilisateur(i)
 
-            # Marquer côté lecteur
-            lecteur = biblio.utilisateurs.get(e.lecteur_id)
-            if isinstance(lecteur, Lecteur) and not e.retourne:
-                lecteur.livres_empruntes.add(e.livre_id)
-    else:
-        print("Fichier emprunts.json manquant.")
+    def trouver_emprunt(self, emprunt_id):
+        i = self._position_par_id(self._debut_emprunts, EMPRUNT_SNAPSHOT.size, self.nb_emprunts, emprunt_id)
+        return None if i is None else self.emprunt(i)
 
-    # --- Remettre les compteurs pour éviter collisions d'ID ---
-    try:
-        Livre.Compteur = max_id_livre + 1
-    except:
-        pass
-    try:
-        Emprunt.Compteur = max_id_emprunt + 1
-    except:
-        pass
+    # --- parcours ---
 
-    print(f"Données JSON chargées depuis {p.resolve()}")
+    def iterer_livres(self):
+        return (self.livre(i) for i in range(self.nb_livres))
+
+    def iterer_utilisateurs(self):
+        return (self.utilisateur(i) for i in range(self.nb_utilisateurs))
+
+    def iterer_emprunts(self):
+        return (self.emprunt(i) for i in range(self.nb_emprunts))
 
+    # (livre, lecteur) dans l'ordre des files de réservation
+    def iterer_reservations(self):
+        return RESERVATION_SNAPSHOT.iter_unpack(self._donnees[self._debut_reservations:self._debut_mises_de_cote])
+
+    # (livre, lecteur, expiration en s depuis 1970)
+    def iterer_mises_de_cote(self):
+        return MISE_DE_COTE_SNAPSHOT.iter_unpack(self._donnees[self._debut_mises_de_cote:self._debut_positions])
+
+
+# remplit une bibliotheque a partir d'un snapshot binaire (tous les index sont reconstruits)
+def charger_snapshot_binaire(biblio, chemin=FICHIER_SNAPSHOT_DEFAUT):
+    snapshot = SnapshotBinaire(chemin)
+    try:
+        biblio.reinitialiser()
+        for livre in snapshot.iterer_livres():
+            biblio._indexer_livre(livre)
+        for utilisateur in snapshot.iterer_utilisateurs():
+            biblio._indexer_utilisateur(utilisateur)
+        for emprunt in snapshot.iterer_emprunts():
+            biblio._indexer_emprunt(emprunt)
+        for livre_id, lecteur_id in snapshot.iterer_reservations():
+            biblio._ajouter_reservation(livre_id, lecteur_id)
+        for livre_id, lecteur_id, expiration in snapshot.iterer_mises_de_cote():
+            biblio._mettre_de_cote(livre_id, lecteur_id, expiration)
+    finally:
+        snapshot.fermer()
+
+    # Remettre les compteurs pour éviter collisions d'ID
+    Livre.Compteur = max(biblio.livres, default=0) + 1
+    Emprunt.Compteur = biblio.dernier_id_emprunt() + 1
+    print(f"Snapshot binaire chargé : {Path(chemin).resolve()}")
+
+# conversion de la sauvegarde JSON (sauvegarder_json) vers un snapshot binaire
+def json_vers_snapshot_binaire(dossier="data_json", chemin=FICHIER_SNAPSHOT_DEFAUT):
+    biblio = Bibliotheque("", "")
+    charger_json(biblio, dossier)
+    ecrire_snapshot_binaire(biblio, chemin)
+
+# conversion d'un snapshot binaire vers la sauvegarde JSON (sauvegarder_json)
+def snapshot_binaire_vers_json(chemin=FICHIER_SNAPSHOT_DEFAUT, dossier="data_json"):
+    biblio = Bibliotheque("", "")
+    charger_snapshot_binaire(biblio, chemin)
+    sauvegarder_json(biblio, dossier)
 
 
 #Sauvegarde des données de la bibliothèque                                                                              
-def sauver_donnees(biblio):
-    if FORMAT_DE_SAUVEGARDE_DEFAUT:
+def sauver_donnees(biblio, format=FORMAT_DE_SAUVEGARDE_DEFAUT):
+    with mesurer_operation(biblio, f"sauver_donnees.{format}"):
+        _sauver_donnees(biblio, format)
+
+# en mode concurrent, les fichiers sont écrits depuis un instantané des données (biblio.instantane) :
+# verrou_index n'est tenu que le temps de la copie
+def _sauver_donnees(biblio, format):
+    if format == "csv":
         #exporte les données de la bibliothèque dans un fichier CSV.
-        exporter_csv_depuis_biblio(biblio)
+        exporter_csv_depuis_biblio(biblio.instantane())
+    elif format == "binaire":
+        ecrire_snapshot_binaire(biblio.instantane())
+    elif format == "sqlite":
+        if biblio.stockage is not None:
+            # chaque modification a deja été enregistrée dans sa transaction
+            print("Base SQLite a jour.")
+        else:
+            StockageSQLite().sauvegarder(biblio.instantane())
+    elif format == "journal" and biblio.journal is not None:
+        # chaque modification est deja dans le journal : il suffit de forcer l'écriture sur disque
+        with biblio.verrou_index:
+            biblio.journal.synchroniser()
+        print(f"Journal synchronisé : {biblio.journal.chemin.resolve()}")
     else:
         sauvegarder_json(biblio)
 #Charge les données de la bibliothèque (CSV lu directement, JSON reconstruit en objets)                                   
-def charger_donnees(biblio):
-    if FORMAT_DE_SAUVEGARDE_DEFAUT:
+def charger_donnees(biblio, format=FORMAT_DE_SAUVEGARDE_DEFAUT):
+    with mesurer_operation(biblio, f"charger_donnees.{format}"):
+        _charger_donnees(biblio, format)
+
+def _charger_donnees(biblio, format):
+    if format == "csv":
        print(" Mode CSV : rien à reconstruire en objets (pandas lit directement les CSV).")
+    elif format == "binaire":
+        if Path(FICHIER_SNAPSHOT_DEFAUT).exists():
+            charger_snapshot_binaire(biblio)
+        else:
+            print("Snapshot binaire introuvable.")
+    elif format == "sqlite":
+        # catalogue, utilisateurs et emprunts en cours sont chargés ; la base recoit chaque modification
+        # avant qu'elle soit appliquée en mémoire et garde l'historique des emprunts rendus
+        stockage = biblio.stockage or StockageSQLite()
+        biblio.stockage = None
+        if stockage.est_vide():
+            stockage.sauvegarder(biblio)
+        else:
+            stockage.charger(biblio)
+        biblio.brancher_stockage(stockage)
     else:
+        # snapshot JSON puis opérations du journal
         charger_json(biblio)
+        if format == "journal" and biblio.journal is None:
+            biblio.activer_journal()
 
 
 # -------------------------------
@@ -888,13 +3787,18 @@ def charger_donnees(biblio):
 # -------------------------------
 def MenuApp():
 
-    choisir_format_sauvegarde()
+    format_sauvegarde = choisir_format_sauvegarde()
     # creation dun bibliotheque vide
     biblio = initialiser_bibliotheque()
 
+    # les emprunts archivés restent consultables ; l'archive est ouverte avant le chargement
+    # pour que les id des emprunts archivés ne soient pas réattribués
+    if Path(DOSSIER_ARCHIVE_DEFAUT).exists():
+        biblio.activer_archive()
+
     #charger depuis le disque (JSON si choisi)
     try:
-        charger_donnees(biblio)
+        charger_donnees(biblio, format_sauvegarde)
     except Exception as e:
         print("Pas de données à charger pour l’instant.", e)
 
@@ -902,7 +3806,7 @@ def MenuApp():
 
     # boucle principale du menu
     while True:
-        print("\n1. Livres\n2. Utilisateurs\n3. Emprunts\n4. Sauvegarder&Charger\n5. Recherches\n6. Statistiques\n7. Graph\n8. Quitter")
+        print("\n1. Livres\n2. Utilisateurs\n3. Emprunts\n4. Sauvegarder&Charger\n5. Recherches\n6. Statistiques\n7. Graph\n8. Perf stats\n9. Quitter")
         choix = input("Votre choix : ")
         
         if choix == "1":
@@ -968,7 +3872,7 @@ def MenuApp():
         #GESTION DES EMPRUNTS
         elif choix == "3":
             # >>> ton code actuel des emprunts (inchangé)
-            print("\n1. Emprunter\n2. Rendre\n3. Voir emprunts en cours\n4. Par lecteur\n5. Retour")
+            print("\n1. Emprunter\n2. Rendre\n3. Voir emprunts en cours\n4. Par lecteur\n5. En retard\n6. Historique d'un lecteur (avec archive)\n7. Archiver les anciens emprunts\n8. Réserver un livre\n9. Annuler une réservation\n10. Retour")
             c = input("Choix : ")
 
             # Emprunter un livre
@@ -992,19 +3896,51 @@ def MenuApp():
                 idl = demander_int("ID lecteur : ")
                 biblio.lister_emprunts_par_lecteur(idl)
 
+            # Voir les emprunts en retard
+            elif c == "5":
+                biblio.lister_emprunts_en_retard()
+
+            # Historique complet d'un lecteur, archive comprise
+            elif c == "6":
+                idl = demander_int("ID lecteur : ")
+                biblio.lister_emprunts_par_lecteur(idl, avec_archive=True)
+
+            # Archiver les emprunts rendus depuis longtemps
+            elif c == "7":
+                age = input(f"Age minimum depuis le retour, en jours ({JOURS_AVANT_ARCHIVAGE} par défaut) : ").strip()
+                biblio.archiver_emprunts(int(age) if age.isdigit() else JOURS_AVANT_ARCHIVAGE)
+
+            # Réserver un livre sans exemplaire disponible
+            elif c == "8":
+                idl = demander_int("ID lecteur : ")
+                idlivre = demander_int("ID livre : ")
+                biblio.reserver_livre(idlivre, idl)
+
+            # Annuler une réservation
+            elif c == "9":
+                idl = demander_int("ID lecteur : ")
+                idlivre = demander_int("ID livre : ")
+                biblio.annuler_reservation(idlivre, idl)
+
         #SAUVEGARDE / CHARGEMENT
         elif choix == "4":
-            print("\n1. Sauvegarder maintenant\n2. Charger depuis disque\n3. Export CSV (pour pandas)\n4. Retour")
+            print("\n1. Sauvegarder maintenant\n2. Charger depuis disque\n3. Export CSV (pour pandas)\n4. Export Parquet (pour pandas)\n5. Retour")
             c = input("Choix : ")
             # Sauvegarder
             if c == "1":
-                sauver_donnees(biblio)
+                sauver_donnees(biblio, format_sauvegarde)
             # Charger
             elif c == "2":
-                charger_donnees(biblio)
+                charger_donnees(biblio, format_sauvegarde)
             ## Exporter en CSV
             elif c == "3":
                 exporter_csv_depuis_biblio(biblio)
+            ## Exporter en colonnes (pyarrow)
+            elif c == "4":
+                try:
+                    exporter_colonnes_depuis_biblio(biblio)
+                except ImportError as e:
+                    print(" Export Parquet impossible (pyarrow n'est pas installé) :", e)
 
         #RECHERCHES
         elif choix == "5":
@@ -1019,19 +3955,48 @@ def MenuApp():
         #GRAPHIQUES
         elif choix == "7":
             print("\n=== GRAPH / STATISTIQUES VISUELLES ===")
+            print("Graphiques disponibles : " + ", ".join(GRAPHIQUES))
+            choisis = input("Graphiques a générer (séparés par des virgules, vide = tous) : ").strip()
+            graphiques = [nom.strip() for nom in choisis.split(",") if nom.strip()] or None
+            exporter = input("Exporter aussi les CSV ? (o/n) : ").strip().lower() == "o"
             try:
-                exporter_csv_depuis_biblio(biblio)
-                run_rapport_pandas()
-                print("Graphiques générés dans le dossier 'MesGraphiques/'.")
-                print(" - livres_par_categorie.png")
-                print(" - empruntes_vs_non_empruntes.png")
-                print(" - utilisateurs_par_type.png")
+                run_rapport_memoire(biblio, exporter_csv=exporter, graphiques=graphiques)
             except Exception as e:
                 print(" Impossible de générer les graphiques :", e)
 
+        #MESURES DE PERFORMANCE
+        elif choix == "8":
+            etat = "activée" if biblio.instrumentation is not None else "désactivée"
+            print(f"\n=== PERF STATS (instrumentation {etat}) ===")
+            print("1. Activer/désactiver\n2. Afficher\n3. Export Prometheus\n4. Remise a zéro\n5. Retour")
+            c = input("Choix : ")
+            if c == "1":
+                if biblio.instrumentation is None:
+                    biblio.activer_instrumentation()
+                    print("Instrumentation activée.")
+                else:
+                    biblio.desactiver_instrumentation()
+                    print("Instrumentation désactivée.")
+            elif c in ("2", "3", "4") and biblio.instrumentation is None:
+                print("L'instrumentation n'est pas activée.")
+            elif c == "2":
+                print(biblio.instrumentation.texte())
+            elif c == "3":
+                fichier = input("Fichier (vide = affichage) : ").strip()
+                if fichier:
+                    Path(fichier).write_text(biblio.instrumentation.prometheus(), encoding="utf-8")
+                    print(f"Mesures écrites dans {fichier}")
+                else:
+                    print(biblio.instrumentation.prometheus())
+            elif c == "4":
+                biblio.instrumentation.remettre_a_zero()
+                print("Mesures remises a zéro.")
 
         #QUITTER
-        elif choix == "8":
+        elif choix == "9":
+            biblio.desactiver_journal()
+            if biblio.stockage is not None:
+                biblio.stockage.fermer()
             print("Mercii pour la visite !")
             break
 
@@ -0,0 +1,2 @@
+# Benchmarks de la bibliothèque : générateur de bibliothèques synthétiques (generateur.py),
+# suite de mesures par taille (bench_operations.py), temps de démarrage, charge concurrente et serveur.
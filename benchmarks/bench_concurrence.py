@@ -0,0 +1,145 @@
+# Test de charge du mode concurrent : plusieurs guichets (threads) empruntent et rendent en meme temps
+#
+#   python benchmarks/bench_concurrence.py [--threads 1 2 4 8] [--operations 20000] [--intervalle-gil 1e-6]
+#
+# Pour chaque nombre de threads, le script mesure le débit (opérations/s) puis vérifie les invariants :
+#   - pour chaque livre : exemplaires en stock + emprunts en cours = exemplaires de départ
+#   - aucun lecteur n'a plus de MAXI_PRET_ACTIF emprunts en cours
+#   - chaque emprunt réussi a un id unique, et le registre contient exactement ces emprunts
+#   - les compteurs incrémentaux sont égaux a un recomptage complet
+# Le script échoue (code 1) si un invariant est violé.
+import argparse
+import io
+import json
+import random
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Projet_V2 import Bibliotheque, Bibliothecaire, Lecteur, Livre, MAXI_PRET_ACTIF  # noqa: E402
+
+
+def construire_bibliotheque(nb_livres, nb_lecteurs, exemplaires):
+    biblio = Bibliotheque("Bench", "Concurrence")
+    with redirect_stdout(io.StringIO()):
+        admin = Bibliothecaire(0, "Admin", "admin@bench")
+        biblio.ajouter_utilisateur(admin)
+        for i in range(1, nb_lecteurs + 1):
+            biblio.ajouter_utilisateur(Lecteur(i, f"Lecteur {i}", f"lecteur{i}@bench"))
+        biblio.importer_livres([Livre(f"Titre {i}", f"Auteur {i % 50}", f"Cat{i % 10}", exemplaires)
+                                for i in range(nb_livres)], admin)
+    return biblio
+
+
+# un guichet : alterne au hasard des retours de ses emprunts, des emprunts par emprunter_lot (qui donne l'id)
+# et des emprunts simples par emprunter_livre
+def guichet(biblio, graine, nb_operations, livre_ids, nb_lecteurs, depart, reussis):
+    hasard = random.Random(graine)
+    en_cours = []
+    crees = []
+    depart.wait()
+    for _ in range(nb_operations):
+        tirage = hasard.random()
+        if en_cours and tirage < 0.45:
+            biblio.rendre_livre(en_cours.pop(hasard.randrange(len(en_cours))))
+        elif tirage < 0.9:
+            resultat = biblio.emprunter_lot([(hasard.choice(livre_ids), hasard.randint(1, nb_lecteurs))])
+            if resultat["applique"]:
+                emprunt_id = resultat["resultats"][0]["emprunt_id"]
+                en_cours.append(emprunt_id)
+                crees.append(emprunt_id)
+        else:
+            biblio.emprunter_livre(hasard.choice(livre_ids), hasard.randint(1, nb_lecteurs))
+    reussis.append(crees)
+
+
+def verifier_invariants(biblio, stock_initial, ids_reussis):
+    erreurs = []
+    for livre_id, livre in biblio.livres.items():
+        sortis = len(biblio.emprunts_actifs_par_livre.get(livre_id, ()))
+        if livre.exemplaires + sortis != stock_initial[livre_id] or livre.exemplaires < 0:
+            erreurs.append(f"livre {livre_id} : {livre.exemplaires} en stock + {sortis} sortis "
+                           f"!= {stock_initial[livre_id]}")
+    for lecteur_id, actifs in biblio.emprunts_actifs_par_lecteur.items():
+        if len(actifs) > MAXI_PRET_ACTIF:
+            erreurs.append(f"lecteur {lecteur_id} : {len(actifs)} emprunts en cours")
+    if len(set(biblio.emprunts)) != len(biblio.emprunts):
+        erreurs.append("ids d'emprunt en double dans le registre")
+    if len(ids_reussis) != len(set(ids_reussis)):
+        erreurs.append("le meme id d'emprunt a été donné a deux guichets")
+    ecarts = biblio.verifier_compteurs()
+    if ecarts:
+        erreurs.append(f"compteurs incohérents : {ecarts}")
+    return erreurs
+
+
+def executer(nb_threads, nb_operations, nb_livres, nb_lecteurs, exemplaires):
+    biblio = construire_bibliotheque(nb_livres, nb_lecteurs, exemplaires)
+    biblio.activer_mode_concurrent()
+    stock_initial = {livre_id: livre.exemplaires for livre_id, livre in biblio.livres.items()}
+    livre_ids = list(biblio.livres)
+
+    depart = threading.Barrier(nb_threads + 1)
+    reussis = []
+    guichets = [threading.Thread(target=guichet,
+                                 args=(biblio, graine, nb_operations // nb_threads, livre_ids,
+                                       nb_lecteurs, depart, reussis))
+                for graine in range(nb_threads)]
+    with redirect_stdout(io.StringIO()):
+        for t in guichets:
+            t.start()
+        depart.wait()
+        debut = time.perf_counter()
+        for t in guichets:
+            t.join()
+        duree = time.perf_counter() - debut
+
+    ids_reussis = [i for ids in reussis for i in ids]
+    erreurs = verifier_invariants(biblio, stock_initial, ids_reussis)
+    return {
+        "threads": nb_threads,
+        "operations": nb_operations // nb_threads * nb_threads,
+        "duree_s": round(duree, 3),
+        "operations_par_s": round(nb_operations / duree),
+        "emprunts_crees": len(biblio.emprunts),
+        "erreurs": erreurs,
+    }
+
+
+def main():
+    parseur = argparse.ArgumentParser(description="Test de charge du mode concurrent de Bibliotheque")
+    parseur.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parseur.add_argument("--operations", type=int, default=20000)
+    parseur.add_argument("--livres", type=int, default=200)
+    parseur.add_argument("--lecteurs", type=int, default=500)
+    parseur.add_argument("--exemplaires", type=int, default=2)
+    parseur.add_argument("--intervalle-gil", type=float, default=None,
+                         help="sys.setswitchinterval en secondes (ex: 1e-6 pour provoquer plus d'entrelacements)")
+    parseur.add_argument("--json", action="store_true", help="affiche les résultats en JSON")
+    args = parseur.parse_args()
+    if args.intervalle_gil:
+        sys.setswitchinterval(args.intervalle_gil)
+
+    resultats = [executer(n, args.operations, args.livres, args.lecteurs, args.exemplaires)
+                 for n in args.threads]
+    if args.json:
+        print(json.dumps(resultats, indent=2, ensure_ascii=False))
+    else:
+        reference = resultats[0]["operations_par_s"]
+        for r in resultats:
+            etat = "OK" if not r["erreurs"] else f"{len(r['erreurs'])} ERREUR(S)"
+            print(f"{r['threads']:>3} thread(s) : {r['operations_par_s']:>8} op/s "
+                  f"(x{r['operations_par_s'] / reference:.2f}), {r['emprunts_crees']} emprunts, {etat}")
+            for erreur in r["erreurs"][:10]:
+                print("    " + erreur)
+
+    if any(r["erreurs"] for r in resultats):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
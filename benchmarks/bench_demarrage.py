@@ -0,0 +1,77 @@
+# Mesure du temps de démarrage : import de Projet_V2 dans un interpréteur neuf (python -X importtime)
+#
+#   python benchmarks/bench_demarrage.py [--repetitions 5] [--budget-ms 150]
+#
+# Le script échoue (code 1) si pandas, numpy ou matplotlib sont chargés par le simple import
+# de l'application, ou si le temps d'import médian dépasse le budget.
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+RACINE = Path(__file__).resolve().parent.parent
+MODULES_INTERDITS = ("pandas", "numpy", "matplotlib")
+
+# importe l'application et affiche les modules lourds présents dans sys.modules
+CODE_IMPORT = (
+    "import sys, json, Projet_V2; "
+    f"print(json.dumps([m for m in {MODULES_INTERDITS!r} if m in sys.modules]))"
+)
+
+
+# lance un interpréteur neuf avec -X importtime, retourne (durées en µs par module, modules interdits chargés)
+def mesurer_import():
+    resultat = subprocess.run([sys.executable, "-X", "importtime", "-c", CODE_IMPORT],
+                              cwd=RACINE, capture_output=True, text=True, check=True)
+    durees = {}
+    for ligne in resultat.stderr.splitlines():
+        # format : "import time: self [us] | cumulative | imported package"
+        if not ligne.startswith("import time:") or "cumulative" in ligne:
+            continue
+        _, cumul, module = ligne[len("import time:"):].split("|")
+        durees[module.strip()] = int(cumul)
+    return durees, json.loads(resultat.stdout)
+
+
+def main():
+    parseur = argparse.ArgumentParser(description="Temps d'import de Projet_V2")
+    parseur.add_argument("--repetitions", type=int, default=5)
+    parseur.add_argument("--budget-ms", type=float, default=150.0)
+    parseur.add_argument("--json", action="store_true", help="affiche le résultat en JSON")
+    args = parseur.parse_args()
+
+    mesures = []
+    charges = []
+    for _ in range(args.repetitions):
+        durees, charges = mesurer_import()
+        mesures.append(durees)
+
+    totaux = [d["Projet_V2"] / 1000 for d in mesures]
+    mediane = statistics.median(totaux)
+    dernier = mesures[-1]
+    plus_lents = sorted((m for m in dernier if m != "Projet_V2"), key=dernier.get, reverse=True)[:10]
+
+    resultat = {
+        "import_projet_ms_mediane": round(mediane, 2),
+        "import_projet_ms": [round(t, 2) for t in totaux],
+        "budget_ms": args.budget_ms,
+        "modules_lourds_charges": charges,
+        "plus_lents_ms": {m: round(dernier[m] / 1000, 2) for m in plus_lents},
+    }
+    if args.json:
+        print(json.dumps(resultat, indent=2))
+    else:
+        print(f"Import de Projet_V2 : {mediane:.1f} ms (médiane de {args.repetitions}, budget {args.budget_ms:.0f} ms)")
+        for module, duree in resultat["plus_lents_ms"].items():
+            print(f"  {module:<40} {duree:8.2f} ms")
+        if charges:
+            print("Modules lourds chargés au démarrage : " + ", ".join(charges))
+
+    if charges or mediane > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
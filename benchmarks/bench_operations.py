@@ -0,0 +1,169 @@
+# Suite de benchmarks des opérations de la bibliothèque, sur des bibliothèques synthétiques de plusieurs tailles
+#
+#   python benchmarks/bench_operations.py [--tailles petit moyen] [--sortie resultats.json]
+#   python benchmarks/bench_operations.py --livres 5000 --lecteurs 2000 --emprunts 50000
+#   python benchmarks/bench_operations.py --tailles petit --comparer ancien.json [--seuil 1.2]
+#
+# Pour chaque taille : génération, ajouter_livre, rechercher_livre, emprunter_livre, rendre_livre,
+# statistiques, sauvegarder_json, charger_json, exporter_csv_depuis_biblio + run_rapport_pandas,
+# exporter_colonnes_depuis_biblio + run_rapport_pandas sur le Parquet (si pyarrow est installé),
+# run_rapport_memoire. Les résultats (JSON) donnent le temps total et le temps par opération ; avec
+# --comparer, chaque mesure est comparée a un fichier précédent et le script échoue (code 1) si une
+# opération est plus lente que --seuil fois l'ancienne.
+import argparse
+import importlib.util
+import io
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Projet_V2 import (Bibliotheque, Livre, charger_json, exporter_colonnes_depuis_biblio,  # noqa: E402
+                       exporter_csv_depuis_biblio, run_rapport_memoire, run_rapport_pandas, sauvegarder_json)
+from benchmarks.generateur import MOTS, TAILLES, generer_bibliotheque  # noqa: E402
+
+NB_OPERATIONS = 1000                        # répétitions des opérations unitaires
+
+
+# exécute fonction() n fois sans affichage, retourne la mesure
+def mesurer(operation, fonction, n=1):
+    with redirect_stdout(io.StringIO()):
+        debut = time.perf_counter()
+        for _ in range(n):
+            fonction()
+        duree = time.perf_counter() - debut
+    return {"operation": operation, "n": n, "total_s": round(duree, 6), "par_op_us": round(duree / n * 1e6, 3)}
+
+
+def mesurer_taille(nom, nb_livres, nb_lecteurs, nb_emprunts, nb_operations, graine):
+    hasard = random.Random(graine)
+    mesures = []
+
+    bibliotheques = []
+    mesures.append(mesurer("generation", lambda: bibliotheques.append(
+        generer_bibliotheque(nb_livres, nb_lecteurs, nb_emprunts, graine=graine))))
+    biblio = bibliotheques[0]
+    admin = next(u for u in biblio.utilisateurs.values() if biblio.est_bibliothecaire(u))
+
+    nouveaux = iter([Livre(f"Nouveau {i}", f"Auteur bench {i}", "Roman", 2) for i in range(nb_operations)])
+    mesures.append(mesurer("ajouter_livre", lambda: biblio.ajouter_livre(next(nouveaux), admin), nb_operations))
+
+    requetes = iter([(hasard.choice(["titre", "auteur", "categorie"]), hasard.choice(MOTS))
+                     for _ in range(nb_operations)])
+    mesures.append(mesurer("rechercher_livre", lambda: biblio.rechercher_livre(*next(requetes)), nb_operations))
+
+    livre_ids = list(biblio.livres)
+    demandes = iter([(hasard.choice(livre_ids), hasard.randint(1, nb_lecteurs)) for _ in range(nb_operations)])
+    mesures.append(mesurer("emprunter_livre", lambda: biblio.emprunter_livre(*next(demandes)), nb_operations))
+
+    en_cours = [e.id for e in biblio.emprunts.en_cours()]
+    hasard.shuffle(en_cours)
+    a_rendre = iter(en_cours[:nb_operations])
+    mesures.append(mesurer("rendre_livre", lambda: biblio.rendre_livre(next(a_rendre)),
+                           min(nb_operations, len(en_cours))))
+
+    mesures.append(mesurer("statistiques", biblio.statistiques, 10))
+
+    with tempfile.TemporaryDirectory() as dossier:
+        dossier = Path(dossier)
+        mesures.append(mesurer("sauvegarder_json", lambda: sauvegarder_json(biblio, dossier / "json")))
+        mesures.append(mesurer("charger_json", lambda: charger_json(Bibliotheque("Relu", ""), dossier / "json")))
+
+        fichiers = [str(dossier / f) for f in ("livres.csv", "utilisateurs.csv", "emprunts.csv")]
+        mesures.append(mesurer("exporter_csv", lambda: exporter_csv_depuis_biblio(biblio, *fichiers)))
+        mesures.append(mesurer("run_rapport_pandas",
+                               lambda: run_rapport_pandas(*fichiers, dossier_sortie=str(dossier / "graphes"))))
+        if importlib.util.find_spec("pyarrow") is not None:
+            parquet = dossier / "parquet"
+            mesures.append(mesurer("exporter_parquet", lambda: exporter_colonnes_depuis_biblio(biblio, parquet)))
+            mesures.append(mesurer("run_rapport_parquet", lambda: run_rapport_pandas(
+                dossier_sortie=str(dossier / "graphes_parquet"), dossier_colonnes=parquet)))
+        mesures.append(mesurer("run_rapport_memoire",
+                               lambda: run_rapport_memoire(biblio, str(dossier / "graphes_memoire"))))
+
+    for mesure in mesures:
+        mesure.update(taille=nom, livres=nb_livres, lecteurs=nb_lecteurs, emprunts=nb_emprunts)
+    return mesures
+
+
+def version_git():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# compare deux séries de résultats, retourne les lignes (taille, opération, ancien, nouveau, rapport)
+def comparer(anciens, nouveaux):
+    index = {(m["taille"], m["operation"]): m for m in anciens["resultats"]}
+    lignes = []
+    for mesure in nouveaux["resultats"]:
+        ancienne = index.get((mesure["taille"], mesure["operation"]))
+        if ancienne and ancienne["par_op_us"] > 0:
+            lignes.append((mesure["taille"], mesure["operation"], ancienne["par_op_us"], mesure["par_op_us"],
+                           mesure["par_op_us"] / ancienne["par_op_us"]))
+    return lignes
+
+
+def main():
+    parseur = argparse.ArgumentParser(description="Benchmarks des opérations de la bibliothèque")
+    parseur.add_argument("--tailles", nargs="+", choices=sorted(TAILLES), default=["petit"])
+    parseur.add_argument("--livres", type=int, help="taille personnalisée (remplace --tailles)")
+    parseur.add_argument("--lecteurs", type=int, default=1000)
+    parseur.add_argument("--emprunts", type=int, default=10000)
+    parseur.add_argument("--operations", type=int, default=NB_OPERATIONS)
+    parseur.add_argument("--graine", type=int, default=0)
+    parseur.add_argument("--sortie", help="fichier JSON des résultats (sinon affichés)")
+    parseur.add_argument("--comparer", help="fichier JSON d'une exécution précédente")
+    parseur.add_argument("--seuil", type=float, default=1.2, help="rapport nouveau/ancien considéré comme régression")
+    args = parseur.parse_args()
+
+    if args.livres:
+        tailles = [("personnalisee", args.livres, args.lecteurs, args.emprunts)]
+    else:
+        tailles = [(nom, *TAILLES[nom]) for nom in args.tailles]
+
+    resultats = []
+    for nom, nb_livres, nb_lecteurs, nb_emprunts in tailles:
+        print(f"== {nom} : {nb_livres} livres, {nb_lecteurs} lecteurs, {nb_emprunts} emprunts", file=sys.stderr)
+        for mesure in mesurer_taille(nom, nb_livres, nb_lecteurs, nb_emprunts, args.operations, args.graine):
+            print(f"   {mesure['operation']:<22} {mesure['total_s']:>10.4f} s  {mesure['par_op_us']:>14.2f} µs/op",
+                  file=sys.stderr)
+            resultats.append(mesure)
+
+    rapport = {
+        "commit": version_git(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "resultats": resultats,
+    }
+    texte = json.dumps(rapport, indent=2, ensure_ascii=False)
+    if args.sortie:
+        Path(args.sortie).write_text(texte, encoding="utf-8")
+    else:
+        print(texte)
+
+    if args.comparer:
+        anciens = json.loads(Path(args.comparer).read_text(encoding="utf-8"))
+        regressions = 0
+        for taille, operation, ancien, nouveau, rapport_temps in comparer(anciens, rapport):
+            marque = "  REGRESSION" if rapport_temps > args.seuil else ""
+            regressions += bool(marque)
+            print(f"{taille:<14} {operation:<22} {ancien:>12.2f} -> {nouveau:>12.2f} µs/op "
+                  f"(x{rapport_temps:.2f}){marque}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
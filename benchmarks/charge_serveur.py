@@ -0,0 +1,183 @@
+# Générateur de charge pour serveur_biblio.py : latences p50/p99 et requetes par seconde
+#
+#   python benchmarks/charge_serveur.py [--clients 16] [--requetes 20000] [--pipeline 4]
+#   python benchmarks/charge_serveur.py --hote 127.0.0.1 --port 8765     (serveur déja lancé)
+#
+# Sans --port, un serveur est démarré dans ce processus (thread a part, boucle asyncio a part) sur une
+# bibliothèque de --livres livres et --lecteurs lecteurs.
+# Chaque client garde sa connexion ouverte et envoie --pipeline requetes d'affilée avant de lire les
+# réponses. Mélange : 50 % recherches, 25 % emprunts, 20 % retours, 5 % stats.
+import argparse
+import asyncio
+import io
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Projet_V2 import Bibliotheque, Bibliothecaire, Lecteur, Livre  # noqa: E402
+from serveur_biblio import ServeurBibliotheque  # noqa: E402
+
+MOTS = ["reve", "sable", "histoire", "roman", "nuit", "mer", "ville", "guerre", "amour", "temps"]
+
+
+def construire_bibliotheque(nb_livres, nb_lecteurs):
+    biblio = Bibliotheque("Charge", "Loopback")
+    hasard = random.Random(0)
+    with redirect_stdout(io.StringIO()):
+        admin = Bibliothecaire(0, "Admin", "admin@charge")
+        biblio.ajouter_utilisateur(admin)
+        for i in range(1, nb_lecteurs + 1):
+            biblio.ajouter_utilisateur(Lecteur(i, f"Lecteur {i}", f"lecteur{i}@charge"))
+        biblio.importer_livres([Livre(f"{hasard.choice(MOTS)} {hasard.choice(MOTS)} {i}", f"Auteur {i % 300}",
+                                      f"Cat{i % 12}", hasard.randint(1, 4)) for i in range(nb_livres)], admin)
+    return biblio
+
+
+# démarre le serveur dans un thread avec sa propre boucle, retourne (port, fonction d'arret)
+def demarrer_serveur_local(biblio):
+    pret = threading.Event()
+    etat = {}
+
+    async def principal():
+        serveur_biblio = ServeurBibliotheque(biblio)
+        with redirect_stdout(io.StringIO()):
+            serveur = await serveur_biblio.demarrer("127.0.0.1", 0)
+        etat["port"] = serveur.sockets[0].getsockname()[1]
+        etat["boucle"] = asyncio.get_running_loop()
+        etat["fin"] = asyncio.Event()
+        pret.set()
+        await etat["fin"].wait()
+        serveur.close()
+        await serveur.wait_closed()
+        await serveur_biblio.attendre_connexions()
+        serveur_biblio.executeur.shutdown()
+
+    thread = threading.Thread(target=asyncio.run, args=(principal(),), daemon=True)
+    thread.start()
+    pret.wait()
+
+    def arreter():
+        etat["boucle"].call_soon_threadsafe(etat["fin"].set)
+        thread.join()
+
+    return etat["port"], arreter
+
+
+def requete_http(methode, chemin, corps=None):
+    donnees = json.dumps(corps).encode() if corps is not None else b""
+    return (f"{methode} {chemin} HTTP/1.1\r\nHost: charge\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(donnees)}\r\n\r\n").encode("latin-1") + donnees
+
+
+async def lire_reponse(lecteur):
+    en_tete = await lecteur.readuntil(b"\r\n\r\n")
+    statut = int(en_tete.split(b" ", 2)[1])
+    taille = 0
+    for ligne in en_tete.split(b"\r\n"):
+        if ligne.lower().startswith(b"content-length:"):
+            taille = int(ligne.split(b":", 1)[1])
+    return statut, json.loads(await lecteur.readexactly(taille))
+
+
+# un client : envoie ses requetes par paquets de `pipeline`, mesure chaque latence (envoi -> réponse)
+async def client(hote, port, graine, nb_requetes, pipeline, nb_livres, nb_lecteurs, latences, erreurs):
+    hasard = random.Random(graine)
+    lecteur, ecrivain = await asyncio.open_connection(hote, port)
+    emprunts = []
+    envoyees = 0
+    while envoyees < nb_requetes:
+        paquet = []
+        for _ in range(min(pipeline, nb_requetes - envoyees)):
+            tirage = hasard.random()
+            if tirage < 0.5:
+                paquet.append(("recherche", requete_http("GET", f"/recherche?q={hasard.choice(MOTS)}&limite=10")))
+            elif tirage < 0.75 or not emprunts:
+                corps = {"livre_id": hasard.randint(1, nb_livres), "lecteur_id": hasard.randint(1, nb_lecteurs)}
+                paquet.append(("emprunt", requete_http("POST", "/emprunts", corps)))
+            elif tirage < 0.95:
+                corps = {"emprunt_id": emprunts.pop(hasard.randrange(len(emprunts)))}
+                paquet.append(("retour", requete_http("POST", "/retours", corps)))
+            else:
+                paquet.append(("stats", requete_http("GET", "/stats")))
+        debut = time.perf_counter()
+        ecrivain.write(b"".join(requete for _, requete in paquet))
+        await ecrivain.drain()
+        for genre, _ in paquet:
+            statut, donnees = await lire_reponse(lecteur)
+            latences.append(time.perf_counter() - debut)
+            if statut != 200:
+                erreurs.append((genre, statut, donnees))
+            elif genre == "emprunt" and donnees["applique"]:
+                emprunts.append(donnees["resultats"][0]["emprunt_id"])
+        envoyees += len(paquet)
+    ecrivain.close()
+    await ecrivain.wait_closed()
+
+
+def percentile(valeurs_triees, p):
+    return valeurs_triees[min(len(valeurs_triees) - 1, int(len(valeurs_triees) * p / 100))]
+
+
+async def charger(args, hote, port, nb_livres, nb_lecteurs):
+    latences = []
+    erreurs = []
+    debut = time.perf_counter()
+    await asyncio.gather(*(client(hote, port, graine, args.requetes // args.clients, args.pipeline,
+                                  nb_livres, nb_lecteurs, latences, erreurs)
+                           for graine in range(args.clients)))
+    duree = time.perf_counter() - debut
+    latences.sort()
+    return {
+        "clients": args.clients,
+        "pipeline": args.pipeline,
+        "requetes": len(latences),
+        "duree_s": round(duree, 3),
+        "requetes_par_s": round(len(latences) / duree),
+        "latence_p50_ms": round(percentile(latences, 50) * 1000, 3),
+        "latence_p99_ms": round(percentile(latences, 99) * 1000, 3),
+        "latence_moyenne_ms": round(statistics.fmean(latences) * 1000, 3),
+        "erreurs": len(erreurs),
+    }
+
+
+def main():
+    parseur = argparse.ArgumentParser(description="Générateur de charge pour serveur_biblio")
+    parseur.add_argument("--hote", default="127.0.0.1")
+    parseur.add_argument("--port", type=int, default=None, help="serveur déja lancé (sinon serveur local)")
+    parseur.add_argument("--clients", type=int, default=16)
+    parseur.add_argument("--requetes", type=int, default=20000)
+    parseur.add_argument("--pipeline", type=int, default=4)
+    parseur.add_argument("--livres", type=int, default=5000)
+    parseur.add_argument("--lecteurs", type=int, default=2000)
+    parseur.add_argument("--json", action="store_true", help="affiche le résultat en JSON")
+    args = parseur.parse_args()
+
+    arreter = None
+    port = args.port
+    if port is None:
+        port, arreter = demarrer_serveur_local(construire_bibliotheque(args.livres, args.lecteurs))
+    try:
+        resultat = asyncio.run(charger(args, args.hote, port, args.livres, args.lecteurs))
+    finally:
+        if arreter:
+            arreter()
+
+    if args.json:
+        print(json.dumps(resultat, indent=2))
+    else:
+        print(f"{resultat['requetes']} requetes, {args.clients} clients, pipeline {args.pipeline} : "
+              f"{resultat['requetes_par_s']} req/s, p50 {resultat['latence_p50_ms']} ms, "
+              f"p99 {resultat['latence_p99_ms']} ms, {resultat['erreurs']} erreur(s)")
+    if resultat["erreurs"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
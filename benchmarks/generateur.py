@@ -0,0 +1,95 @@
+# Générateur de bibliothèques synthétiques pour les benchmarks
+#
+# La popularité des livres suit une loi de Zipf (quelques livres tres empruntés, une longue traîne) ;
+# les lecteurs sont tirés uniformément. Les emprunts sont créés dans l'ordre chronologique sur
+# `jours_historique` jours : tous sont rendus sauf ceux des derniers jours, qui restent en cours
+# quand le stock, MAXI_PRET_ACTIF et la regle "pas deux fois le meme livre" le permettent.
+import io
+import random
+import sys
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from itertools import accumulate
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from Projet_V2 import (Bibliotheque, Bibliothecaire, DUREE_EMPRUNT_MAXI, Emprunt, Lecteur, Livre,  # noqa: E402
+                       MAXI_PRET_ACTIF)
+
+# tailles prédéfinies : (livres, lecteurs, emprunts)
+TAILLES = {
+    "petit": (1_000, 1_000, 10_000),
+    "moyen": (100_000, 20_000, 1_000_000),
+    "grand": (1_000_000, 200_000, 10_000_000),
+}
+
+MOTS = ["reve", "sable", "histoire", "roman", "nuit", "mer", "ville", "guerre", "amour", "temps", "jardin",
+        "desert", "etoile", "memoire", "silence", "voyage", "lumiere", "hiver", "printemps", "royaume"]
+CATEGORIES = ["Roman", "Fantasy", "Historique", "Sport", "Psychologie", "Poesie", "Science", "Jeunesse",
+              "Policier", "Philosophie", "Voyage", "Cuisine"]
+
+
+# poids cumulés d'une loi de Zipf sur n rangs (le rang 1 est le plus populaire)
+def poids_zipf(n, exposant):
+    return list(accumulate(1.0 / rang ** exposant for rang in range(1, n + 1)))
+
+
+def generer_livres(nb_livres, hasard):
+    return [Livre(f"{hasard.choice(MOTS).capitalize()} {hasard.choice(MOTS)} {i}",
+                  f"Auteur {hasard.randrange(max(1, nb_livres // 20))}",
+                  hasard.choice(CATEGORIES), hasard.randint(1, 5))
+            for i in range(nb_livres)]
+
+
+# construit une bibliothèque de la taille demandée, sans affichage
+# zipf : exposant de la popularité des livres (0 = uniforme), part_en_cours : part des emprunts de la
+# période finale qui restent en cours si c'est possible
+def generer_bibliotheque(nb_livres, nb_lecteurs, nb_emprunts, zipf=1.1, jours_historique=730,
+                         part_en_cours=0.05, graine=0, maintenant=None):
+    hasard = random.Random(graine)
+    maintenant = maintenant or datetime.now()
+    Livre.Compteur = 1
+    Emprunt.Compteur = 1
+
+    biblio = Bibliotheque("Bibliothèque synthétique", "Benchmarks")
+    admin = Bibliothecaire(nb_lecteurs + 1, "Admin", "admin@bench")
+    with redirect_stdout(io.StringIO()):
+        biblio.ajouter_utilisateur(admin)
+        for i in range(1, nb_lecteurs + 1):
+            biblio._indexer_utilisateur(Lecteur(i, f"Lecteur {i}", f"lecteur{i}@bench"))
+        biblio.importer_livres(generer_livres(nb_livres, hasard), admin)
+
+    if not nb_emprunts:
+        return biblio
+
+    # un rang de popularité par livre, indépendant de l'id
+    rangs = list(biblio.livres)
+    hasard.shuffle(rangs)
+    livres_tires = hasard.choices(rangs, cum_weights=poids_zipf(len(rangs), zipf), k=nb_emprunts)
+    lecteurs_tires = [hasard.randint(1, nb_lecteurs) for _ in range(nb_emprunts)]
+
+    debut = maintenant - timedelta(days=jours_historique)
+    pas = timedelta(days=jours_historique) / nb_emprunts
+    premier_en_cours = int(nb_emprunts * (1 - part_en_cours))
+    actifs_par_lecteur = biblio.emprunts_actifs_par_lecteur
+    for i, (livre_id, lecteur_id) in enumerate(zip(livres_tires, lecteurs_tires)):
+        date_emprunt = debut + pas * i
+        emprunt = Emprunt(livre_id, lecteur_id, date_emprunt, date_emprunt + timedelta(days=DUREE_EMPRUNT_MAXI))
+        livre = biblio.livres[livre_id]
+        if (i >= premier_en_cours and livre.exemplaires > 0
+                and len(actifs_par_lecteur.get(lecteur_id, ())) < MAXI_PRET_ACTIF
+                and livre_id not in biblio.utilisateurs[lecteur_id].livres_empruntes):
+            biblio._appliquer_emprunt(emprunt, livre)
+            continue
+        # emprunt rendu entre 1 et 20 jours plus tard (les retours apres 14 jours sont en retard)
+        retour = min(date_emprunt + timedelta(days=hasard.randint(1, 20)), maintenant)
+        emprunt.date_retour_effective = retour
+        emprunt.retourne = True
+        biblio._indexer_emprunt(emprunt)
+    return biblio
+
+
+def generer_taille(nom, **options):
+    nb_livres, nb_lecteurs, nb_emprunts = TAILLES[nom]
+    return generer_bibliotheque(nb_livres, nb_lecteurs, nb_emprunts, **options)
@@ -0,0 +1,298 @@
+# Serveur HTTP/JSON (asyncio, bibliothèque standard uniquement) devant une seule Bibliotheque partagée
+#
+#   python serveur_biblio.py [--hote 127.0.0.1] [--port 8765] [--format json]
+#
+# Points d'entrée (réponses en JSON) :
+#   GET  /recherche?q=...&critere=titre&limite=20&decalage=0   recherche classée (chercher_livres)
+#   POST /emprunts   {"livre_id": 1, "lecteur_id": 2}  ou  {"demandes": [[1, 2], ...], "tout_ou_rien": true}
+#   POST /retours    {"emprunt_id": 1}                  ou  {"emprunt_ids": [1, 2], "tout_ou_rien": true}
+#   GET  /stats                                         statistiques (compteurs incrémentaux)
+#   POST /sauvegarde {"format": "json"}                 sauvegarde (dans l'exécuteur)
+#   GET  /rapport?graphiques=a,b                        graphiques du rapport (dans l'exécuteur)
+#
+# Les connexions sont persistantes (HTTP/1.1) et acceptent le pipelining : les requetes d'une connexion
+# sont traitées dès leur arrivée, les réponses repartent dans l'ordre des requetes.
+# Les recherches et les statistiques s'exécutent dans la boucle. Les emprunts et retours partent dans un
+# pool de guichets : avec un journal ou une base SQLite, chacun fait un fsync ou un commit (et parfois une
+# compaction du journal), qui ne doit pas bloquer les autres connexions. La sauvegarde et le rapport partent
+# dans un autre pool de threads. La bibliothèque est en mode concurrent : ces taches copient les données sous
+# biblio.verrou_index (biblio.instantane), puis écrivent les fichiers ou construisent les DataFrames hors
+# verrou. Les emprunts et retours prennent ce verrou : ils n'attendent que le temps de la copie, pas celui
+# de l'écriture.
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from Projet_V2 import (DOSSIER_ARCHIVE_DEFAUT, FORMAT_DE_SAUVEGARDE_DEFAUT, agreger_rapport, charger_donnees,
+                       dataframes_depuis_biblio, donnees_livre, initialiser_bibliotheque, rendre_rapport,
+                       sauver_donnees)
+
+HOTE_DEFAUT = "127.0.0.1"
+PORT_DEFAUT = 8765
+TAILLE_MAXI_CORPS = 1 << 20                 # refuse les corps de requete de plus de 1 Mo
+NB_TRAVAILLEURS = 2
+NB_GUICHETS = 4                             # threads des emprunts et retours
+
+
+# erreur renvoyée au client avec son code HTTP
+class ErreurRequete(Exception):
+    def __init__(self, statut, message):
+        super().__init__(message)
+        self.statut = statut
+
+
+def _entier(valeur, nom):
+    try:
+        return int(valeur)
+    except (TypeError, ValueError):
+        raise ErreurRequete(HTTPStatus.BAD_REQUEST, f"'{nom}' doit etre un entier.") from None
+
+
+def _liste(valeur, nom):
+    if not isinstance(valeur, list):
+        raise ErreurRequete(HTTPStatus.BAD_REQUEST, f"'{nom}' doit etre une liste.")
+    return valeur
+
+
+# une demande d'emprunt : [livre_id, lecteur_id]
+def _demande(paire):
+    if not isinstance(paire, list) or len(paire) != 2:
+        raise ErreurRequete(HTTPStatus.BAD_REQUEST, "Chaque demande doit etre une paire [livre_id, lecteur_id].")
+    return _entier(paire[0], "livre_id"), _entier(paire[1], "lecteur_id")
+
+
+class ServeurBibliotheque:
+    def __init__(self, biblio, format_sauvegarde=FORMAT_DE_SAUVEGARDE_DEFAUT, nb_travailleurs=NB_TRAVAILLEURS,
+                 nb_guichets=NB_GUICHETS):
+        self.biblio = biblio
+        self.biblio.activer_mode_concurrent()
+        self.format_sauvegarde = format_sauvegarde
+        self.executeur = ThreadPoolExecutor(max_workers=nb_travailleurs)
+        # pool a part : une sauvegarde ou un rapport en cours ne retient pas les emprunts et retours
+        self.guichets = ThreadPoolExecutor(max_workers=nb_guichets)
+        self.connexions = set()                 # taches des connexions ouvertes
+        self.routes = {
+            ("GET", "/recherche"): self.recherche,
+            ("POST", "/emprunts"): self.emprunts,
+            ("POST", "/retours"): self.retours,
+            ("GET", "/stats"): self.stats,
+            ("POST", "/sauvegarde"): self.sauvegarde,
+            ("GET", "/rapport"): self.rapport,
+        }
+
+    # --- points d'entrée : (paramètres de l'URL, corps JSON) -> objet JSON ---
+
+    async def recherche(self, parametres, corps):
+        valeur = parametres.get("q", "")
+        limite = _entier(parametres.get("limite", 20), "limite")
+        decalage = _entier(parametres.get("decalage", 0), "decalage")
+        livres = self.biblio.chercher_livres(valeur, parametres.get("critere"), limite, decalage)
+        return {"livres": [donnees_livre(livre) for livre in livres]}
+
+    async def emprunts(self, parametres, corps):
+        if "demandes" in corps:
+            demandes = [_demande(paire) for paire in _liste(corps["demandes"], "demandes")]
+        else:
+            demandes = [(_entier(corps.get("livre_id"), "livre_id"), _entier(corps.get("lecteur_id"), "lecteur_id"))]
+        return await self._dans_executeur(self.biblio.emprunter_lot, demandes, bool(corps.get("tout_ou_rien", True)),
+                                          executeur=self.guichets)
+
+    async def retours(self, parametres, corps):
+        if "emprunt_ids" in corps:
+            ids = [_entier(i, "emprunt_id") for i in _liste(corps["emprunt_ids"], "emprunt_ids")]
+        else:
+            ids = [_entier(corps.get("emprunt_id"), "emprunt_id")]
+        return await self._dans_executeur(self.biblio.rendre_lot, ids, bool(corps.get("tout_ou_rien", True)),
+                                          executeur=self.guichets)
+
+    async def stats(self, parametres, corps):
+        return self.biblio.donnees_statistiques()
+
+    async def sauvegarde(self, parametres, corps):
+        format_sauvegarde = corps.get("format", self.format_sauvegarde)
+        await self._dans_executeur(self._sauver, format_sauvegarde)
+        return {"format": format_sauvegarde, "sauvegarde": True}
+
+    async def rapport(self, parametres, corps):
+        graphiques = [g for g in parametres.get("graphiques", "").split(",") if g] or None
+        try:
+            durees = await self._dans_executeur(self._rapport, graphiques)
+        except ValueError as erreur:
+            raise ErreurRequete(HTTPStatus.BAD_REQUEST, str(erreur)) from None
+        return {"durees_ms": {nom: round(duree * 1000, 1) for nom, duree in durees.items()}}
+
+    # --- travail lourd, exécuté dans le pool de threads ---
+
+    # sauver_donnees ne tient verrou_index que le temps de copier les données (voir Bibliotheque.instantane)
+    def _sauver(self, format_sauvegarde):
+        sauver_donnees(self.biblio, format_sauvegarde)
+
+    # les DataFrames sont construits depuis un instantané, hors verrou
+    def _rapport(self, graphiques, dossier_sortie="MesGraphiques"):
+        df_livres, df_users, df_emprunts = dataframes_depuis_biblio(self.biblio.instantane())
+        return rendre_rapport(agreger_rapport(df_livres, df_users, df_emprunts), dossier_sortie, graphiques)
+
+    def _dans_executeur(self, fonction, *args, executeur=None):
+        return asyncio.get_running_loop().run_in_executor(executeur or self.executeur, fonction, *args)
+
+    # --- HTTP ---
+
+    # lit une requete sur la connexion, retourne (méthode, chemin, paramètres, corps, garder la connexion)
+    # ou None si le client a fermé la connexion
+    async def lire_requete(self, lecteur):
+        try:
+            en_tete = await lecteur.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        lignes = en_tete.decode("latin-1").split("\r\n")
+        methode, cible, version = lignes[0].split(" ", 2)
+        entetes = {}
+        for ligne in lignes[1:]:
+            if ":" in ligne:
+                nom, valeur = ligne.split(":", 1)
+                entetes[nom.strip().lower()] = valeur.strip()
+
+        taille = int(entetes.get("content-length", 0))
+        if taille > TAILLE_MAXI_CORPS:
+            raise ErreurRequete(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Corps de requete trop grand.")
+        brut = await lecteur.readexactly(taille) if taille else b""
+
+        url = urlsplit(cible)
+        parametres = {cle: valeurs[-1] for cle, valeurs in parse_qs(url.query).items()}
+        connexion = entetes.get("connection", "").lower()
+        garder = connexion != "close" if version == "HTTP/1.1" else connexion == "keep-alive"
+        return methode, url.path, parametres, brut, garder
+
+    # exécute une requete et retourne la réponse HTTP complete (octets)
+    async def traiter(self, methode, chemin, parametres, brut, garder):
+        try:
+            route = self.routes.get((methode, chemin))
+            if route is None:
+                raise ErreurRequete(HTTPStatus.NOT_FOUND, f"Pas de route {methode} {chemin}.")
+            try:
+                corps = json.loads(brut) if brut else {}
+            except json.JSONDecodeError:
+                raise ErreurRequete(HTTPStatus.BAD_REQUEST, "Corps JSON invalide.") from None
+            if not isinstance(corps, dict):
+                raise ErreurRequete(HTTPStatus.BAD_REQUEST, "Le corps JSON doit etre un objet.")
+            statut, donnees = HTTPStatus.OK, await route(parametres, corps)
+        except ErreurRequete as erreur:
+            statut, donnees = erreur.statut, {"erreur": str(erreur)}
+        except Exception as erreur:
+            statut, donnees = HTTPStatus.INTERNAL_SERVER_ERROR, {"erreur": repr(erreur)}
+        return reponse_http(statut, donnees, garder)
+
+    # une connexion : les requetes sont lues et lancées au fil de l'eau (pipelining),
+    # une tache d'écriture renvoie les réponses dans l'ordre d'arrivée
+    async def connexion(self, lecteur, ecrivain):
+        tache = asyncio.current_task()
+        self.connexions.add(tache)
+        reponses = asyncio.Queue()
+        ecriture = asyncio.create_task(self._ecrire_reponses(reponses, ecrivain))
+        try:
+            while True:
+                try:
+                    requete = await self.lire_requete(lecteur)
+                except ErreurRequete as erreur:
+                    await reponses.put(_reponse_prete(reponse_http(erreur.statut, {"erreur": str(erreur)}, False)))
+                    break
+                except (ValueError, asyncio.LimitOverrunError):
+                    await reponses.put(_reponse_prete(
+                        reponse_http(HTTPStatus.BAD_REQUEST, {"erreur": "Requete HTTP invalide."}, False)))
+                    break
+                if requete is None:
+                    break
+                await reponses.put(asyncio.create_task(self.traiter(*requete)))
+                if not requete[-1]:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            await reponses.put(None)
+            await ecriture
+            self.connexions.discard(tache)
+
+    # attend la fin des connexions encore ouvertes (apres serveur.close(), qui n'attend que le socket d'écoute)
+    async def attendre_connexions(self):
+        await asyncio.gather(*self.connexions, return_exceptions=True)
+
+    async def _ecrire_reponses(self, reponses, ecrivain):
+        try:
+            while (tache := await reponses.get()) is not None:
+                ecrivain.write(await tache)
+                # on ne vide le tampon d'envoi que si aucune autre réponse n'attend déja
+                if reponses.empty():
+                    await ecrivain.drain()
+        except ConnectionError:
+            pass
+        finally:
+            ecrivain.close()
+
+    async def demarrer(self, hote=HOTE_DEFAUT, port=PORT_DEFAUT):
+        serveur = await asyncio.start_server(self.connexion, hote, port)
+        adresse = serveur.sockets[0].getsockname()
+        print(f"Serveur de la bibliothèque '{self.biblio.nom}' sur http://{adresse[0]}:{adresse[1]}")
+        return serveur
+
+    def fermer(self):
+        self.guichets.shutdown(wait=True)
+        self.executeur.shutdown(wait=True)
+        self.biblio.desactiver_journal()
+        if self.biblio.stockage is not None:
+            self.biblio.stockage.fermer()
+
+
+# réponse déja calculée, mise dans la file au meme titre que les taches
+def _reponse_prete(octets):
+    futur = asyncio.get_running_loop().create_future()
+    futur.set_result(octets)
+    return futur
+
+
+def reponse_http(statut, donnees, garder=True):
+    corps = json.dumps(donnees, ensure_ascii=False, default=str).encode("utf-8")
+    en_tete = (f"HTTP/1.1 {statut.value} {statut.phrase}\r\n"
+               "Content-Type: application/json; charset=utf-8\r\n"
+               f"Content-Length: {len(corps)}\r\n"
+               f"Connection: {'keep-alive' if garder else 'close'}\r\n\r\n")
+    return en_tete.encode("latin-1") + corps
+
+
+async def servir(biblio, hote, port, format_sauvegarde):
+    serveur_biblio = ServeurBibliotheque(biblio, format_sauvegarde)
+    serveur = await serveur_biblio.demarrer(hote, port)
+    try:
+        async with serveur:
+            await serveur.serve_forever()
+    finally:
+        serveur_biblio.fermer()
+
+
+def main():
+    parseur = argparse.ArgumentParser(description="Serveur HTTP/JSON de la bibliothèque")
+    parseur.add_argument("--hote", default=HOTE_DEFAUT)
+    parseur.add_argument("--port", type=int, default=PORT_DEFAUT)
+    parseur.add_argument("--format", default=FORMAT_DE_SAUVEGARDE_DEFAUT,
+                         help="format de chargement et de sauvegarde (csv, json, journal, sqlite, binaire)")
+    args = parseur.parse_args()
+
+    # meme démarrage que MenuApp : bibliothèque de départ, archive des emprunts puis données du disque s'il y en a
+    biblio = initialiser_bibliotheque()
+    if Path(DOSSIER_ARCHIVE_DEFAUT).exists():
+        biblio.activer_archive()
+    try:
+        charger_donnees(biblio, args.format)
+    except Exception as e:
+        print("Pas de données à charger pour l’instant.", e)
+    try:
+        asyncio.run(servir(biblio, args.hote, args.port, args.format))
+    except KeyboardInterrupt:
+        print("Serveur arrêté.")
+
+
+if __name__ == "__main__":
+    main()